@@ -5,6 +5,116 @@ import os
 from pdf_processor import PDFProcessor
 from data_parser import DataParser
 from form_filler import FormFiller
+from record_export import EXPORT_FORMATS, export_parsed_records, get_record_writer
+from record_store import DEFAULT_DB_PATH, RecordStore, hash_bytes
+from fill_cache import FillCache
+from template_pool import get_worker_template_pool
+from ocr_stage import OCRStage
+from batch_journal import DEFAULT_CHECKPOINT_DIR, DEFAULT_CHECKPOINT_MAX_AGE
+from job_queue import JOB_CANCELLED, JOB_DONE, JobQueue, JobWorkerPool
+from kyc_record import KYC_FIELDS, KYCRecord
+from pdf_preview import DEFAULT_PREVIEW_DPI, MAX_PREVIEW_DPI, MIN_PREVIEW_DPI, render_thumbnails
+from batch_processor import (BatchProcessor, RESULT_ERROR, RESULT_FILL_FAILED, RESULT_NO_DATA,
+                             RESULT_NO_TEXT, RESULT_SKIPPED, RESULT_SUCCESS)
+
+# Parsed fields that FormFiller writes into the template, in schema order
+CORRECTABLE_FIELDS = [field for field in KYC_FIELDS
+                      if field in FormFiller().field_mapping or
+                      field in ('gender', 'bank_account_type', 'occupation', 'income_limit')]
+
+
+@st.cache_resource
+def get_record_store() -> RecordStore:
+    """Record store shared by all sessions of this Streamlit server"""
+    return RecordStore()
+
+
+@st.cache_resource
+def get_fill_cache() -> FillCache:
+    """Filled-PDF cache shared by all sessions of this Streamlit server"""
+    return FillCache()
+
+
+@st.cache_resource
+def get_correction_filler() -> FormFiller:
+    """FormFiller for review-grid corrections; keeps the template and its field index loaded across clicks"""
+    return FormFiller()
+
+
+@st.cache_resource
+def get_ocr_stage() -> OCRStage:
+    """OCR stage (process pool and page cache) shared by all sessions of this Streamlit server"""
+    return OCRStage()
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Background job queue shared by all sessions of this Streamlit server"""
+    return JobQueue()
+
+
+@st.cache_resource
+def get_job_worker_pool() -> JobWorkerPool:
+    """Background workers serving the job queue; they outlive individual sessions"""
+    return JobWorkerPool(os.cpu_count() or 1, record_db_path=DEFAULT_DB_PATH).start()
+
+
+@st.cache_data(max_entries=500, show_spinner=False)
+def get_page_thumbnails(output_hash: str, dpi: int, _pdf_data: bytes) -> list:
+    """Page thumbnails of a filled PDF, rendered once per output hash and DPI for all sessions"""
+    return render_thumbnails(_pdf_data, dpi)
+
+
+def load_job_results(job_id: str) -> int:
+    """Put the successful files of a finished job into the session's results; returns how many"""
+    loaded = 0
+    for item in get_job_queue().job_results(job_id):
+        if not item['output_path'] or not os.path.exists(item['output_path']):
+            continue
+        with open(item['output_path'], 'rb') as f:
+            pdf_data = f.read()
+        st.session_state.processed_files.append({
+            'original_name': item['source_name'],
+            'output_name': item['output_name'],
+            'pdf_data': pdf_data,
+            'parsed_data': item['parsed_data'],
+            'source_hash': item['source_hash']
+        })
+        loaded += 1
+    return loaded
+
+
+@st.fragment(run_every=2)
+def show_background_jobs(owner: str):
+    """Progress of an operator's queued batches, refreshed without rerunning the page"""
+    job_queue = get_job_queue()
+    # Restart any worker that died since the last refresh
+    get_job_worker_pool().start()
+    jobs = job_queue.list_jobs(owner, limit=20)
+    if not jobs:
+        st.caption("No background jobs yet")
+        return
+    
+    for job in jobs:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            label = f"Job {job['id']} ({job['owner']}): {job['completed']}/{job['total']} file(s), {job['status']}"
+            st.progress(job['completed'] / job['total'] if job['total'] else 1.0, text=label)
+            if job['status'] == JOB_DONE and job['succeeded'] < job['total']:
+                failed = [f"{item['source_name']} ({item['status']})"
+                          for item in job_queue.job_results(job['id']) if item['status'] != RESULT_SUCCESS]
+                st.caption("Not filled: " + ", ".join(failed))
+        with col2:
+            if job['status'] == JOB_DONE:
+                if st.button("📂 Load results", key=f"load_job_{job['id']}"):
+                    st.session_state.processed_files = []
+                    load_job_results(job['id'])
+                    st.rerun(scope="app")
+            elif job['status'] != JOB_CANCELLED:
+                if st.button("✖️ Cancel", key=f"cancel_job_{job['id']}"):
+                    job_queue.cancel(job['id'])
+                    st.rerun(scope="fragment")
+
 
 def main():
     st.set_page_config(
@@ -33,6 +143,21 @@ def main():
         **File Naming**: Output files will be named as `original_filename_filled.pdf`
         """)
     
+    # Background jobs are listed per operator, so they can be picked up again from a new session
+    operator = st.sidebar.text_input(
+        "Operator",
+        key="operator",
+        help="Queued batches are shown per operator; workers are shared fairly between operators"
+    ).strip()
+    preview_dpi = st.sidebar.slider(
+        "Preview DPI",
+        min_value=MIN_PREVIEW_DPI,
+        max_value=MAX_PREVIEW_DPI,
+        value=DEFAULT_PREVIEW_DPI,
+        step=10,
+        help="Resolution of the page thumbnails shown in an opened result; lower renders and loads faster"
+    )
+    
     # Source PDFs Upload Section
     st.header("1️⃣ Upload Source PDFs")
     source_files = st.file_uploader(
@@ -52,85 +177,252 @@ def main():
     if source_files:
         st.header("2️⃣ Process Files")
         
-        col1, col2 = st.columns([1, 3])
-        
-        with col1:
-            process_button = st.button("🚀 Process All Files", type="primary")
+        processing_mode = st.radio(
+            "Processing mode",
+            ["Fill PDF template", "Queue in background", "Parse only (export data)"],
+            horizontal=True,
+            help="Queue in background fills the template in worker processes while you keep using the app; "
+                 "Parse only skips form filling and exports the parsed data as CSV, JSONL or Parquet"
+        )
         
-        with col2:
-            if st.session_state.processed_files:
-                st.info(f"Previously processed {len(st.session_state.processed_files)} files")
-        
-        if process_button:
-            # Clear previous results
-            st.session_state.processed_files = []
+        if processing_mode == "Queue in background":
+            if not operator:
+                st.info("Enter your operator name in the sidebar to queue files")
             
-            # Initialize processors
-            pdf_processor = PDFProcessor()
-            data_parser = DataParser()
-            form_filler = FormFiller()
-            
-            # Process each source file
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+            if st.button("📥 Queue Files", type="primary", disabled=not operator):
+                job_id = get_job_queue().submit(
+                    operator, ((source_file.name, source_file.getvalue()) for source_file in source_files)
+                )
+                get_job_worker_pool()
+                st.success(f"✅ Queued {len(source_files)} file(s) as job {job_id}; "
+                           f"progress is shown under Background Jobs")
+        
+        elif processing_mode == "Parse only (export data)":
+            export_format = st.selectbox("Export format", EXPORT_FORMATS)
             
-            for i, source_file in enumerate(source_files):
+            if st.button("📤 Export Parsed Data", type="primary"):
+                export_buffer = io.BytesIO()
                 try:
-                    status_text.text(f"Processing {source_file.name}...")
-                    
-                    # Extract text from source PDF
-                    extracted_text = pdf_processor.extract_text(source_file)
+                    with st.spinner("Parsing files..."):
+                        writer = get_record_writer(export_buffer, export_format)
+                        summary = export_parsed_records(
+                            ((source_file.name, source_file) for source_file in source_files), writer
+                        )
+                        writer.close()
                     
-                    if not extracted_text.strip():
-                        st.error(f"❌ No text could be extracted from {source_file.name}")
-                        continue
+                    st.success(f"🎉 Exported {summary['exported']} out of {len(source_files)} files")
+                    if summary['no_text'] or summary['no_data']:
+                        st.warning(f"⚠️ {summary['no_text']} file(s) had no text, {summary['no_data']} had no parsable data")
                     
-                    # Parse extracted data
-                    parsed_data = data_parser.parse_data(extracted_text)
+                    st.download_button(
+                        label=f"📥 Download {export_format.upper()}",
+                        data=export_buffer.getvalue(),
+                        file_name=f"parsed_records.{export_format}",
+                        mime="application/octet-stream"
+                    )
+                except ImportError as e:
+                    st.error(f"❌ {str(e)}")
+        
+        else:
+            col1, col2 = st.columns([1, 3])
+            
+            with col1:
+                process_button = st.button("🚀 Process All Files", type="primary")
+                skip_processed = st.checkbox(
+                    "Skip already processed",
+                    value=False,
+                    help="Skip source PDFs whose exact contents were processed successfully before; skipped files produce no filled PDF"
+                )
+                resume_batch = st.checkbox(
+                    "Resume interrupted batch",
+                    value=True,
+                    help="Checkpoint every finished file; re-running the same files restores completed ones instead of reprocessing them"
+                )
+                verify_fills = st.checkbox(
+                    "Verify filled fields",
+                    value=True,
+                    help="Read every filled PDF's target fields back and report values that did not land"
+                )
+                worker_count = st.number_input(
+                    "Worker processes",
+                    min_value=1,
+                    max_value=os.cpu_count() or 1,
+                    value=1,
+                    help="Each worker keeps the template warm in memory; 1 processes files in the app process"
+                )
+                with st.expander("Resource limits"):
+                    max_document_seconds = st.number_input(
+                        "Time cap per file (s)",
+                        min_value=0,
+                        value=0,
+                        help="Stop and flag files that take longer than this; 0 disables the cap"
+                    )
+                    max_document_mb = st.number_input(
+                        "Memory cap per file (MB)",
+                        min_value=0,
+                        value=0,
+                        help="Stop and flag files that grow their worker's memory by more than this; 0 disables the cap"
+                    )
+                    recycle_worker_mb = st.number_input(
+                        "Recycle workers above (MB)",
+                        min_value=0,
+                        value=0,
+                        help="Replace a worker whose memory exceeds this after a file; 0 disables recycling. "
+                             "Any limit runs files in worker processes, so their memory is returned when the worker exits"
+                    )
+            
+            with col2:
+                if st.session_state.processed_files:
+                    st.info(f"Previously processed {len(st.session_state.processed_files)} files")
+            
+            if process_button:
+                # Clear previous results
+                st.session_state.processed_files = []
+                
+                # Initialize processors
+                batch_processor = BatchProcessor(
+                    pdf_processor=PDFProcessor(ocr_stage=get_ocr_stage()),
+                    data_parser=DataParser(),
+                    form_filler=FormFiller(fill_cache=get_fill_cache(),
+                                           template_pool=get_worker_template_pool()),
+                    record_store=get_record_store(),
+                    skip_processed=skip_processed,
+                    workers=int(worker_count),
+                    checkpoint_dir=DEFAULT_CHECKPOINT_DIR if resume_batch else None,
+                    # Results live in the session once a batch finishes; only interrupted batches keep a checkpoint
+                    discard_checkpoints=True,
+                    checkpoint_max_age=DEFAULT_CHECKPOINT_MAX_AGE,
+                    max_document_seconds=max_document_seconds,
+                    max_document_mb=max_document_mb,
+                    recycle_worker_mb=recycle_worker_mb,
+                    verify_fills=verify_fills
+                )
+                
+                # Process each unique source file once; duplicates reuse its result
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                
+                for completed, result in batch_processor.process(source_files):
+                    name = result['original_name']
+                    status_text.text(f"Processed {completed} of {len(source_files)}: {name}")
                     
-                    if not parsed_data:
-                        st.error(f"❌ No relevant data could be parsed from {source_file.name}")
+                    if result['status'] == RESULT_SKIPPED:
+                        st.info(f"⏭️ Skipped {name}: already processed, so no filled PDF was produced. "
+                                "Untick 'Skip already processed' and process again to re-fill it")
+                    elif result['status'] == RESULT_NO_TEXT:
+                        tried = ", ".join(attempt['tier'] for attempt in result['extraction_attempts'])
+                        st.error(f"❌ No text could be extracted from {name} (tried: {tried or 'none'})")
+                    elif result['status'] == RESULT_NO_DATA:
+                        st.error(f"❌ No relevant data could be parsed from {name}")
                         # Show extracted text for debugging
-                        with st.expander(f"Debug: Extracted text from {source_file.name}"):
+                        extracted_text = result['extracted_text']
+                        with st.expander(f"Debug: Extracted text from {name}"):
                             st.text(extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text)
-                        continue
+                    elif result['status'] == RESULT_FILL_FAILED:
+                        st.error(f"❌ Failed to fill template for {name}")
+                    elif result['status'] == RESULT_ERROR:
+                        st.error(f"❌ Error processing {name}: {result['error']}")
                     else:
-                        # Show parsed data for debugging
-                        with st.expander(f"Debug: Parsed data from {source_file.name}"):
-                            st.json(parsed_data)
-                    
-                    # Fill the template with parsed data (using default EditablePdf.pdf)
-                    filled_pdf = form_filler.fill_template_with_default(parsed_data)
-                    
-                    if filled_pdf:
-                        # Generate output filename
-                        original_name = os.path.splitext(source_file.name)[0]
-                        output_filename = f"{original_name}_filled.pdf"
+                        if 'duplicate_of' not in result:
+                            # Show parsed data for debugging
+                            with st.expander(f"Debug: Parsed data from {name}"):
+                                st.json(result['parsed_data'].to_dict())
+                        
+                        # Warn when the same identity was onboarded from a different document
+                        if result['identity_matches']:
+                            st.warning(f"⚠️ {name}: identity already onboarded from "
+                                       f"{', '.join(sorted({d['source_name'] for d in result['identity_matches']}))}")
                         
                         # Store processed file
                         st.session_state.processed_files.append({
-                            'original_name': source_file.name,
-                            'output_name': output_filename,
-                            'pdf_data': filled_pdf,
-                            'parsed_data': parsed_data
+                            'original_name': name,
+                            'output_name': result['output_name'],
+                            'pdf_data': result['pdf_data'],
+                            'parsed_data': result['parsed_data'],
+                            'source_hash': result['source_hash'],
+                            'verification': result.get('verification')
                         })
                         
-                        st.success(f"✅ Successfully processed {source_file.name}")
-                    else:
-                        st.error(f"❌ Failed to fill template for {source_file.name}")
+                        if 'duplicate_of' in result:
+                            st.success(f"✅ Successfully processed {name} (duplicate of {result['duplicate_of']})")
+                        elif result.get('resumed'):
+                            st.success(f"✅ Restored {name} from the batch checkpoint")
+                        else:
+                            st.success(f"✅ Successfully processed {name}")
+                    
+                    # Update progress
+                    progress_bar.progress(completed / len(source_files))
                 
-                except Exception as e:
-                    st.error(f"❌ Error processing {source_file.name}: {str(e)}")
+                status_text.text("✅ Processing complete!")
                 
-                # Update progress
-                progress_bar.progress((i + 1) / len(source_files))
-            
-            status_text.text("✅ Processing complete!")
-            
-            if st.session_state.processed_files:
-                st.success(f"🎉 Successfully processed {len(st.session_state.processed_files)} out of {len(source_files)} files")
-            else:
-                st.warning("⚠️ No files were successfully processed")
+                summary = batch_processor.summary
+                if st.session_state.processed_files:
+                    st.success(f"🎉 Successfully processed {len(st.session_state.processed_files)} out of {len(source_files)} files")
+                else:
+                    st.warning("⚠️ No files were successfully processed")
+                
+                if summary['extraction']['documents']:
+                    st.caption("Extraction tiers: " + ", ".join(
+                        f"{tier} ran on {stats['share']:.0%} of documents ({stats['avg_ms']:.0f} ms avg)"
+                        for tier, stats in summary['extraction']['tiers'].items()))
+                    if summary['extraction']['ocr_pages']:
+                        st.caption(f"OCR: {summary['extraction']['ocr_pages']} scanned page(s), "
+                                   f"{summary['extraction']['ocr_cache_hits']} served from the OCR cache")
+                
+                if summary.get('fill_cache'):
+                    cache_summary = summary['fill_cache']
+                    st.caption(f"Fill cache: {cache_summary['hits']} hit(s), {cache_summary['misses']} miss(es) "
+                               f"({cache_summary['hit_rate']:.0%} hit rate)")
+                
+                if summary.get('workers'):
+                    st.caption("Workers: " + ", ".join(
+                        f"pid {pid}: {w['clones']} fill(s), {w['templates']} warm template(s)" +
+                        (f", {w['max_rss_mb']} MB peak RSS" if w['max_rss_mb'] is not None else "")
+                        for pid, w in sorted(summary['workers'].items())))
+                    schedule = summary['schedule']
+                    st.caption(f"Schedule: {schedule['tasks']} task(s) for {schedule['documents']} document(s) "
+                               f"({schedule['split_documents']} split by page range), "
+                               f"{schedule['wall_seconds']:.1f}s vs {schedule['ideal_seconds']:.1f}s ideal")
+                    transport = summary['transport']
+                    st.caption(f"Payload transport ({transport['mode']}): an estimated "
+                               f"{transport['modeled_bytes_copied_per_document'] / 1024:.0f} KB copied per document "
+                               f"(pickle: {transport['modeled_pickle_bytes_copied_per_document'] / 1024:.0f} KB), "
+                               f"modeled from payload sizes")
+                
+                if summary.get('recycling'):
+                    recycled = {reason: count for reason, count in summary['recycling']['recycled'].items() if count}
+                    if recycled:
+                        st.caption("Recycled workers: " + ", ".join(
+                            f"{count} ({reason.replace('_', ' ')})" for reason, count in recycled.items()))
+                
+                if summary.get('verification'):
+                    verification = summary['verification']
+                    st.caption(f"Fill verification: {verification['fields_checked']} field(s) read back from "
+                               f"{verification['documents']} file(s) in {verification['ms']:.0f} ms, "
+                               f"{verification['mismatched']} file(s) with differences")
+                
+                if summary['flagged']:
+                    st.warning(f"🚩 {len(summary['flagged'])} file(s) flagged: " + "; ".join(
+                        f"{f['name']} ({', '.join(flag.replace('_', ' ') for flag in f['flags'])})"
+                        for f in summary['flagged']))
+                if summary['memory']:
+                    st.caption("Largest per-file memory: " + ", ".join(
+                        f"{key.replace('_mb', '').replace('_', ' ')} {value:.0f} MB"
+                        for key, value in sorted(summary['memory'].items())))
+                
+                if summary['resumed']:
+                    st.info(f"⏯️ Resumed batch {summary['batch_id']}: {summary['resumed']} file(s) restored "
+                            f"from the checkpoint, {summary['total'] - summary['resumed']} processed in this run")
+                
+                if summary['duplicates']:
+                    st.info(f"♻️ {summary['duplicates']} duplicate upload(s) reused the result of "
+                            f"{len(summary['duplicate_groups'])} unique document(s); "
+                            f"{summary['unique']} unique document(s) processed")
+    
+    # Background jobs survive the session that queued them
+    if operator:
+        st.header("⏳ Background Jobs")
+        show_background_jobs(operator)
     
     # Results and Download Section
     if st.session_state.processed_files:
@@ -144,12 +436,61 @@ def main():
                 col1, col2 = st.columns([2, 1])
                 
                 with col1:
-                    st.write("**Extracted Data Preview:**")
-                    for key, value in file_info['parsed_data'].items():
-                        if value and str(value).strip():
-                            st.write(f"• **{key}**: {value}")
+                    st.write("**Extracted Data (edit values to correct the filled PDF):**")
+                    parsed_data = file_info['parsed_data']
+                    review_rows = [{'field': key, 'value': parsed_data.get(key) or ''}
+                                   for key in CORRECTABLE_FIELDS]
+                    edited_rows = st.data_editor(
+                        review_rows,
+                        column_config={'field': st.column_config.TextColumn("Field", disabled=True),
+                                       'value': st.column_config.TextColumn("Value")},
+                        hide_index=True,
+                        key=f"review_{i}"
+                    )
+                    
+                    corrections = {row['field']: (row['value'] or '').strip()
+                                   for row in edited_rows
+                                   if (row['value'] or '').strip() != (parsed_data.get(row['field']) or '')}
+                    
+                    if st.button(f"💾 Apply {len(corrections)} correction(s)", key=f"correct_{i}",
+                                 disabled=not corrections):
+                        corrected_pdf = get_correction_filler().apply_corrections(file_info['pdf_data'], corrections)
+                        if corrected_pdf:
+                            verified = FormFiller.verify_incremental_update(file_info['pdf_data'], corrected_pdf)
+                            corrected_data = parsed_data.to_dict()
+                            corrected_data.update(corrections)
+                            corrected_data = KYCRecord.from_dict({k: v for k, v in corrected_data.items() if v})
+                            
+                            file_info['pdf_data'] = corrected_pdf
+                            file_info.pop('output_hash', None)
+                            # The read-back described the original fill
+                            file_info.pop('verification', None)
+                            file_info['parsed_data'] = corrected_data
+                            file_info['revisions'] = file_info.get('revisions', 0) + 1
+                            
+                            record_store = get_record_store()
+                            record_store.add(file_info['source_hash'], file_info['original_name'],
+                                             corrected_data, output_name=file_info['output_name'])
+                            record_store.flush()
+                            
+                            if verified:
+                                st.success(f"✅ Applied {len(corrections)} correction(s); original bytes preserved")
+                            else:
+                                st.warning("⚠️ Corrections applied, but the original bytes could not be verified")
+                        else:
+                            st.error(f"❌ Failed to apply corrections to {file_info['output_name']}")
                 
                 with col2:
+                    if file_info.get('revisions'):
+                        st.caption(f"Corrected {file_info['revisions']} time(s) via incremental save")
+                    verification = file_info.get('verification')
+                    if verification and not verification['ok']:
+                        st.warning("⚠️ Fill verification: " + "; ".join(
+                            [f"{m['field']} is '{m['actual']}', expected '{m['expected']}'"
+                             for m in verification['mismatches']] +
+                            [f"{field} is missing from the output" for field in verification['missing']]))
+                    elif verification:
+                        st.caption(f"✔️ {verification['checked']} filled field(s) verified")
                     st.download_button(
                         label="📥 Download PDF",
                         data=file_info['pdf_data'],
@@ -157,6 +498,14 @@ def main():
                         mime="application/pdf",
                         key=f"download_{i}"
                     )
+                
+                # Thumbnails render only on request, not for every result on every rerun
+                if st.toggle("🖼️ Show page thumbnails", key=f"thumbnails_{i}"):
+                    if not file_info.get('output_hash'):
+                        file_info['output_hash'] = hash_bytes(file_info['pdf_data'])
+                    thumbnails = get_page_thumbnails(file_info['output_hash'], preview_dpi, file_info['pdf_data'])
+                    st.image(thumbnails, caption=[f"Page {page}" for page in range(1, len(thumbnails) + 1)],
+                             width=160)
         
         # Bulk download option
         if len(st.session_state.processed_files) > 1:
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from kyc_record import KYCRecord
+
+DEFAULT_CHECKPOINT_DIR = './.batch_checkpoints'
+# Checkpoints not written to for this long are pruned (see prune_checkpoints)
+DEFAULT_CHECKPOINT_MAX_AGE = 7 * 24 * 3600
+
+# Results that a rerun would reproduce exactly; 'error' results are retried instead
+FINAL_STATUSES = ('success', 'no_text', 'no_data', 'fill_failed')
+
+
+def batch_id_for(source_hashes: Iterable[str]) -> str:
+    """Stable id for a batch: the same set of source documents always maps to the same journal"""
+    digest = hashlib.sha256()
+    for source_hash in sorted(set(source_hashes)):
+        digest.update(source_hash.encode('ascii'))
+    return digest.hexdigest()[:16]
+
+
+def parsed_hash(record) -> Optional[str]:
+    """SHA-256 of a parsed record's canonical JSON (None when nothing was parsed)"""
+    if not record:
+        return None
+    if not isinstance(record, KYCRecord):
+        record = KYCRecord.from_dict(record)
+    return hashlib.sha256(record.to_json().encode('utf-8')).hexdigest()
+
+
+def remove_checkpoint(checkpoint_dir: str, batch_id: str) -> None:
+    """Delete one batch's journal and its filled PDFs"""
+    shutil.rmtree(os.path.join(checkpoint_dir, batch_id), ignore_errors=True)
+    try:
+        os.remove(os.path.join(checkpoint_dir, f"{batch_id}.jsonl"))
+    except OSError:
+        pass
+
+
+def prune_checkpoints(checkpoint_dir: str, max_age: float = DEFAULT_CHECKPOINT_MAX_AGE) -> int:
+    """
+    Delete checkpoints whose journal has not been written to for max_age seconds
+
+    Batches interrupted and never resumed would otherwise keep their journal
+    and filled PDFs forever. Output directories left without a journal are
+    removed by the same age rule.
+
+    Returns:
+        int: Number of batches removed
+    """
+    cutoff = time.time() - max_age
+    try:
+        batch_ids = {name[:-len('.jsonl')] if name.endswith('.jsonl') else name
+                     for name in os.listdir(checkpoint_dir)}
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for batch_id in batch_ids:
+        journal_path = os.path.join(checkpoint_dir, f"{batch_id}.jsonl")
+        try:
+            last_written = os.path.getmtime(journal_path if os.path.exists(journal_path)
+                                            else os.path.join(checkpoint_dir, batch_id))
+        except OSError:
+            continue
+        if last_written < cutoff:
+            remove_checkpoint(checkpoint_dir, batch_id)
+            removed += 1
+    return removed
+
+
+class BatchJournal:
+    """
+    Durable checkpoint journal for one batch
+
+    Every finished document appends one JSON line (status, output path, parsed
+    data and its hash) that is fsynced before the document counts as done;
+    filled PDFs are written to the batch's output directory first. Reopening
+    the journal replays it, so a restarted run knows exactly which documents
+    are complete. A line torn by a crash is ignored.
+    """
+
+    def __init__(self, batch_id: str, checkpoint_dir: str = DEFAULT_CHECKPOINT_DIR):
+        """
+        Args:
+            batch_id: Batch identifier (see batch_id_for)
+            checkpoint_dir: Directory holding journals and per-batch output directories
+        """
+        self.batch_id = batch_id
+        self.journal_path = os.path.join(checkpoint_dir, f"{batch_id}.jsonl")
+        self.output_dir = os.path.join(checkpoint_dir, batch_id)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._replay()
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _replay(self) -> None:
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._entries[entry['source_hash']] = entry
+        except FileNotFoundError:
+            pass
+
+    def completed(self, source_hash: str) -> Optional[Dict]:
+        """The journal entry of a finished document, or None if it must be (re)processed"""
+        entry = self._entries.get(source_hash)
+        if entry is None or entry['status'] not in FINAL_STATUSES:
+            return None
+        if entry['output_path'] and not os.path.exists(entry['output_path']):
+            return None
+        return entry
+
+    def record(self, result: Dict) -> Dict:
+        """
+        Checkpoint one document's pipeline result
+
+        Args:
+            result: BatchProcessor result dict (source_hash, original_name, status,
+                output_name, pdf_data, parsed_data, error, and any flags, memory
+                and verification)
+
+        Returns:
+            dict: The journal entry written
+        """
+        output_path = None
+        if result.get('pdf_data'):
+            output_path = os.path.join(self.output_dir, f"{result['source_hash']}.pdf")
+            tmp_path = f"{output_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(result['pdf_data'])
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, output_path)
+
+        parsed_data = result.get('parsed_data')
+        entry = {
+            'source_hash': result['source_hash'],
+            'source_name': result['original_name'],
+            'status': result['status'],
+            'output_name': result.get('output_name'),
+            'output_path': output_path,
+            'parsed_hash': parsed_hash(parsed_data),
+            'parsed': parsed_data.to_dict() if isinstance(parsed_data, KYCRecord) else (parsed_data or None),
+            'extraction_tier': result.get('extraction_tier'),
+            'error': result.get('error'),
+            'flags': result.get('flags') or None,
+            'memory': result.get('memory') or None,
+            'verification': result.get('verification'),
+            'recorded_at': time.time()
+        }
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._entries[entry['source_hash']] = entry
+        return entry
+
+    def restore(self, entry: Dict) -> Dict:
+        """Rebuild the result fields of a completed document from its journal entry"""
+        pdf_data = None
+        if entry['output_path']:
+            with open(entry['output_path'], 'rb') as f:
+                pdf_data = f.read()
+        parsed_data = KYCRecord.from_dict(entry['parsed']) if entry['parsed'] else None
+        if parsed_data is not None and parsed_hash(parsed_data) != entry['parsed_hash']:
+            raise ValueError(f"Checkpointed data for {entry['source_name']} does not match its hash")
+        restored = {
+            'status': entry['status'],
+            'output_name': entry['output_name'],
+            'pdf_data': pdf_data,
+            'parsed_data': parsed_data,
+            'extraction_tier': entry['extraction_tier'],
+            'error': entry['error']
+        }
+        # Journals written before these were recorded simply lack them
+        for key in ('flags', 'memory', 'verification'):
+            if entry.get(key) is not None:
+                restored[key] = entry[key]
+        return restored
+
+    def progress(self) -> Dict[str, int]:
+        """Count of journaled documents per status"""
+        counts: Dict[str, int] = {}
+        for entry in self._entries.values():
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
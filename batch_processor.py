@@ -0,0 +1,780 @@
+import io
+import multiprocessing
+import os
+import time
+import tracemalloc
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pdf_processor import EXTRACTION_TIERS, ExtractionStats, PDFProcessor
+from data_parser import DataParser
+from form_filler import FormFiller
+from ocr_stage import DEFAULT_OCR_CACHE_DIR, OCRStage
+from fill_cache import FillCache
+from payload_transport import (TRANSPORT_SHARED_MEMORY, PayloadHandle, TransportStats, attach,
+                               release, share_bytes, take_bytes)
+from record_store import STATUS_FAILED, hash_bytes
+from batch_journal import FINAL_STATUSES, BatchJournal, batch_id_for, prune_checkpoints, remove_checkpoint
+from template_pool import get_worker_template_pool
+from worker_pool import (DocumentMemoryExceeded, DocumentTimeout, RecyclingProcessPool, WorkerCrashed,
+                         peak_rss_mb, process_rss_mb)
+
+# Per-document result statuses
+RESULT_SUCCESS = 'success'
+RESULT_SKIPPED = 'skipped'
+RESULT_NO_TEXT = 'no_text'
+RESULT_NO_DATA = 'no_data'
+RESULT_FILL_FAILED = 'fill_failed'
+RESULT_ERROR = 'error'
+
+_CACHE_COUNTERS = ('hits', 'memory_hits', 'misses', 'stores', 'evictions')
+
+# Scheduling cost of parsing and filling one document, in page-extraction units
+FILL_COST_PAGES = 2
+
+# Documents whose measured memory growth exceeds this are flagged in the run summary
+DEFAULT_FLAG_DOCUMENT_MB = 256
+
+# Result flags for documents the run report should single out
+FLAG_TIMEOUT = 'timeout'
+FLAG_MEMORY_CAP = 'memory_cap'
+FLAG_WORKER_CRASHED = 'worker_crashed'
+FLAG_HIGH_MEMORY = 'high_memory'
+FLAG_FILL_MISMATCH = 'fill_mismatch'
+
+_POOL_FAILURE_FLAGS = ((DocumentTimeout, FLAG_TIMEOUT), (DocumentMemoryExceeded, FLAG_MEMORY_CAP),
+                       (WorkerCrashed, FLAG_WORKER_CRASHED))
+
+
+class SourceBuffer(io.BytesIO):
+    """In-memory source PDF carrying the .name attribute the pipeline expects"""
+
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+
+def read_source_bytes(source) -> bytes:
+    """Return the full contents of an uploaded file (or file object) without moving its pointer"""
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    source.seek(0)
+    data = source.read()
+    source.seek(0)
+    return data
+
+
+def output_name_for(source_name: str) -> str:
+    """Output naming convention: original_filename_filled.pdf"""
+    return f"{os.path.splitext(source_name)[0]}_filled.pdf"
+
+
+def new_result(source_name: Optional[str], source_hash: str, status: str = RESULT_ERROR) -> Dict:
+    return {
+        'original_name': source_name,
+        'source_hash': source_hash,
+        'status': status,
+        'output_name': None,
+        'pdf_data': None,
+        'parsed_data': None,
+        'extracted_text': '',
+        'extraction_tier': None,
+        'extraction_attempts': [],
+        'error': None,
+        'identity_matches': [],
+        'fill_cache_delta': None
+    }
+
+
+def run_pipeline(pdf_processor: PDFProcessor, data_parser: DataParser, form_filler: FormFiller,
+                 source, source_hash: str, source_name: Optional[str] = None, fill: bool = True,
+                 verify: bool = False) -> Dict:
+    """
+    Run extract/parse/fill for one document
+
+    Never touches the record store, so the same function runs in the calling
+    process and in pool workers.
+
+    Args:
+        source: File object with .name, or a bytes/memoryview buffer
+        source_hash: SHA-256 of the source bytes
+        source_name: Display name (defaults to source.name)
+        fill: False stops after parsing (the result succeeds without pdf_data)
+        verify: Read the filled fields back and record the diff in result['verification']
+
+    Returns:
+        dict: Result with status, parsed_data, pdf_data, output_name and error
+    """
+    source_name = source_name or source.name
+    result = new_result(source_name, source_hash)
+
+    try:
+        # Extract text from source PDF, escalating tiers only when the text scores poorly
+        extraction = pdf_processor.extract_text_tiered(source, data_parser)
+        result.update(extracted_text=extraction['text'], extraction_tier=extraction['tier'],
+                      extraction_attempts=extraction['attempts'], parsed_data=extraction['record'])
+    except Exception as e:
+        result.update(status=RESULT_ERROR, error=str(e))
+        return result
+
+    return fill_from_text(data_parser, form_filler, result, fill=fill, verify=verify)
+
+
+def fill_from_text(data_parser: DataParser, form_filler: FormFiller, result: Dict, fill: bool = True,
+                   verify: bool = False) -> Dict:
+    """
+    Parse result['extracted_text'] and fill the template (unless fill is False), completing a pipeline result
+
+    A result whose parsed_data is already set (the record extraction scored
+    the text with) is not parsed again.
+
+    With verify, the filled fields are read back (FormFiller.verify_fill); a
+    fill that did not write what was intended keeps its success status but is
+    flagged 'fill_mismatch'.
+    """
+    try:
+        extracted_text = result['extracted_text']
+        if not extracted_text.strip():
+            result.update(status=RESULT_NO_TEXT, error="No text could be extracted")
+            return result
+
+        # Parse extracted data, unless tiered extraction already did
+        parsed_data = result['parsed_data']
+        if parsed_data is None:
+            parsed_data = result['parsed_data'] = data_parser.parse_record(extracted_text)
+        if not parsed_data:
+            result.update(status=RESULT_NO_DATA, error="No relevant data could be parsed")
+            return result
+        if not fill:
+            result['status'] = RESULT_SUCCESS
+            return result
+
+        # Fill the template with parsed data (using default EditablePdf.pdf)
+        fill_cache = form_filler.fill_cache
+        cache_before = fill_cache.snapshot() if fill_cache is not None else None
+        filled_pdf = form_filler.fill_template_with_default(parsed_data)
+        if fill_cache is not None:
+            cache_after = fill_cache.snapshot()
+            result['fill_cache_delta'] = {k: cache_after[k] - cache_before[k] for k in _CACHE_COUNTERS}
+        if not filled_pdf:
+            result.update(status=RESULT_FILL_FAILED, error="Failed to fill template")
+            return result
+
+        result['status'] = RESULT_SUCCESS
+        result['pdf_data'] = filled_pdf
+        result['output_name'] = output_name_for(result['original_name'])
+        if verify:
+            result['verification'] = form_filler.verify_fill(filled_pdf, parsed_data)
+            if not result['verification']['ok']:
+                result['flags'] = result.get('flags', []) + [FLAG_FILL_MISMATCH]
+        return result
+
+    except Exception as e:
+        result.update(status=RESULT_ERROR, error=str(e))
+        return result
+
+
+def merge_page_extractions(extractions: List[Dict]) -> Tuple[str, Optional[str], List[Dict]]:
+    """
+    Combine the page-range extractions of one document, in page order
+
+    Returns:
+        tuple: (document text, most escalated tier used, one merged attempt per tier tried)
+    """
+    attempts: Dict[str, Dict] = {}
+    final_tier = None
+    for extraction in extractions:
+        for attempt in extraction['attempts']:
+            merged = attempts.setdefault(attempt['tier'], {
+                'tier': attempt['tier'], 'score': attempt['score'], 'seconds': 0.0, 'accepted': False
+            })
+            merged['score'] = min(merged['score'], attempt['score'])
+            merged['seconds'] = round(merged['seconds'] + attempt['seconds'], 4)
+            merged['accepted'] = merged['accepted'] or attempt['accepted']
+            if 'ocr' in attempt:
+                ocr = merged.setdefault('ocr', {'pages': 0, 'ocr_pages': 0, 'cache_hits': 0, 'dpi': []})
+                for key in ('pages', 'ocr_pages', 'cache_hits'):
+                    ocr[key] += attempt['ocr'][key]
+                ocr['dpi'].extend(attempt['ocr']['dpi'])
+        tier = extraction['tier']
+        if tier and (final_tier is None or EXTRACTION_TIERS.index(tier) > EXTRACTION_TIERS.index(final_tier)):
+            final_tier = tier
+    text = "\n".join(extraction['text'] for extraction in extractions if extraction['text'])
+    # Tiers in escalation order, as the single-document path reports them
+    ordered = [attempts[tier] for tier in EXTRACTION_TIERS if tier in attempts]
+    return text, final_tier, ordered
+
+
+# Pipeline components of a pool worker, created once per process by init_worker
+_worker_components: Optional[Tuple[PDFProcessor, DataParser, FormFiller]] = None
+_worker_shares_output = False
+_worker_verifies_fills = False
+
+
+def worker_config(pdf_processor: PDFProcessor, form_filler: FormFiller, max_templates: int = 4,
+                  transport: str = TRANSPORT_SHARED_MEMORY, trace_memory: bool = False,
+                  verify_fills: bool = False) -> Dict:
+    """Picklable settings from which a worker process rebuilds an equivalent pipeline"""
+    fill_cache = form_filler.fill_cache
+    ocr_stage = pdf_processor.ocr_stage
+    if ocr_stage is None:
+        ocr_cache_dir = DEFAULT_OCR_CACHE_DIR
+    else:
+        ocr_cache_dir = ocr_stage.cache.cache_dir if ocr_stage.cache else None
+    return {
+        'default_template_path': form_filler.default_template_path,
+        'fill_cache_dir': fill_cache.cache_dir if fill_cache is not None else None,
+        'fill_cache_max_bytes': fill_cache.max_bytes if fill_cache is not None else 0,
+        'max_templates': max_templates,
+        'ocr_cache_dir': ocr_cache_dir,
+        'transport': transport,
+        'trace_memory': trace_memory,
+        'verify_fills': verify_fills
+    }
+
+
+def build_pipeline(config: Dict) -> Tuple[PDFProcessor, DataParser, FormFiller]:
+    """Create a worker process's pipeline components from worker_config() settings"""
+    fill_cache = None
+    if config['fill_cache_dir']:
+        fill_cache = FillCache(config['fill_cache_dir'], max_bytes=config['fill_cache_max_bytes'])
+    form_filler = FormFiller(fill_cache=fill_cache,
+                             template_pool=get_worker_template_pool(config['max_templates']))
+    form_filler.default_template_path = config['default_template_path']
+    # OCR runs in-process here; the worker pool already spreads documents across CPUs
+    ocr_stage = OCRStage(workers=1, cache_dir=config['ocr_cache_dir'])
+    return PDFProcessor(ocr_stage=ocr_stage), DataParser(), form_filler
+
+
+def init_worker(config: Dict) -> None:
+    """Pool initializer: build this worker's pipeline from worker_config() settings"""
+    global _worker_components, _worker_shares_output, _worker_verifies_fills
+    _worker_components = build_pipeline(config)
+    _worker_shares_output = config['transport'] == TRANSPORT_SHARED_MEMORY
+    _worker_verifies_fills = config.get('verify_fills', False)
+    if config.get('trace_memory'):
+        tracemalloc.start()
+
+
+def _open_payload(payload):
+    """Map a shared-memory payload, or pass pickled bytes through: (segment or None, buffer)"""
+    if isinstance(payload, PayloadHandle):
+        return attach(payload)
+    return None, payload
+
+
+def _close_payload(segment, view) -> None:
+    if segment is not None:
+        view.release()
+        segment.close()
+
+
+def memory_mark() -> Tuple[Optional[float], Optional[float]]:
+    """
+    Start measuring one document's memory: (RSS, peak RSS) of this process in MB
+
+    Also resets the tracemalloc peak when tracing is on, so document_memory()
+    reports this document's Python-level peak alone.
+    """
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    return process_rss_mb(), peak_rss_mb()
+
+
+def document_memory(mark: Tuple[Optional[float], Optional[float]]) -> Dict:
+    """
+    Memory one document cost since memory_mark(), in MB
+
+    rss_delta_mb is what the process kept after the document, peak_growth_mb
+    how far it pushed the process's peak RSS (MuPDF allocates outside Python,
+    so tracemalloc alone misses it), and python_peak_mb the tracemalloc peak.
+    Figures the platform cannot provide are left out.
+    """
+    rss_before, peak_before = mark
+    memory = {}
+    rss_after = process_rss_mb()
+    if rss_before is not None and rss_after is not None:
+        memory['rss_delta_mb'] = round(rss_after - rss_before, 1)
+    if peak_before is not None:
+        memory['peak_growth_mb'] = round(max(0.0, peak_rss_mb() - peak_before), 1)
+    if tracemalloc.is_tracing():
+        memory['python_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+    return memory
+
+
+def merge_memory(first: Optional[Dict], second: Optional[Dict]) -> Optional[Dict]:
+    """Combine the memory figures of two tasks of one document, keeping the larger of each"""
+    if not first or not second:
+        return first or second
+    return {key: max(first.get(key, 0.0), second.get(key, 0.0)) for key in first.keys() | second.keys()}
+
+
+def _worker_finish(result: Dict, start: float, mark) -> Dict:
+    if _worker_shares_output and result.get('pdf_data') is not None:
+        # The parent copies the payload out and unlinks the segment
+        output_segment, result['pdf_data'] = share_bytes(result['pdf_data'])
+        output_segment.close()
+    result['task_seconds'] = time.perf_counter() - start
+    result['memory'] = document_memory(mark)
+    result['worker'] = _worker_components[2].template_pool.stats()
+    return result
+
+
+def worker_run(name: str, payload, source_hash: str) -> Dict:
+    """Run the whole pipeline on one document"""
+    start, mark = time.perf_counter(), memory_mark()
+    pdf_processor, data_parser, form_filler = _worker_components
+    segment, view = _open_payload(payload)
+    try:
+        result = run_pipeline(pdf_processor, data_parser, form_filler, view, source_hash, source_name=name,
+                              verify=_worker_verifies_fills)
+    finally:
+        _close_payload(segment, view)
+    return _worker_finish(result, start, mark)
+
+
+def worker_extract_pages(payload, first_page: int, stop_page: int) -> Dict:
+    """Extract one page range of a split document"""
+    start, mark = time.perf_counter(), memory_mark()
+    pdf_processor = _worker_components[0]
+    segment, view = _open_payload(payload)
+    try:
+        # A page range cannot be scored by field hits, so escalation follows the printable ratio
+        extraction = pdf_processor.extract_text_tiered(view, pages=(first_page, stop_page))
+    finally:
+        _close_payload(segment, view)
+    return _worker_finish(extraction, start, mark)
+
+
+def worker_fill(name: str, source_hash: str, text: str, tier: Optional[str], attempts: List[Dict]) -> Dict:
+    """Parse and fill a split document from its merged page-range text"""
+    start, mark = time.perf_counter(), memory_mark()
+    _, data_parser, form_filler = _worker_components
+    result = new_result(name, source_hash)
+    result.update(extracted_text=text, extraction_tier=tier, extraction_attempts=attempts)
+    return _worker_finish(fill_from_text(data_parser, form_filler, result, verify=_worker_verifies_fills),
+                          start, mark)
+
+
+class BatchProcessor:
+    """Runs the extract/parse/fill pipeline over a batch of source PDFs"""
+
+    def __init__(self, pdf_processor: Optional[PDFProcessor] = None,
+                 data_parser: Optional[DataParser] = None,
+                 form_filler: Optional[FormFiller] = None,
+                 record_store=None, skip_processed: bool = False,
+                 workers: int = 1, max_templates: int = 4,
+                 transport: str = TRANSPORT_SHARED_MEMORY, split_pages: int = 20,
+                 checkpoint_dir: Optional[str] = None, discard_checkpoints: bool = False,
+                 checkpoint_max_age: Optional[float] = None,
+                 max_document_seconds: Optional[float] = None, max_document_mb: Optional[float] = None,
+                 recycle_after: Optional[int] = None, recycle_worker_mb: Optional[float] = None,
+                 flag_document_mb: float = DEFAULT_FLAG_DOCUMENT_MB, trace_memory: bool = False,
+                 verify_fills: bool = False):
+        """
+        Args:
+            pdf_processor: PDFProcessor instance (created when omitted)
+            data_parser: DataParser instance (created when omitted)
+            form_filler: FormFiller instance (created when omitted)
+            record_store: Optional RecordStore that receives every result
+            skip_processed: Skip documents the record store already processed successfully
+            workers: Worker processes; 1 runs the pipeline in the calling process
+            max_templates: Warm templates each worker keeps in its template pool
+            transport: How payloads reach workers: 'shared_memory' or 'pickle'
+            split_pages: Pool runs split documents longer than this into page-range extraction tasks
+            checkpoint_dir: Journal every finished document here so an interrupted batch can resume
+            discard_checkpoints: Delete a batch's journal and filled PDFs once every document has a final status
+            checkpoint_max_age: Before each batch, delete checkpoints not written to for this many seconds
+            max_document_seconds: Kill the worker of a task running longer than this and fail its document
+            max_document_mb: Kill the worker of a task growing its RSS by more than this and fail its document
+            recycle_after: Replace each worker after this many tasks
+            recycle_worker_mb: Replace a worker whose RSS exceeds this after a task
+            flag_document_mb: Flag documents whose measured memory growth exceeds this
+            trace_memory: Track each document's Python allocation peak in pool workers (tracemalloc);
+                off by default, as tracing every allocation roughly doubles batch time
+            verify_fills: Read back every filled PDF's target fields and flag documents whose fill differs
+
+        Any cap or recycling option runs documents in worker processes even
+        with workers=1, so a pathological document's memory never stays in
+        the calling process.
+        """
+        self.pdf_processor = pdf_processor or PDFProcessor()
+        self.data_parser = data_parser or DataParser()
+        self.form_filler = form_filler or FormFiller()
+        self.record_store = record_store
+        self.skip_processed = skip_processed and record_store is not None
+        self.workers = max(1, workers)
+        self.max_templates = max_templates
+        self.transport = transport
+        self.split_pages = max(1, split_pages)
+        self.checkpoint_dir = checkpoint_dir
+        self.discard_checkpoints = discard_checkpoints
+        self.checkpoint_max_age = checkpoint_max_age
+        self.max_document_seconds = max_document_seconds or None
+        self.max_document_mb = max_document_mb or None
+        self.recycle_after = recycle_after or None
+        self.recycle_worker_mb = recycle_worker_mb or None
+        self.flag_document_mb = flag_document_mb
+        self.trace_memory = trace_memory
+        self.verify_fills = verify_fills
+        self.summary: Dict = {}
+
+    def process(self, sources: List) -> Iterator[Tuple[int, Dict]]:
+        """
+        Process a batch, running the pipeline once per unique document
+
+        Sources are hashed up front; byte-identical uploads (even under different
+        filenames) are processed once and the result is fanned out to every copy.
+        With workers > 1, unique documents run in a process pool, largest first,
+        and results are yielded in completion order.
+
+        With a checkpoint_dir, each finished document is journaled (and its filled
+        PDF written out) before it is yielded. Running the same set of sources
+        again resumes: journaled documents are restored instead of reprocessed.
+        With discard_checkpoints, the checkpoint is deleted once the batch runs
+        to the end without a document that a rerun would retry.
+
+        Args:
+            sources: Uploaded files (objects with .name and .getvalue() or .read())
+
+        Yields:
+            tuple: (number of sources completed so far, result dict for one source)
+        """
+        groups: Dict[str, List] = {}
+        for source in sources:
+            groups.setdefault(hash_bytes(read_source_bytes(source)), []).append(source)
+
+        self.summary = {
+            'total': len(sources),
+            'unique': len(groups),
+            'duplicates': len(sources) - len(groups),
+            'duplicate_groups': {
+                copies[0].name: [c.name for c in copies[1:]]
+                for copies in groups.values() if len(copies) > 1
+            },
+            RESULT_SUCCESS: 0,
+            RESULT_SKIPPED: 0,
+            'failed': 0,
+            'resumed': 0,
+            # Largest per-document figures of this run, and the documents flagged in it
+            'memory': {},
+            'flagged': []
+        }
+        if self.verify_fills:
+            self.summary['verification'] = {'documents': 0, 'mismatched': 0, 'fields_checked': 0, 'ms': 0.0}
+        if self.form_filler.fill_cache is not None:
+            self.summary['fill_cache'] = dict.fromkeys(_CACHE_COUNTERS, 0)
+        extraction_stats = ExtractionStats()
+
+        journal = None
+        if self.checkpoint_dir:
+            if self.checkpoint_max_age is not None:
+                prune_checkpoints(self.checkpoint_dir, self.checkpoint_max_age)
+            journal = BatchJournal(batch_id_for(groups), self.checkpoint_dir)
+            self.summary['batch_id'] = journal.batch_id
+
+        processed = self.record_store.processed_hashes(groups) if self.skip_processed else set()
+        # Journaled documents whose record store rows were still buffered when an earlier run died
+        unstored = set()
+        if journal is not None and self.record_store is not None:
+            journaled = [source_hash for source_hash in groups if journal.completed(source_hash)]
+            unstored = set(journaled) - self.record_store.recorded_hashes(journaled)
+        # Stays True while every document ends in a status a rerun would not retry
+        clean = True
+        try:
+            jobs = {}
+            completed = 0
+            for source_hash, copies in groups.items():
+                restored = self._restore(journal, source_hash, copies[0].name)
+                if restored is not None:
+                    self.summary['resumed'] += len(copies)
+                    self._finish(restored, store=source_hash in unstored)
+                    for copy_result in self._fan_out(restored, copies):
+                        completed += 1
+                        yield completed, copy_result
+                elif source_hash in processed:
+                    for copy_result in self._fan_out(new_result(None, source_hash, RESULT_SKIPPED), copies):
+                        completed += 1
+                        yield completed, copy_result
+                else:
+                    jobs[source_hash] = copies[0]
+
+            for result in self._run(jobs):
+                extraction_stats.add(result['extraction_attempts'])
+                self._finish(result)
+                clean = clean and result['status'] in FINAL_STATUSES
+                if journal is not None:
+                    journal.record(result)
+                for copy_result in self._fan_out(result, groups[result['source_hash']]):
+                    completed += 1
+                    yield completed, copy_result
+        finally:
+            if journal is not None:
+                journal.close()
+
+        # Reached only when the batch ran to the end; an interrupted one keeps its checkpoint
+        if journal is not None and self.discard_checkpoints and clean:
+            remove_checkpoint(self.checkpoint_dir, journal.batch_id)
+
+        if self.record_store is not None:
+            self.record_store.flush()
+        self.summary['extraction'] = extraction_stats.summary()
+        if 'fill_cache' in self.summary:
+            cache_summary = self.summary['fill_cache']
+            lookups = cache_summary['hits'] + cache_summary['misses']
+            cache_summary['hit_rate'] = round(cache_summary['hits'] / lookups, 3) if lookups else 0.0
+
+    @property
+    def isolated(self) -> bool:
+        """True when caps or recycling require every document to run in a worker process"""
+        return any((self.max_document_seconds, self.max_document_mb, self.recycle_after, self.recycle_worker_mb))
+
+    def _run(self, jobs: Dict) -> Iterator[Dict]:
+        """Yield one pipeline result per unique document"""
+        if not self.isolated and (self.workers == 1 or not jobs
+                                  or (len(jobs) == 1 and not self._is_split(*jobs.values()))):
+            for source_hash, source in jobs.items():
+                # tracemalloc is left alone here: starting it would slow the whole calling process
+                mark = memory_mark()
+                result = run_pipeline(self.pdf_processor, self.data_parser, self.form_filler,
+                                      source, source_hash, verify=self.verify_fills)
+                result['memory'] = document_memory(mark)
+                yield result
+            return
+        if not jobs:
+            return
+
+        config = worker_config(self.pdf_processor, self.form_filler, self.max_templates, self.transport,
+                               self.trace_memory, self.verify_fills)
+        # Per-worker template pool footprint, keyed by worker pid
+        self.summary['workers'] = {}
+        transport_stats = TransportStats(self.transport)
+        shared = self.transport == TRANSPORT_SHARED_MEMORY
+        schedule = {'documents': len(jobs), 'split_documents': 0, 'tasks': 0, 'pages': 0,
+                    'busy_seconds': 0.0, 'longest_task_seconds': 0.0}
+        # Earliest task start and latest completion, so worker start-up is not counted
+        first_start = last_done = None
+        # Per document: payload, input size, outstanding tasks and page-range extractions
+        documents = {}
+        # Input segments stay mapped in the parent until every task of their document completes
+        segments = {}
+        workers = min(self.workers, len(jobs))
+        try:
+            tasks = []
+            for source_hash, source in jobs.items():
+                data = read_source_bytes(source)
+                try:
+                    page_count = self.pdf_processor.count_pages(data)
+                except Exception:
+                    page_count = 1
+                if shared:
+                    segments[source_hash], payload = share_bytes(data)
+                else:
+                    payload = data
+                document = {'source': source, 'payload': payload, 'input_size': len(data),
+                            'sends': 1, 'extractions': None, 'outstanding': 1}
+                schedule['pages'] += page_count
+                if workers > 1 and page_count > self.split_pages:
+                    ranges = [(first, min(first + self.split_pages, page_count))
+                              for first in range(0, page_count, self.split_pages)]
+                    document.update(extractions=[None] * len(ranges), outstanding=len(ranges),
+                                    sends=len(ranges))
+                    schedule['split_documents'] += 1
+                    for index, (first, stop) in enumerate(ranges):
+                        tasks.append((stop - first, source_hash, index, (first, stop)))
+                else:
+                    tasks.append((page_count + FILL_COST_PAGES, source_hash, None, None))
+                documents[source_hash] = document
+                del data
+
+            # Largest estimated cost first, so the longest tasks never start last
+            tasks.sort(key=lambda task: task[0], reverse=True)
+
+            # Spawn rather than fork: the Streamlit server process is multi-threaded
+            executor = RecyclingProcessPool(workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=init_worker, initargs=(config,),
+                                            task_timeout=self.max_document_seconds,
+                                            task_memory_mb=self.max_document_mb,
+                                            max_tasks_per_worker=self.recycle_after,
+                                            max_worker_rss_mb=self.recycle_worker_mb)
+            self.summary['recycling'] = executor.stats
+            with executor:
+                futures = {}
+                for _, source_hash, index, pages in tasks:
+                    document = documents[source_hash]
+                    if pages is None:
+                        future = executor.submit(worker_run, document['source'].name,
+                                                 document['payload'], source_hash)
+                    else:
+                        future = executor.submit(worker_extract_pages, document['payload'], *pages)
+                    futures[future] = (source_hash, index)
+                schedule['tasks'] = len(futures)
+
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        source_hash, index = futures.pop(future)
+                        document = documents.get(source_hash)
+                        try:
+                            outcome = future.result()
+                        except Exception as e:
+                            outcome = None
+                            error = f"Worker failed: {str(e)}"
+                            flags = [flag for kind, flag in _POOL_FAILURE_FLAGS if isinstance(e, kind)]
+                        if outcome is not None:
+                            task_seconds = outcome.pop('task_seconds', 0.0)
+                            last_done = time.perf_counter()
+                            if first_start is None or last_done - task_seconds < first_start:
+                                first_start = last_done - task_seconds
+                            schedule['busy_seconds'] += task_seconds
+                            schedule['longest_task_seconds'] = max(schedule['longest_task_seconds'], task_seconds)
+                            worker = outcome.pop('worker', None)
+                            if worker:
+                                self.summary['workers'][worker['pid']] = worker
+                            if index is not None and document is not None:
+                                document['memory'] = merge_memory(document.get('memory'),
+                                                                  outcome.pop('memory', None))
+                        if document is None:
+                            # The document already failed through another of its page ranges
+                            continue
+
+                        document['outstanding'] -= 1
+                        if document['outstanding'] == 0 or outcome is None:
+                            release(segments.pop(source_hash, None), unlink=True)
+
+                        if outcome is not None and index is not None:
+                            document['extractions'][index] = outcome
+                            if document['outstanding'] == 0:
+                                # All page ranges are in: parse and fill as a task of its own
+                                text, tier, attempts = merge_page_extractions(document['extractions'])
+                                fill_future = executor.submit(worker_fill, document['source'].name,
+                                                              source_hash, text, tier, attempts)
+                                futures[fill_future] = (source_hash, None)
+                                pending.add(fill_future)
+                                schedule['tasks'] += 1
+                                document['extractions'] = None
+                            continue
+
+                        del documents[source_hash]
+                        if outcome is None:
+                            result = new_result(document['source'].name, source_hash)
+                            result['error'] = error
+                            if flags:
+                                result['flags'] = flags
+                        else:
+                            result = outcome
+                        memory = merge_memory(document.get('memory'), result.get('memory'))
+                        if memory:
+                            result['memory'] = memory
+                        if isinstance(result['pdf_data'], PayloadHandle):
+                            result['pdf_data'] = take_bytes(result['pdf_data'])
+                        transport_stats.add(document['input_size'], len(result['pdf_data'] or b''),
+                                            sends=document['sends'])
+                        yield result
+        finally:
+            for segment in segments.values():
+                release(segment, unlink=True)
+            self.summary['transport'] = transport_stats.summary()
+            wall_seconds = last_done - first_start if first_start is not None else 0.0
+            # Ideal makespan: busy time spread evenly, but never shorter than the longest task
+            ideal_seconds = max(schedule['busy_seconds'] / workers, schedule['longest_task_seconds'])
+            schedule.update(
+                busy_seconds=round(schedule['busy_seconds'], 3),
+                longest_task_seconds=round(schedule['longest_task_seconds'], 3),
+                wall_seconds=round(wall_seconds, 3),
+                ideal_seconds=round(ideal_seconds, 3),
+                efficiency=round(ideal_seconds / wall_seconds, 3) if wall_seconds else 0.0
+            )
+            self.summary['schedule'] = schedule
+
+    @staticmethod
+    def _restore(journal: Optional[BatchJournal], source_hash: str, source_name: str) -> Optional[Dict]:
+        """Result of a document completed by an earlier run of this batch, if any"""
+        if journal is None:
+            return None
+        entry = journal.completed(source_hash)
+        if entry is None:
+            return None
+        try:
+            restored = journal.restore(entry)
+        except (OSError, ValueError):
+            # Damaged checkpoint: process the document again
+            return None
+        result = new_result(source_name, source_hash)
+        result.update(restored, resumed=True)
+        return result
+
+    def _is_split(self, source) -> bool:
+        """True when a pool run would split this document into page ranges"""
+        try:
+            return self.pdf_processor.count_pages(read_source_bytes(source)) > self.split_pages
+        except Exception:
+            return False
+
+    def _finish(self, result: Dict, store: bool = True) -> None:
+        """
+        Record one unique document's result in the run summaries and (unless store is False) the record store
+
+        Results restored from the journal pass through here too, so the summaries
+        cover the whole batch; they are stored only when an earlier run died
+        before its buffered rows reached the store.
+        """
+        delta = result.pop('fill_cache_delta', None)
+        if delta and 'fill_cache' in self.summary:
+            for counter, value in delta.items():
+                self.summary['fill_cache'][counter] += value
+
+        memory = result.get('memory')
+        if memory:
+            self.summary['memory'] = merge_memory(self.summary['memory'], memory)
+            growth = max(memory.get('peak_growth_mb', 0.0), memory.get('python_peak_mb', 0.0))
+            if growth > self.flag_document_mb and FLAG_HIGH_MEMORY not in result.get('flags', []):
+                result['flags'] = result.get('flags', []) + [FLAG_HIGH_MEMORY]
+        verification = result.get('verification')
+        if verification is not None and 'verification' in self.summary:
+            totals = self.summary['verification']
+            totals['documents'] += 1
+            totals['mismatched'] += not verification['ok']
+            totals['fields_checked'] += verification['checked']
+            totals['ms'] = round(totals['ms'] + verification['ms'], 3)
+        if result.get('flags'):
+            self.summary['flagged'].append({
+                'name': result['original_name'],
+                'source_hash': result['source_hash'],
+                'flags': result['flags'],
+                'memory': memory,
+                'verification': verification,
+                'error': result['error']
+            })
+
+        if self.record_store is None or not store:
+            return
+        if result['status'] == RESULT_SUCCESS:
+            # Flag identities already onboarded from a different document
+            result['identity_matches'] = self.record_store.find_duplicates(
+                result['parsed_data'], exclude_hash=result['source_hash'])
+            self.record_store.add(result['source_hash'], result['original_name'], result['parsed_data'],
+                                  output_name=result['output_name'])
+        else:
+            self.record_store.add(result['source_hash'], result['original_name'], result['parsed_data'],
+                                  status=STATUS_FAILED, error=result['error'])
+
+    def _fan_out(self, result: Dict, copies: List) -> Iterator[Dict]:
+        """Yield one copy of result per source sharing its hash"""
+        result.pop('fill_cache_delta', None)
+        for copy_index, source in enumerate(copies):
+            copy_result = dict(result)
+            copy_result['original_name'] = source.name
+            if copy_index:
+                copy_result['duplicate_of'] = copies[0].name
+            if result['status'] == RESULT_SUCCESS:
+                copy_result['output_name'] = output_name_for(source.name)
+            self._count(copy_result)
+            yield copy_result
+
+    def _count(self, result: Dict) -> None:
+        if result['status'] in (RESULT_SUCCESS, RESULT_SKIPPED):
+            self.summary[result['status']] += 1
+        else:
+            self.summary['failed'] += 1
@@ -0,0 +1,183 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from latency_stats import percentile
+from synthetic_pdfs import write_corpus
+from worker_pool import peak_rss_mb
+
+DEFAULT_BENCH_DIR = './.bench'
+DEFAULT_SIZES = (1, 100, 10000)
+
+# Pipeline stages in order; each one reads the previous stage's output
+STAGES = ('extract', 'parse', 'fill')
+
+
+def ensure_corpus(corpus_dir: str, count: int, seed: int, preeti_ratio: float) -> List[str]:
+    """Paths of the first count documents of the corpus, generating it when it is too small"""
+    manifest_path = os.path.join(corpus_dir, 'manifest.jsonl')
+    entries = []
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+    if len(entries) < count:
+        # Documents are drawn in sequence from the seed, so a larger corpus keeps the smaller one's files
+        write_corpus(corpus_dir, count, seed=seed, preeti_ratio=preeti_ratio)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+    return [os.path.join(corpus_dir, entry['file']) for entry in entries[:count]]
+
+
+def run_stage(stage: str, paths: List[str], work_dir: str) -> Dict:
+    """
+    Time one pipeline stage over the documents in this process
+
+    extract reads the PDFs and writes texts.jsonl, parse reads it and writes
+    records.jsonl, and fill fills the template from those records.
+    """
+    from data_parser import DataParser
+    from kyc_record import KYCRecord
+
+    texts_path = os.path.join(work_dir, f'texts_{len(paths)}.jsonl')
+    records_path = os.path.join(work_dir, f'records_{len(paths)}.jsonl')
+    timings: List[float] = []
+    outcomes: Dict[str, int] = {}
+
+    def count(outcome: str) -> None:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    if stage == 'extract':
+        from pdf_processor import PDFProcessor
+        pdf_processor, data_parser = PDFProcessor(), DataParser()
+        baseline = peak_rss_mb()
+        with open(texts_path, 'w', encoding='utf-8') as out:
+            for path in paths:
+                start = time.perf_counter()
+                # Paths are opened lazily from disk, as the export CLI does
+                extraction = pdf_processor.extract_text_tiered(path, data_parser)
+                timings.append(time.perf_counter() - start)
+                count(extraction['tier'] or 'no_text')
+                out.write(json.dumps({'file': path, 'text': extraction['text']}, ensure_ascii=False) + '\n')
+
+    elif stage == 'parse':
+        data_parser = DataParser()
+        baseline = peak_rss_mb()
+        with open(texts_path, 'r', encoding='utf-8') as texts, open(records_path, 'w', encoding='utf-8') as out:
+            for line in texts:
+                text = json.loads(line)['text']
+                start = time.perf_counter()
+                record = data_parser.parse_record(text)
+                timings.append(time.perf_counter() - start)
+                count('parsed' if record else 'no_data')
+                out.write(record.to_json() + '\n')
+
+    elif stage == 'fill':
+        from form_filler import FormFiller
+        from template_pool import TemplatePool
+        # Warm template pool, no fill cache: every document is filled
+        form_filler = FormFiller(fill_cache=None, template_pool=TemplatePool())
+        baseline = peak_rss_mb()
+        with open(records_path, 'r', encoding='utf-8') as records:
+            for line in records:
+                record = KYCRecord.from_json(line)
+                if not record:
+                    count('skipped')
+                    continue
+                start = time.perf_counter()
+                filled = form_filler.fill_template_with_default(record)
+                timings.append(time.perf_counter() - start)
+                count('filled' if filled else 'fill_failed')
+
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    seconds = sum(timings)
+    return {
+        'stage': stage,
+        'documents': len(paths),
+        'timed': len(timings),
+        'seconds': round(seconds, 3),
+        'docs_per_second': round(len(timings) / seconds, 1) if seconds else 0.0,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'outcomes': outcomes
+    }
+
+
+def run_suite(sizes, bench_dir: str = DEFAULT_BENCH_DIR, seed: int = 0, preeti_ratio: float = 0.3) -> Dict:
+    """
+    Benchmark every stage at every corpus size
+
+    Each (size, stage) runs in a fresh interpreter so its peak RSS belongs to
+    that stage and size alone.
+
+    Returns:
+        dict: Per size, the stage reports and end-to-end documents per second
+    """
+    corpus_dir = os.path.join(bench_dir, f'corpus_{seed}')
+    paths = ensure_corpus(corpus_dir, max(sizes), seed, preeti_ratio)
+    work_dir = os.path.join(bench_dir, 'work')
+    os.makedirs(work_dir, exist_ok=True)
+    list_path = os.path.join(work_dir, 'paths.json')
+
+    report = {'seed': seed, 'preeti_ratio': preeti_ratio, 'cpu_count': os.cpu_count(), 'sizes': {}}
+    for size in sizes:
+        with open(list_path, 'w', encoding='utf-8') as f:
+            json.dump(paths[:size], f)
+        stages = {}
+        for stage in STAGES:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--stage', stage, '--paths', list_path,
+                 '--work-dir', work_dir],
+                capture_output=True, text=True, check=True
+            )
+            stages[stage] = json.loads(completed.stdout.strip().splitlines()[-1])
+        total_seconds = sum(stage['seconds'] for stage in stages.values())
+        report['sizes'][str(size)] = {
+            'stages': stages,
+            'seconds': round(total_seconds, 3),
+            'docs_per_second': round(size / total_seconds, 1) if total_seconds else 0.0
+        }
+    return report
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"{'docs':>6} {'stage':<8} {'docs/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak RSS MB':>12} {'+MB':>7}"]
+    for size, result in report['sizes'].items():
+        for stage, stats in result['stages'].items():
+            lines.append(f"{size:>6} {stage:<8} {stats['docs_per_second']:>8} {stats['p50_ms']:>8} "
+                         f"{stats['p95_ms']:>8} {stats['peak_rss_mb']:>12} "
+                         f"{round(stats['peak_rss_mb'] - stats['baseline_rss_mb'], 1):>7}")
+        lines.append(f"{size:>6} {'total':<8} {result['docs_per_second']:>8}")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on synthetic source PDFs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Corpus sizes")
+    parser.add_argument('--bench-dir', default=DEFAULT_BENCH_DIR, help="Corpus and scratch directory")
+    parser.add_argument('--seed', type=int, default=0, help="Corpus random seed")
+    parser.add_argument('--preeti-ratio', type=float, default=0.3, help="Share of Preeti-encoded labels")
+    parser.add_argument('--output', help="Also write the JSON report here")
+    # Internal: run one stage in this process (used by run_suite)
+    parser.add_argument('--stage', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--paths', help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        with open(args.paths, 'r', encoding='utf-8') as f:
+            print(json.dumps(run_stage(args.stage, json.load(f), args.work_dir)))
+    else:
+        result = run_suite(sorted(set(args.sizes)), args.bench_dir, args.seed, args.preeti_ratio)
+        print(format_report(result))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
@@ -0,0 +1,277 @@
+import re
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+
+# Days in each month (Baisakh .. Chaitra) of every supported Bikram Sambat year.
+# BS month lengths follow the solar calendar and are published, not computed.
+BS_MIN_YEAR = 2000
+_BS_MONTH_DAYS = (
+    (30, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),  # 2000
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (30, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (31, 31, 31, 32, 31, 31, 29, 30, 30, 29, 29, 31),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),  # 2010
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (31, 31, 31, 32, 31, 31, 29, 30, 30, 29, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (31, 31, 31, 32, 31, 31, 29, 30, 30, 29, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),
+    (31, 31, 31, 32, 31, 31, 30, 29, 30, 29, 30, 30),  # 2020
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),
+    (31, 31, 31, 32, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (30, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 31, 32, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),  # 2030
+    (30, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (30, 32, 31, 32, 31, 31, 29, 30, 30, 29, 29, 31),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (31, 31, 31, 32, 31, 31, 29, 30, 30, 29, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),  # 2040
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (31, 31, 31, 32, 31, 31, 29, 30, 30, 29, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (31, 31, 31, 32, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),  # 2050
+    (31, 31, 31, 32, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 31, 32, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (30, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),  # 2060
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (30, 32, 31, 32, 31, 31, 29, 30, 29, 30, 29, 31),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (31, 31, 31, 32, 31, 31, 29, 30, 30, 29, 29, 31),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (31, 31, 31, 32, 31, 31, 29, 30, 30, 29, 30, 30),  # 2070
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 31),
+    (31, 31, 31, 32, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 30, 29, 31),
+    (31, 31, 31, 32, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 29, 30, 29, 30, 30),
+    (31, 32, 31, 32, 31, 30, 30, 30, 29, 29, 30, 30),  # 2080
+    (31, 31, 32, 32, 31, 30, 30, 30, 29, 30, 30, 30),
+    (30, 32, 31, 32, 31, 30, 30, 30, 29, 30, 30, 30),
+    (31, 31, 32, 31, 31, 30, 30, 30, 29, 30, 30, 30),
+    (31, 31, 32, 31, 31, 30, 30, 30, 29, 30, 30, 30),
+    (31, 32, 31, 32, 30, 31, 30, 30, 29, 30, 30, 30),
+    (30, 32, 31, 32, 31, 30, 30, 30, 29, 30, 30, 30),
+    (31, 31, 32, 31, 31, 31, 30, 30, 29, 30, 30, 30),
+    (30, 31, 32, 32, 30, 31, 30, 30, 29, 30, 30, 30),
+    (30, 32, 31, 32, 31, 30, 30, 30, 29, 30, 30, 30),
+    (30, 32, 31, 32, 31, 30, 30, 30, 29, 30, 30, 30),  # 2090
+)
+BS_MAX_YEAR = BS_MIN_YEAR + len(_BS_MONTH_DAYS) - 1
+
+# 1 Baisakh 2000 BS
+BS_EPOCH = date(1943, 4, 14)
+_EPOCH_ORDINAL = BS_EPOCH.toordinal()
+
+# Day offset (from BS_EPOCH) of the first day of each month, indexed by (year - BS_MIN_YEAR) * 12 + month - 1
+_MONTH_START: List[int] = []
+# Month index of every day in the supported range, indexed by day offset
+_DAY_MONTH: List[int] = []
+for _index, _days in enumerate(days for row in _BS_MONTH_DAYS for days in row):
+    _MONTH_START.append(len(_DAY_MONTH))
+    _DAY_MONTH.extend([_index] * _days)
+del _index, _days
+BS_DAY_COUNT = len(_DAY_MONTH)
+BS_LAST_DAY = date.fromordinal(_EPOCH_ORDINAL + BS_DAY_COUNT - 1)
+
+_DATE_PARTS = re.compile(r'^\s*(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\s*$')
+
+# Formatted dates of every supported day ('YYYY-MM-DD' both ways), built on first string conversion
+_BS_STRINGS: Optional[List[str]] = None
+_BS_TO_AD_STRINGS: Optional[dict] = None
+
+
+def bs_to_ad(year: int, month: int, day: int) -> date:
+    """
+    Gregorian date of a Bikram Sambat date
+
+    Raises:
+        ValueError: The date does not exist or lies outside BS_MIN_YEAR..BS_MAX_YEAR
+    """
+    if not BS_MIN_YEAR <= year <= BS_MAX_YEAR or not 1 <= month <= 12:
+        raise ValueError(f"BS date {year}-{month:02d}-{day:02d} is outside {BS_MIN_YEAR}-{BS_MAX_YEAR}")
+    if not 1 <= day <= _BS_MONTH_DAYS[year - BS_MIN_YEAR][month - 1]:
+        raise ValueError(f"BS month {year}-{month:02d} has no day {day}")
+    return date.fromordinal(_EPOCH_ORDINAL + _MONTH_START[(year - BS_MIN_YEAR) * 12 + month - 1] + day - 1)
+
+
+def ad_to_bs(value: date) -> Tuple[int, int, int]:
+    """
+    Bikram Sambat (year, month, day) of a Gregorian date
+
+    Raises:
+        ValueError: The date lies outside BS_EPOCH..BS_LAST_DAY
+    """
+    offset = value.toordinal() - _EPOCH_ORDINAL
+    if not 0 <= offset < BS_DAY_COUNT:
+        raise ValueError(f"AD date {value.isoformat()} is outside {BS_EPOCH.isoformat()}..{BS_LAST_DAY.isoformat()}")
+    index = _DAY_MONTH[offset]
+    return BS_MIN_YEAR + index // 12, index % 12 + 1, offset - _MONTH_START[index] + 1
+
+
+def _string_tables() -> Tuple[List[str], dict]:
+    """BS string per day offset, and BS string -> AD string, for every supported day"""
+    global _BS_STRINGS, _BS_TO_AD_STRINGS
+    if _BS_STRINGS is None:
+        bs_strings = [None] * BS_DAY_COUNT
+        for index, start in enumerate(_MONTH_START):
+            prefix = f"{BS_MIN_YEAR + index // 12}-{index % 12 + 1:02d}-"
+            for day in range(_BS_MONTH_DAYS[index // 12][index % 12]):
+                bs_strings[start + day] = f"{prefix}{day + 1:02d}"
+        _BS_TO_AD_STRINGS = {bs: date.fromordinal(_EPOCH_ORDINAL + offset).isoformat()
+                             for offset, bs in enumerate(bs_strings)}
+        _BS_STRINGS = bs_strings
+    return _BS_STRINGS, _BS_TO_AD_STRINGS
+
+
+def _parse_parts(value: str) -> Optional[Tuple[int, int, int]]:
+    match = _DATE_PARTS.match(value)
+    return tuple(int(part) for part in match.groups()) if match else None
+
+
+def ad_to_bs_str(value: Optional[str]) -> Optional[str]:
+    """
+    'YYYY-MM-DD' AD date string to its 'YYYY-MM-DD' BS equivalent
+
+    Single digits and '/' or '.' separators are accepted. Returns None for
+    empty, malformed or out-of-range dates.
+    """
+    if not value:
+        return None
+    bs_strings = _BS_STRINGS or _string_tables()[0]
+    try:
+        offset = date.fromisoformat(value).toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        parts = _parse_parts(value)
+        if parts is None:
+            return None
+        try:
+            offset = date(*parts).toordinal() - _EPOCH_ORDINAL
+        except ValueError:
+            return None
+    return bs_strings[offset] if 0 <= offset < BS_DAY_COUNT else None
+
+
+def bs_to_ad_str(value: Optional[str]) -> Optional[str]:
+    """
+    'YYYY-MM-DD' BS date string to its 'YYYY-MM-DD' AD equivalent
+
+    Single digits and '/' or '.' separators are accepted. Returns None for
+    empty, malformed or out-of-range dates.
+    """
+    if not value:
+        return None
+    ad_strings = _BS_TO_AD_STRINGS or _string_tables()[1]
+    converted = ad_strings.get(value)
+    if converted is None:
+        parts = _parse_parts(value)
+        if parts is not None:
+            converted = ad_strings.get(f"{parts[0]}-{parts[1]:02d}-{parts[2]:02d}")
+    return converted
+
+
+def ad_to_bs_column(values: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """ad_to_bs_str over a whole column of AD date strings"""
+    bs_strings = _BS_STRINGS or _string_tables()[0]
+    epoch, count = _EPOCH_ORDINAL, BS_DAY_COUNT
+    column = []
+    append = column.append
+    for value in values:
+        try:
+            offset = date.fromisoformat(value).toordinal() - epoch
+            append(bs_strings[offset] if 0 <= offset < count else None)
+        except (TypeError, ValueError):
+            append(ad_to_bs_str(value))
+    return column
+
+
+def bs_to_ad_column(values: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """bs_to_ad_str over a whole column of BS date strings"""
+    ad_strings = _BS_TO_AD_STRINGS or _string_tables()[1]
+    get = ad_strings.get
+    return [get(value) or bs_to_ad_str(value) if value else None for value in values]
+
+
+def complete_dates(ad_value: Optional[str], bs_value: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Fill whichever of an (AD, BS) date pair is missing from the other
+
+    When both are given but name different days, the AD date wins and the BS
+    date is replaced by its conversion (unless the AD date is outside the table).
+    """
+    if ad_value and not bs_value:
+        return ad_value, ad_to_bs_str(ad_value)
+    if bs_value and not ad_value:
+        return bs_to_ad_str(bs_value), bs_value
+    if ad_value and bs_value and bs_to_ad_str(bs_value) != ad_value:
+        return ad_value, ad_to_bs_str(ad_value) or bs_value
+    return ad_value, bs_value
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import random
+    import time
+
+    parser = argparse.ArgumentParser(description="Benchmark BS <-> AD date conversion")
+    parser.add_argument('--count', type=int, default=1_000_000, help="Dates converted per direction")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    _string_tables()
+    result = {'table_build_ms': round((time.perf_counter() - start) * 1000, 1), 'count': args.count}
+
+    ad_dates = [date.fromordinal(_EPOCH_ORDINAL + rng.randrange(BS_DAY_COUNT)).isoformat()
+                for _ in range(args.count)]
+    start = time.perf_counter()
+    bs_dates = ad_to_bs_column(ad_dates)
+    result['ad_to_bs_per_second'] = round(args.count / (time.perf_counter() - start))
+    start = time.perf_counter()
+    round_trip = bs_to_ad_column(bs_dates)
+    result['bs_to_ad_per_second'] = round(args.count / (time.perf_counter() - start))
+    result['round_trip_ok'] = round_trip == ad_dates
+    print(json.dumps(result))
@@ -1,6 +1,8 @@
 import re
 from typing import Dict, Optional, List
 import streamlit as st
+from kyc_record import KYCRecord
+from bs_calendar import complete_dates
 
 class DataParser:
     """Parses extracted text to identify and extract specific data fields"""
@@ -18,6 +20,11 @@ class DataParser:
                 r'AD[:\s]*:\s*(\d{4}-\d{2}-\d{2})',
                 r'hGd ldlt[:\s]+O\{=[:\s]*(\d{4}-\d{2}-\d{2})'
             ],
+            # Anchored to the date-of-birth block: other BS dates (e.g. Issue Date BS) must not match
+            'date_of_birth_bs': [
+                r'Date of Birth[:\s]+(?:AD[:\s]*\d{4}-\d{2}-\d{2}\s*)?(?:BS|B\.\s*S\.)[:\s]*(\d{4}[-/]\d{1,2}[-/]\d{1,2})',
+                r'hGd ldlt[:\s]+(?:O\{=[:\s]*\d{4}-\d{2}-\d{2}\s*)?(?:la=;\+=|BS|B\.\s*S\.)[:\s]*(\d{4}[-/]\d{1,2}[-/]\d{1,2})'
+            ],
             'gender': [
                 r'Gender[:\s]+([MF])(?=\s*(?:Nationality|Citizenship|$|\n))',
                 r'ln·[:\s]+([MF])(?=\s*(?:/fli6«otf|gful/stf|$|\n))'
@@ -319,6 +326,24 @@ class DataParser:
             st.error(f"Error parsing data: {str(e)}")
             return {}
     
+    def parse_record(self, text: str) -> KYCRecord:
+        """
+        Parse extracted text into a fixed-schema KYCRecord
+        
+        Args:
+            text: Extracted text from PDF
+            
+        Returns:
+            KYCRecord: Parsed data; evaluates to False when nothing was parsed.
+                A date of birth given only in AD or only in BS is completed
+                from the other (bs_calendar.py).
+        """
+        record = KYCRecord.from_dict(self.parse_data(text))
+        if record.date_of_birth or record.date_of_birth_bs:
+            record.date_of_birth, record.date_of_birth_bs = complete_dates(record.date_of_birth,
+                                                                           record.date_of_birth_bs)
+        return record
+    
     def _extract_basic_info(self, text: str) -> Dict:
         """Extract basic personal information"""
         data = {}
@@ -333,6 +358,9 @@ class DataParser:
         dob = self._extract_field(text, self.patterns['date_of_birth'])
         if dob:
             data['date_of_birth'] = dob.strip()
+        dob_bs = self._extract_field(text, self.patterns['date_of_birth_bs'])
+        if dob_bs:
+            data['date_of_birth_bs'] = dob_bs.strip()
         
         # Extract gender
         gender = self._extract_field(text, self.patterns['gender'])
@@ -1,7 +1,19 @@
 import PyPDF2
+import fitz  # PyMuPDF for direct xref access
 import json
+import re
+import time
 import streamlit as st
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+# Field attributes that a terminal field inherits from its ancestors
+INHERITABLE_KEYS = ('FT', 'Ff', 'V', 'MaxLen', 'Opt')
+
+_XREF_REF = re.compile(r'(\d+)\s+\d+\s+R')
+_PDF_STRING = re.compile(r'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>')
+_PDF_TOKEN = re.compile(r'/?[^\s/\[\]<>()]+|/')
+_PDF_ESCAPE = re.compile(r'\\([0-7]{1,3}|.)', re.DOTALL)
+_PDF_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'f': '\f', '\n': ''}
 
 def extract_form_fields_from_pdf(pdf_path: str) -> Dict[str, Any]:
     """
@@ -68,12 +80,352 @@ def extract_form_fields_from_pdf(pdf_path: str) -> Dict[str, Any]:
         st.error(f"Error extracting form fields: {str(e)}")
         return {}
 
+def _scan_value(text: str, i: int) -> int:
+    """Return the index just past the PDF object that starts at text[i]"""
+    n = len(text)
+    if text.startswith('<<', i):
+        depth = 0
+        while i < n:
+            if text.startswith('<<', i):
+                depth += 1
+                i += 2
+            elif text.startswith('>>', i):
+                depth -= 1
+                i += 2
+                if depth == 0:
+                    return i
+            elif text[i] == '(':
+                i = _scan_value(text, i)
+            else:
+                i += 1
+        return n
+    char = text[i]
+    if char == '[':
+        depth = 0
+        while i < n:
+            if text[i] == '[':
+                depth += 1
+            elif text[i] == ']':
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            elif text[i] == '(':
+                i = _scan_value(text, i)
+                continue
+            i += 1
+        return n
+    if char == '(':
+        depth = 0
+        while i < n:
+            if text[i] == '\\':
+                i += 2
+                continue
+            if text[i] == '(':
+                depth += 1
+            elif text[i] == ')':
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        return n
+    if char == '<':
+        return text.index('>', i) + 1
+    # Names, numbers, booleans and indirect references ("12 0 R")
+    match = _XREF_REF.match(text, i) or _PDF_TOKEN.match(text, i)
+    return match.end()
+
+
+def _parse_dict(text: str) -> Dict[str, str]:
+    """Split the top level of a PDF dictionary into raw key/value strings"""
+    entries = {}
+    i = text.find('<<') + 2
+    n = len(text)
+    while i < n:
+        while i < n and text[i] in ' \t\r\n':
+            i += 1
+        if i >= n or text.startswith('>>', i):
+            break
+        key_match = _PDF_TOKEN.match(text, i)
+        key = key_match.group(0)[1:]
+        i = key_match.end()
+        while i < n and text[i] in ' \t\r\n':
+            i += 1
+        end = _scan_value(text, i)
+        entries[key] = text[i:end]
+        i = end
+    return entries
+
+
+def _xref_list(value: str) -> List[int]:
+    """Extract the xrefs referenced by a PDF array such as '[12 0 R 13 0 R]'"""
+    return [int(ref) for ref in _XREF_REF.findall(value)]
+
+
+def _resolve_array(doc, value: Optional[str]) -> List[int]:
+    """Resolve an inline or indirect array value to the xrefs it references"""
+    if not value:
+        return []
+    ref = _XREF_REF.fullmatch(value.strip())
+    if ref:
+        value = doc.xref_object(int(ref.group(1)), compressed=True)
+    return _xref_list(value)
+
+
+def _parse_rect(value: str) -> List[float]:
+    """Parse a PDF rectangle array such as '[132 515.04 358.2 542.4]'"""
+    try:
+        return [float(v) for v in value.strip('[] ').split()]
+    except ValueError:
+        return []
+
+
+def _parse_options(value: str) -> List[Any]:
+    """Parse a choice field /Opt array into display strings or [export, display] pairs"""
+    options = []
+    body = value.strip()[1:-1]
+    i = 0
+    while i < len(body):
+        if body[i] in ' \t\r\n':
+            i += 1
+            continue
+        end = _scan_value(body, i)
+        token = body[i:end]
+        if token.startswith('['):
+            options.append([_decode_pdf_string(s) for s in _PDF_STRING.findall(token)])
+        else:
+            options.append(_decode_pdf_string(token))
+        i = end
+    return options
+
+
+def _decode_pdf_string(token: str) -> str:
+    """Decode a literal or hex PDF string token (PDFDocEncoding or UTF-16BE)"""
+    if token.startswith('<'):
+        try:
+            raw = bytes.fromhex(re.sub(r'\s', '', token[1:-1]))
+        except ValueError:
+            return ''
+    elif token.startswith('('):
+        raw = _PDF_ESCAPE.sub(_unescape, token[1:-1]).encode('latin-1', errors='replace')
+    else:
+        # Names such as /Off are returned as-is
+        return token
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', errors='replace')
+    return raw.decode('latin-1')
+
+
+def _unescape(match) -> str:
+    escaped = match.group(1)
+    if escaped[0] in '01234567':
+        return chr(int(escaped, 8) & 0xFF)
+    return _PDF_ESCAPES.get(escaped, escaped)
+
+
+def _build_annot_page_index(doc) -> Dict[int, int]:
+    """Map every annotation xref to its 1-based page number in one pass over /Annots"""
+    annot_pages = {}
+    for page_num in range(doc.page_count):
+        page_dict = _parse_dict(doc.xref_object(doc.page_xref(page_num), compressed=True))
+        for annot_xref in _resolve_array(doc, page_dict.get('Annots')):
+            annot_pages[annot_xref] = page_num + 1
+    return annot_pages
+
+
+def build_field_manifest(pdf_path: Optional[str] = None, pdf_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Build a complete form field manifest by walking the AcroForm field tree once
+
+    Each field object is read with a single xref_object call and parsed in Python,
+    and rect/page information is recorded for every field rather than only on a
+    fallback path.
+
+    Args:
+        pdf_path: Path to the PDF template
+        pdf_bytes: PDF template as bytes (used instead of pdf_path when given)
+
+    Returns:
+        dict: Manifest keyed by fully qualified field name
+    """
+    try:
+        if pdf_bytes is not None:
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        else:
+            doc = fitz.open(pdf_path)
+    except Exception as e:
+        st.error(f"Error opening PDF for field manifest: {str(e)}")
+        return {}
+
+    try:
+        kind, value = doc.xref_get_key(doc.pdf_catalog(), 'AcroForm/Fields')
+        if kind not in ('array', 'xref'):
+            return {}
+        root_fields = _resolve_array(doc, value)
+
+        annot_pages = _build_annot_page_index(doc)
+        page_numbers = {doc.page_xref(i): i + 1 for i in range(doc.page_count)}
+        objects = {}
+        manifest = {}
+
+        def read(xref: int) -> Dict[str, str]:
+            if xref not in objects:
+                objects[xref] = _parse_dict(doc.xref_object(xref, compressed=True))
+            return objects[xref]
+
+        def page_of(xref: int, keys: Dict[str, str]) -> Optional[int]:
+            if xref in annot_pages:
+                return annot_pages[xref]
+            ref = _XREF_REF.fullmatch(keys.get('P', ''))
+            return page_numbers.get(int(ref.group(1))) if ref else None
+
+        # Iterative depth-first walk: (xref, parent qualified name, inherited attributes)
+        visited = set()
+        stack = [(xref, '', {}) for xref in reversed(root_fields)]
+        while stack:
+            xref, parent_name, inherited = stack.pop()
+            if xref in visited:
+                continue
+            visited.add(xref)
+
+            keys = read(xref)
+            attrs = dict(inherited)
+            for key in INHERITABLE_KEYS:
+                if key in keys:
+                    attrs[key] = keys[key]
+
+            partial_name = _decode_pdf_string(keys['T']) if 'T' in keys else ''
+            full_name = f"{parent_name}.{partial_name}" if parent_name and partial_name else (partial_name or parent_name)
+
+            child_fields = []
+            widgets = []
+            for kid in _resolve_array(doc, keys.get('Kids')):
+                # Kids with their own /T are child fields, others are widget annotations
+                (child_fields if 'T' in read(kid) else widgets).append(kid)
+
+            stack.extend((kid, full_name, attrs) for kid in reversed(child_fields))
+
+            # Intermediate nodes that only group child fields are not fields themselves
+            if child_fields and not widgets:
+                continue
+
+            kids = [{
+                "xref": widget_xref,
+                "rect": _parse_rect(read(widget_xref).get('Rect', '')),
+                "page": page_of(widget_xref, read(widget_xref))
+            } for widget_xref in widgets]
+
+            if 'Rect' in keys:
+                rect = _parse_rect(keys['Rect'])
+                page = page_of(xref, keys)
+            elif kids:
+                rect = kids[0]['rect']
+                page = kids[0]['page']
+            else:
+                rect, page = [], None
+
+            field_value = _decode_pdf_string(attrs['V']) if 'V' in attrs else ''
+            manifest[full_name] = {
+                "field_name": full_name,
+                "field_type": attrs.get('FT', 'unknown'),
+                "field_value": field_value if field_value.strip() else "",
+                "flags": int(attrs['Ff']) if 'Ff' in attrs else 0,
+                "max_len": int(attrs['MaxLen']) if 'MaxLen' in attrs else None,
+                "options": _parse_options(attrs['Opt']) if 'Opt' in attrs else [],
+                "rect": rect,
+                "page": page,
+                "xref": xref,
+                "kids": kids,
+                "method": "xref"
+            }
+
+        return manifest
+
+    except Exception as e:
+        st.error(f"Error building field manifest: {str(e)}")
+        return {}
+    finally:
+        doc.close()
+
+
+def benchmark_field_extraction(pdf_path: str, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Compare build_field_manifest against extract_form_fields_from_pdf
+
+    Args:
+        pdf_path: Path to the PDF template
+        repeat: Number of timed runs per function (best run is reported)
+
+    Returns:
+        dict: Field counts and best/mean timings in milliseconds per function
+    """
+    results = {}
+    for label, func in (('extract_form_fields_from_pdf', extract_form_fields_from_pdf),
+                        ('build_field_manifest', build_field_manifest)):
+        timings = []
+        fields = {}
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fields = func(pdf_path)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[label] = {
+            'fields': len(fields),
+            'with_rect': sum(1 for f in fields.values() if f.get('rect')),
+            'best_ms': round(min(timings), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3)
+        }
+    baseline = results['extract_form_fields_from_pdf']['best_ms']
+    fast = results['build_field_manifest']['best_ms']
+    results['speedup'] = round(baseline / fast, 2) if fast else None
+    return results
+
+
+def make_synthetic_form(output_path: str, field_count: int, fields_per_page: int = 50):
+    """Write a template with field_count text widgets for benchmarking large forms"""
+    doc = fitz.open()
+    page = None
+    for i in range(field_count):
+        if i % fields_per_page == 0:
+            page = doc.new_page()
+        row = i % fields_per_page
+        widget = fitz.Widget()
+        widget.field_name = f"Field {i}"
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.rect = fitz.Rect(50, 20 + row * 15, 300, 32 + row * 15)
+        page.add_widget(widget)
+    doc.save(output_path)
+    doc.close()
+
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract the form field manifest of a PDF template")
+    parser.add_argument('pdf', nargs='?', default='./EditablePdf.pdf', help="PDF template to scan")
+    parser.add_argument('--output', default='editable_pdf_fields.json', help="Manifest JSON output path")
+    parser.add_argument('--legacy', action='store_true', help="Use the PyPDF2-based extractor")
+    parser.add_argument('--benchmark', action='store_true', help="Time both extractors instead of writing JSON")
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help="Benchmark against a generated template with N fields")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        pdf_path = args.pdf
+        if args.synthetic:
+            import os
+            import tempfile
+            pdf_path = os.path.join(tempfile.mkdtemp(), f'synthetic_{args.synthetic}.pdf')
+            make_synthetic_form(pdf_path, args.synthetic)
+        print(json.dumps(benchmark_field_extraction(pdf_path), indent=2))
+        raise SystemExit(0)
+
     # Extract fields from EditablePdf.pdf
-    fields = extract_form_fields_from_pdf('./EditablePdf.pdf')
+    if args.legacy:
+        fields = extract_form_fields_from_pdf(args.pdf)
+    else:
+        fields = build_field_manifest(args.pdf)
     
     # Save to JSON file
-    with open('editable_pdf_fields.json', 'w', encoding='utf-8') as f:
+    with open(args.output, 'w', encoding='utf-8') as f:
         json.dump(fields, f, indent=2, ensure_ascii=False)
     
     print(f"Extracted {len(fields)} form fields:")
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+DEFAULT_CACHE_DIR = './.fill_cache'
+
+
+class FillCache:
+    """
+    Content-addressed cache of filled PDFs
+
+    Entries are keyed by hash(template bytes, normalized field updates, fill options)
+    and stored on disk under a total size cap with least-recently-used eviction.
+    The most recent entries are also kept in a small in-memory LRU so repeated
+    hits never touch the disk.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 512 * 1024 * 1024,
+                 memory_max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Directory holding cached PDFs
+            max_bytes: Disk size cap; least recently used entries are evicted beyond it
+            memory_max_bytes: Size cap of the in-memory layer (0 disables it)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._memory_bytes = 0
+        self.stats = {'hits': 0, 'memory_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # Disk index in least-recently-used order: key -> size
+        self._index: 'OrderedDict[str, int]' = OrderedDict()
+        entries = []
+        for name in os.listdir(cache_dir):
+            if name.endswith('.pdf'):
+                stat = os.stat(os.path.join(cache_dir, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+        self._disk_bytes = sum(self._index.values())
+
+    @staticmethod
+    def make_key(template_digest: str, field_updates: Dict, options: Optional[Dict] = None) -> str:
+        """Build the cache key from a template digest, field updates and fill options"""
+        normalized = json.dumps(
+            {'updates': {str(k): str(v) for k, v in field_updates.items()}, 'options': options or {}},
+            sort_keys=True, ensure_ascii=False, separators=(',', ':')
+        )
+        return hashlib.sha256(f"{template_digest}\0{normalized}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def template_digest(template_bytes: bytes) -> str:
+        return hashlib.sha256(template_bytes).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached PDF bytes, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                if key in self._index:
+                    self._index.move_to_end(key)
+                self.stats['hits'] += 1
+                self.stats['memory_hits'] += 1
+                return data
+            if key not in self._index:
+                self.stats['misses'] += 1
+                return None
+            self._index.move_to_end(key)
+
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            with self._lock:
+                self._forget(key)
+                self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self.stats['hits'] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a filled PDF and evict least recently used entries beyond max_bytes"""
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if key in self._index:
+                self._disk_bytes -= self._index[key]
+            self._index[key] = len(data)
+            self._index.move_to_end(key)
+            self._disk_bytes += len(data)
+            self.stats['stores'] += 1
+            self._remember(key, data)
+            while self._disk_bytes > self.max_bytes and self._index:
+                old_key, _ = next(iter(self._index.items()))
+                self._forget(old_key)
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+                self.stats['evictions'] += 1
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if not self.memory_max_bytes or len(data) > self.memory_max_bytes:
+            return
+        if key not in self._memory:
+            self._memory_bytes += len(data)
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _forget(self, key: str) -> None:
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+
+    def snapshot(self) -> Dict:
+        """Copy of the counters, for measuring one run as a difference of snapshots"""
+        with self._lock:
+            return dict(self.stats)
+
+    def summary(self, since: Optional[Dict] = None) -> Dict:
+        """
+        Hit-rate summary, optionally relative to an earlier snapshot()
+
+        Returns:
+            dict: hits, memory_hits, misses, stores, evictions, hit_rate, entries, disk_bytes
+        """
+        current = self.snapshot()
+        if since:
+            current = {k: v - since.get(k, 0) for k, v in current.items()}
+        lookups = current['hits'] + current['misses']
+        current['hit_rate'] = round(current['hits'] / lookups, 3) if lookups else 0.0
+        current['entries'] = len(self._index)
+        current['disk_bytes'] = self._disk_bytes
+        return current
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._memory.clear()
+            self._disk_bytes = 0
+            self._memory_bytes = 0
@@ -1,19 +1,43 @@
 import PyPDF2
 import io
+import os
+import tempfile
+import time
 import fitz  # PyMuPDF for better form handling
 from typing import Dict, Optional
 import streamlit as st
+from kyc_record import KYCRecord
+from bs_calendar import complete_dates
+from fill_cache import FillCache
+
+# Bump whenever fill_template output changes for the same inputs (invalidates cached fills)
+FILL_FORMAT_VERSION = 5
 
 
 class FormFiller:
     """Handles filling editable PDF forms with extracted data"""
 
-    def __init__(self):
+    def __init__(self, fill_cache: Optional[FillCache] = None, template_pool=None):
+        # Optional content-addressed cache of filled PDFs
+        self.fill_cache = fill_cache
+
+        # Optional TemplatePool of pre-parsed templates (used by batch workers)
+        self.template_pool = template_pool
+
+        # Options that affect fill output; part of the fill cache key
+        self.fill_options = {'format_version': FILL_FORMAT_VERSION}
+
+        # Last template seen by fill_template and its digest, so the digest is computed once
+        self._template_digest_source = None
+        self._template_digest = None
+        self._field_index = None  # (template digest, field name -> [(page index, widget xref, field xref)])
+
         # Mapping between parsed data keys and actual PDF form field names from EditablePdf.pdf
         self.field_mapping = {
             # Personal Information
             'name': 'Name In Block Letter',
             'date_of_birth': 'O    A D',  # Date of Birth AD field
+            'date_of_birth_bs': 'la  B S',  # Date of Birth BS field
             'citizenship_no': 'Citizenship Number',
             'beneficiary_id': 'Beneficiary ID Number',
             'pan_no': 'PAN',
@@ -36,7 +60,7 @@ class FormFiller:
             'permanent_country': 'Permanent Address Country',
             'permanent_province': 'Permanent Address Province',
             'permanent_district': 'Permanent Address District',
-            'permanent_municipality': 'Permanent Address Municipality',
+            'permanent_municipality': 'Permanent municipality',
             'permanent_ward_no': 'Permanent Ward Number',
             'permanent_tole': 'Permanent Address Tole',
             'permanent_telephone': 'Permanent Telephone Number',
@@ -53,14 +77,11 @@ class FormFiller:
             'temporary_mobile': 'Temporary Mobile Number',
             'temporary_email': 'Temporary Email Address',
 
-            # Financial Details
-            'income_limit': 'Financial Details',
-
             # Family Members
             'father_name': "Father",
             'mother_name': "Mother",
             'grandfather_name': "GrandFather",
-            'spouse_name': "Spouse's Name",
+            'spouse_name': "Spouse",
             'son_name': "Son",
             'daughter_name': "Daughter",
 
@@ -93,8 +114,17 @@ class FormFiller:
             'current': 'Current Account'
         }
 
+        # Income limit checkbox mappings; the template's box names are offset from
+        # their printed labels ('Financial Details' is the "Upto Rs. 5,00,000" box)
+        self.income_limit_mapping = {
+            'upto': 'Financial Details',
+            'between': 'Upto Rs 500000',
+            'above': 'From Rs 500001 to Rs 1000000'
+        }
+
         # Default template path
         self.default_template_path = './EditablePdf.pdf'
+        self._default_template = None  # (mtime, bytes)
 
     def fill_template_with_default(self, parsed_data: Dict) -> Optional[bytes]:
         """
@@ -107,9 +137,8 @@ class FormFiller:
             bytes: Filled PDF as bytes, or None if failed
         """
         try:
-            # Read the default template
-            with open(self.default_template_path, 'rb') as f:
-                template_bytes = f.read()
+            # Read the default template (kept in memory until the file changes)
+            template_bytes = self._load_default_template()
 
             # Create a mock file object for compatibility
             class MockFile:
@@ -135,6 +164,20 @@ class FormFiller:
             st.error(f"Error loading default template: {str(e)}")
             return None
 
+    def _load_default_template(self) -> bytes:
+        """Return the default template bytes, re-reading only when the file changes"""
+        mtime = os.path.getmtime(self.default_template_path)
+        if self._default_template is None or self._default_template[0] != mtime:
+            with open(self.default_template_path, 'rb') as f:
+                self._default_template = (mtime, f.read())
+        return self._default_template[1]
+
+    def _get_template_digest(self, template_bytes: bytes) -> str:
+        if self._template_digest_source is not template_bytes:
+            self._template_digest = FillCache.template_digest(template_bytes)
+            self._template_digest_source = template_bytes
+        return self._template_digest
+
     def fill_template(self, template_file,
                       parsed_data: Dict) -> Optional[bytes]:
         """
@@ -152,67 +195,51 @@ class FormFiller:
             template_file.seek(0)
             template_bytes = template_file.read()
 
-            # Use PyMuPDF for form handling
-            doc = fitz.open(stream=template_bytes, filetype="pdf")
-
             # Prepare field updates based on our mapping
             field_updates = self._prepare_field_updates(parsed_data, {})
 
-            # Get all form fields in the document
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                widgets = page.widgets()
-
-                if widgets:
-                    # st.info(f"Found {len(widgets)} form fields on page {page_num + 1}")
-
-                    for widget in widgets:
-                        field_name = widget.field_name
-                        if field_name in field_updates:
-                            try:
-                                # Set the field value
-                                value = str(field_updates[field_name])
-
-                                # Handle different field types
-                                if widget.field_type == fitz.PDF_WIDGET_TYPE_TEXT:
-                                    # Apply improved text formatting for names
-                                    formatted_value = self._format_text_for_field(value, field_name, widget)
-                                    widget.field_value = formatted_value
-                                    
-                                    # Apply font size optimization for name fields
-                                    self._optimize_font_size(widget, field_name, formatted_value)
-                                    
-                                    widget.update()
-                                elif widget.field_type == fitz.PDF_WIDGET_TYPE_CHECKBOX:
-                                    # For checkboxes, set based on Yes/On values
-                                    if value.lower() in [
-                                            'yes', 'on', 'true', '1'
-                                    ]:
-                                        widget.field_value = True
-                                    else:
-                                        widget.field_value = False
-                                    widget.update()
-                                elif widget.field_type == fitz.PDF_WIDGET_TYPE_RADIOBUTTON:
-                                    # For radio buttons
-                                    if value.lower() in [
-                                            'yes', 'on', 'true', '1'
-                                    ]:
-                                        widget.field_value = True
-                                    else:
-                                        widget.field_value = False
-                                    widget.update()
-
-                                # st.success(f"Updated field '{field_name}' with value '{value}'")
-
-                            except Exception as widget_error:
-                                st.warning(
-                                    f"Could not update field '{field_name}': {str(widget_error)}"
-                                )
-                        else:
-                            # Debug: show unmapped fields (using info instead of debug)
-                            pass  # st.info(f"Field '{field_name}' not in mapping")
-                else:
-                    st.warning(f"No form fields found on page {page_num + 1}")
+            # Serve identical fills (same template, updates and options) from the cache
+            cache_key = None
+            if self.fill_cache is not None:
+                cache_key = FillCache.make_key(self._get_template_digest(template_bytes),
+                                               field_updates, self.fill_options)
+                cached_pdf = self.fill_cache.get(cache_key)
+                if cached_pdf is not None:
+                    return cached_pdf
+
+            if self.template_pool is not None:
+                # Clone the worker's pre-parsed template and load only the widgets being filled
+                doc = self._fill_warm_template(template_bytes, field_updates)
+            else:
+                # Use PyMuPDF for form handling
+                doc = fitz.open(stream=template_bytes, filetype="pdf")
+
+                # Get all form fields in the document
+                for page_num in range(len(doc)):
+                    page = doc[page_num]
+                    widgets = page.widgets()
+
+                    if widgets:
+                        # st.info(f"Found {len(widgets)} form fields on page {page_num + 1}")
+
+                        for widget in widgets:
+                            field_name = widget.field_name
+                            if field_name in field_updates:
+                                try:
+                                    # Set the field value
+                                    self._set_widget_value(widget, field_name, str(field_updates[field_name]))
+
+                                    # st.success(f"Updated field '{field_name}' with value '{value}'")
+
+                                except Exception as widget_error:
+                                    st.warning(
+                                        f"Could not update field '{field_name}': {str(widget_error)}"
+                                    )
+                            else:
+                                # Debug: show unmapped fields (using info instead of debug)
+                                pass  # st.info(f"Field '{field_name}' not in mapping")
+                    else:
+                        st.warning(f"No form fields found on page {page_num + 1}")
 
             # Save the filled PDF
             output_buffer = io.BytesIO()
@@ -220,7 +247,11 @@ class FormFiller:
             doc.close()
             output_buffer.seek(0)
 
-            return output_buffer.getvalue()
+            filled_pdf = output_buffer.getvalue()
+            if cache_key is not None:
+                self.fill_cache.put(cache_key, filled_pdf)
+
+            return filled_pdf
 
         except Exception as e:
             st.error(f"Error filling PDF template: {str(e)}")
@@ -228,6 +259,261 @@ class FormFiller:
             st.error(f"Detailed error: {traceback.format_exc()}")
             return None
 
+    def _fill_warm_template(self, template_bytes: bytes, field_updates: Dict):
+        """Fill a fresh clone of the warm template, touching only the updated widgets"""
+        warm = self.template_pool.get(template_bytes, self._get_template_digest(template_bytes))
+        doc = self.template_pool.clone(warm)
+        pages = {}
+        for field_name, value in field_updates.items():
+            for page_index, widget_xref, _ in warm.field_index.get(field_name, []):
+                if page_index not in pages:
+                    pages[page_index] = doc[page_index]
+                try:
+                    widget = pages[page_index].load_widget(widget_xref)
+                    self._set_widget_value(widget, field_name, str(value))
+                except Exception as widget_error:
+                    st.warning(f"Could not update field '{field_name}': {str(widget_error)}")
+        return doc
+
+    def _set_widget_value(self, widget, field_name: str, value: str):
+        """Write one value into a widget according to its field type"""
+        # Handle different field types
+        if widget.field_type == fitz.PDF_WIDGET_TYPE_TEXT:
+            # Apply improved text formatting for names
+            formatted_value = self._format_text_for_field(value, field_name, widget)
+            widget.field_value = formatted_value
+
+            # Apply font size optimization for name fields
+            self._optimize_font_size(widget, field_name, formatted_value)
+
+            widget.update()
+        elif widget.field_type == fitz.PDF_WIDGET_TYPE_CHECKBOX:
+            # For checkboxes, set based on Yes/On values
+            if value.lower() in ['yes', 'on', 'true', '1']:
+                widget.field_value = True
+            else:
+                widget.field_value = False
+            widget.update()
+        elif widget.field_type == fitz.PDF_WIDGET_TYPE_RADIOBUTTON:
+            # For radio buttons
+            if value.lower() in ['yes', 'on', 'true', '1']:
+                widget.field_value = True
+            else:
+                widget.field_value = False
+            widget.update()
+
+    def _get_field_index(self, template_bytes: bytes) -> Dict:
+        """
+        Map each form field name to its widgets as (page index, widget xref, field xref)
+
+        Built once per template from the field manifest, so corrections can load
+        only the widgets they change.
+        """
+        digest = self._get_template_digest(template_bytes)
+        if self._field_index is None or self._field_index[0] != digest:
+            from field_extractor import build_field_manifest
+
+            index = {}
+            for name, field in build_field_manifest(pdf_bytes=template_bytes).items():
+                widgets = field['kids'] or [field]
+                index[name] = [(w['page'] - 1, w['xref'], field['xref']) for w in widgets if w['page']]
+            self._field_index = (digest, index)
+        return self._field_index[1]
+
+    def _prepare_correction_updates(self, corrections: Dict) -> Dict:
+        """
+        Translate corrected parsed-data values into form field updates
+
+        Unlike _prepare_field_updates, an empty value clears the field, and a
+        changed checkbox group is reset before the new box is ticked.
+        """
+        field_updates = {}
+        for data_key, value in corrections.items():
+            value = '' if value is None else str(value).strip()
+            if data_key in self.field_mapping:
+                field_updates[self.field_mapping[data_key]] = value
+            elif data_key == 'gender':
+                field_updates.update({field: 'Off' for field in self.gender_mapping.values()})
+            elif data_key == 'bank_account_type':
+                field_updates.update({field: 'Off' for field in self.account_type_mapping.values()})
+            elif data_key == 'occupation':
+                field_updates.update({field: 'Off' for field in self.occupation_mapping.values()})
+            elif data_key == 'income_limit':
+                field_updates.update({field: 'Off' for field in self.income_limit_mapping.values()})
+
+        checkbox_keys = {k: v for k, v in corrections.items()
+                         if k in ('gender', 'bank_account_type', 'occupation', 'income_limit') and v}
+        if checkbox_keys:
+            checkbox_updates = self._prepare_field_updates(checkbox_keys, {})
+            field_updates.update({k: v for k, v in checkbox_updates.items() if v == 'Yes'})
+        return field_updates
+
+    def apply_corrections(self, filled_pdf: bytes, corrections: Dict,
+                          template_bytes: Optional[bytes] = None) -> Optional[bytes]:
+        """
+        Write corrected values into an already-filled PDF with an incremental save
+
+        Only the widgets of the corrected fields are loaded and updated, and the
+        changes are appended after the original bytes, which stay intact (see
+        verify_incremental_update).
+
+        Args:
+            filled_pdf: Previously filled PDF as bytes
+            corrections: Parsed-data keys mapped to their corrected values
+            template_bytes: Template the PDF was filled from (default template when omitted)
+
+        Returns:
+            bytes: Corrected PDF as bytes, or None if failed
+        """
+        try:
+            if template_bytes is None:
+                template_bytes = self._load_default_template()
+            field_index = self._get_field_index(template_bytes)
+            field_updates = self._prepare_correction_updates(corrections)
+            if not field_updates:
+                return filled_pdf
+
+            # Incremental saves need the document to be backed by a file
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                pdf_path = os.path.join(tmp_dir, 'filled.pdf')
+                with open(pdf_path, 'wb') as f:
+                    f.write(filled_pdf)
+
+                doc = fitz.open(pdf_path)
+                pages = {}
+                for field_name, value in field_updates.items():
+                    for page_index, widget_xref, field_xref in field_index.get(field_name, []):
+                        if page_index not in pages:
+                            pages[page_index] = doc[page_index]
+                        try:
+                            widget = pages[page_index].load_widget(widget_xref)
+                            if value == '' and widget.field_type == fitz.PDF_WIDGET_TYPE_TEXT:
+                                # PyMuPDF ignores empty field values, so clear /V directly
+                                # and regenerate the appearance stream
+                                doc.xref_set_key(field_xref, 'V', '()')
+                                widget = pages[page_index].load_widget(widget_xref)
+                                widget.update()
+                                continue
+                            self._set_widget_value(widget, field_name, value)
+                        except Exception as widget_error:
+                            st.warning(f"Could not update field '{field_name}': {str(widget_error)}")
+                doc.saveIncr()
+                doc.close()
+
+                with open(pdf_path, 'rb') as f:
+                    return f.read()
+
+        except Exception as e:
+            st.error(f"Error applying corrections: {str(e)}")
+            return None
+
+    @staticmethod
+    def verify_incremental_update(original_pdf: bytes, corrected_pdf: bytes) -> bool:
+        """True when corrected_pdf is original_pdf with an appended incremental update"""
+        return len(corrected_pdf) >= len(original_pdf) and \
+            corrected_pdf[:len(original_pdf)] == original_pdf
+
+    def verify_fill(self, filled_pdf: bytes, parsed_data,
+                    template_bytes: Optional[bytes] = None) -> Dict:
+        """
+        Read back the fields a fill targeted and compare them with the intended updates
+
+        Only each target field's /FT and /V are read, by xref through the field
+        index of the document the fill was saved from (the warm template when a
+        template pool is used), so no page or widget is loaded. An output whose
+        xrefs do not match that index (e.g. a cached fill made by another path)
+        is indexed from its own field tree instead.
+
+        Only updates the template has a field for are compared, as those are
+        the ones fill_template applies; mapped fields the template lacks are
+        listed under skipped and do not fail the check.
+
+        Args:
+            filled_pdf: Output of fill_template for parsed_data
+            parsed_data: Parsed data the PDF was filled from (dict or KYCRecord)
+            template_bytes: Template the PDF was filled from (default template when omitted)
+
+        Returns:
+            dict: checked (fields read back), missing (applied fields absent from
+                the output), mismatches ([{field, expected, actual}]), skipped
+                (mapped fields the template lacks), ok and ms
+        """
+        start = time.perf_counter()
+        if template_bytes is None:
+            template_bytes = self._load_default_template()
+        if self.template_pool is not None:
+            digest = self._get_template_digest(template_bytes)
+            field_index = self.template_pool.get(template_bytes, digest).field_index
+        else:
+            field_index = self._get_field_index(template_bytes)
+        intended = self._prepare_field_updates(parsed_data, {})
+        field_updates = {name: value for name, value in intended.items() if field_index.get(name)}
+
+        doc = fitz.open(stream=filled_pdf, filetype="pdf")
+        try:
+            values = self._read_field_values(doc, field_index, field_updates)
+            if values is None:
+                from field_extractor import build_field_manifest
+
+                own_index = {name: [(None, None, field['xref'])]
+                             for name, field in build_field_manifest(pdf_bytes=filled_pdf).items()}
+                values = self._read_field_values(doc, own_index, field_updates)
+        finally:
+            doc.close()
+
+        missing = [name for name in field_updates if name not in values]
+        mismatches = []
+        for name, (field_type, actual) in values.items():
+            expected = str(field_updates[name])
+            if field_type == '/Btn':
+                token = expected.strip().lower()
+                if token in ('yes', 'on', 'true', '1'):
+                    matches = actual != 'Off'
+                else:
+                    # Anything but an on value leaves a checkbox unticked, so only 'off' values land
+                    matches = actual == 'Off' and token in ('off', 'no', 'false', '0', '')
+            else:
+                # Text is written whitespace-normalized (see _format_text_for_field)
+                matches = actual == ' '.join(expected.split())
+            if not matches:
+                mismatches.append({'field': name, 'expected': expected, 'actual': actual})
+
+        return {
+            'checked': len(values),
+            'missing': missing,
+            'mismatches': mismatches,
+            'skipped': [name for name in intended if name not in field_updates],
+            'ok': not missing and not mismatches,
+            'ms': round((time.perf_counter() - start) * 1000, 3)
+        }
+
+    @staticmethod
+    def _read_field_values(doc, field_index: Dict, field_updates: Dict) -> Optional[Dict]:
+        """
+        (field type, value) of each updated field found in field_index, read by field xref
+
+        Checkbox values are returned as their state name without the slash
+        ('Yes', 'Off'). Returns None when an xref does not hold the named field.
+        """
+        values = {}
+        xref_count = doc.xref_length()
+        for name in field_updates:
+            widgets = field_index.get(name)
+            if not widgets:
+                continue
+            field_xref = widgets[0][2]
+            if not 0 < field_xref < xref_count or \
+                    doc.xref_get_key(field_xref, 'T')[1] != name.rsplit('.', 1)[-1]:
+                return None
+            kind, value = doc.xref_get_key(field_xref, 'V')
+            field_type = doc.xref_get_key(field_xref, 'FT')[1]
+            if kind == 'name':
+                value = value.lstrip('/')
+            elif kind == 'null':
+                value = 'Off' if field_type == '/Btn' else ''
+            values[name] = (field_type, value)
+        return values
+
     def _get_form_fields(self, pdf_reader) -> Dict:
         """Extract form fields from PDF"""
         form_fields = {}
@@ -263,21 +549,32 @@ class FormFiller:
 
         return form_fields
 
-    def _prepare_field_updates(self, parsed_data: Dict,
+    def _prepare_field_updates(self, parsed_data,
                                form_fields: Dict) -> Dict:
-        """Prepare field updates based on mapping"""
+        """Prepare field updates based on mapping (parsed_data may be a dict or KYCRecord)"""
+        record = parsed_data if isinstance(parsed_data, KYCRecord) else KYCRecord.from_dict(parsed_data)
         field_updates = {}
 
         # Handle regular text fields
         for data_key, pdf_field_name in self.field_mapping.items():
-            if data_key in parsed_data and parsed_data[data_key]:
-                value = str(parsed_data[data_key]).strip()
+            value = getattr(record, data_key)
+            if value:
+                value = value.strip()
                 if value and value != '-':
                     field_updates[pdf_field_name] = value
 
+        # A date of birth known in only one calendar fills both date fields; a BS date
+        # that disagrees with the AD date is replaced by the AD date's conversion
+        ad_field, bs_field = self.field_mapping['date_of_birth'], self.field_mapping['date_of_birth_bs']
+        if ad_field in field_updates or bs_field in field_updates:
+            for pdf_field_name, value in zip((ad_field, bs_field),
+                                             complete_dates(field_updates.get(ad_field), field_updates.get(bs_field))):
+                if value:
+                    field_updates[pdf_field_name] = value
+
         # Handle gender checkboxes
-        if 'gender' in parsed_data:
-            gender_value = str(parsed_data['gender']).upper()
+        if record.gender is not None:
+            gender_value = record.gender.upper()
             if gender_value in ['M', 'MALE']:
                 field_updates['MaleCheck'] = 'Yes'
                 field_updates['FemaleCheck'] = 'Off'
@@ -286,8 +583,8 @@ class FormFiller:
                 field_updates['MaleCheck'] = 'Off'
 
         # Handle bank account type checkboxes
-        if 'bank_account_type' in parsed_data:
-            account_type = str(parsed_data['bank_account_type']).lower()
+        if record.bank_account_type is not None:
+            account_type = record.bank_account_type.lower()
             if 'saving' in account_type:
                 field_updates['Saving Account'] = 'Yes'
                 field_updates['Current Account'] = 'Off'
@@ -296,8 +593,8 @@ class FormFiller:
                 field_updates['Saving Account'] = 'Off'
 
         # Handle occupation checkboxes
-        if 'occupation' in parsed_data:
-            occupation = str(parsed_data['occupation']).lower()
+        if record.occupation is not None:
+            occupation = record.occupation.lower()
             if 'agriculture' in occupation:
                 field_updates['Agriculture'] = 'Yes'
             elif 'business' in occupation:
@@ -313,6 +610,21 @@ class FormFiller:
             elif 'foreign' in occupation or 'employment' in occupation:
                 field_updates['Foreign Employment'] = 'Yes'
 
+        # Handle income limit checkboxes
+        if record.income_limit is not None:
+            income_limit = record.income_limit.lower()
+            if 'upto' in income_limit or 'up to' in income_limit:
+                band = 'upto'
+            elif 'above' in income_limit:
+                band = 'above'
+            elif 'to' in income_limit:
+                band = 'between'
+            else:
+                band = None
+            if band is not None:
+                for key, field in self.income_limit_mapping.items():
+                    field_updates[field] = 'Yes' if key == band else 'Off'
+
         return field_updates
 
     def _update_form_fields(self, page, field_updates: Dict):
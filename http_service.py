@@ -0,0 +1,548 @@
+import asyncio
+import base64
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from email import policy
+from email.parser import BytesParser
+from typing import Dict, List, Optional, Tuple
+
+from batch_processor import (RESULT_ERROR, RESULT_SUCCESS, build_pipeline, new_result, run_pipeline,
+                             worker_config)
+from fill_cache import FillCache
+from form_filler import FormFiller
+from latency_stats import percentile
+from payload_transport import TRANSPORT_PICKLE
+from pdf_processor import PDFProcessor
+from record_store import STATUS_FAILED, hash_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Largest request body accepted (a batch of uploads)
+DEFAULT_MAX_BODY_BYTES = 100 * 1024 * 1024
+MAX_HEADERS = 100
+# Recent request latencies kept per endpoint for the percentiles in /metrics
+LATENCY_WINDOW = 2000
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 422: 'Unprocessable Entity', 431: 'Request Header Fields Too Large',
+            500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+# Pipeline components of a service worker process, created once by _init_service_worker
+_service_components = None
+
+
+def _init_service_worker(config: Dict) -> None:
+    global _service_components
+    _service_components = build_pipeline(config)
+
+
+def _service_task(name: str, data: bytes, source_hash: str, fill: bool) -> Dict:
+    """Run one document through the pipeline in a worker process"""
+    start = time.perf_counter()
+    pdf_processor, data_parser, form_filler = _service_components
+    result = run_pipeline(pdf_processor, data_parser, form_filler, data, source_hash,
+                          source_name=name, fill=fill)
+    result['task_seconds'] = time.perf_counter() - start
+    return result
+
+
+def result_json(result: Dict, include_pdf: bool = False) -> Dict:
+    """JSON-safe view of a pipeline result"""
+    parsed_data = result.get('parsed_data')
+    view = {
+        'source_name': result['original_name'],
+        'source_hash': result['source_hash'],
+        'status': result['status'],
+        'output_name': result.get('output_name'),
+        'extraction_tier': result.get('extraction_tier'),
+        'parsed': parsed_data.to_dict() if parsed_data else None,
+        'error': result.get('error')
+    }
+    if include_pdf and result.get('pdf_data'):
+        view['pdf_base64'] = base64.b64encode(result['pdf_data']).decode('ascii')
+    return view
+
+
+class HTTPError(Exception):
+    """Request failure reported to the client as a JSON error with this status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    """One parsed HTTP/1.1 request"""
+
+    __slots__ = ('method', 'path', 'query', 'headers', 'body', 'keep_alive', 'received_at')
+
+    def __init__(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+                 body: bytes, keep_alive: bool):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.keep_alive = keep_alive
+        self.received_at = time.perf_counter()
+
+
+class PipelineService:
+    """
+    Asyncio HTTP service exposing the extract/parse/fill pipeline
+
+    Endpoints:
+        POST /parse    one PDF -> JSON with the parsed record
+        POST /fill     one PDF -> the filled PDF (JSON error when it cannot be filled)
+        POST /batch    several PDFs -> newline-delimited JSON, one line per document
+                       as it completes (?mode=parse skips filling; filled PDFs are base64)
+        GET  /health   liveness and load
+        GET  /metrics  request, document and latency counters
+
+    PDFs are sent as the request body (application/pdf, name in ?name=) or as
+    multipart/form-data uploads. The CPU-bound pipeline runs in a spawned
+    process pool; the event loop only parses requests and streams responses.
+    At most max_concurrent requests are processed at once and up to max_queued
+    wait for a slot; beyond that requests are rejected with 503. Within a
+    batch, at most one document per worker is in the pool at a time, so a large
+    batch does not starve single-document requests.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_concurrent: Optional[int] = None,
+                 max_queued: int = 64, max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+                 form_filler: Optional[FormFiller] = None, pdf_processor: Optional[PDFProcessor] = None,
+                 record_store=None):
+        """
+        Args:
+            workers: Pipeline worker processes (default: CPU count)
+            max_concurrent: Requests processed at once (default: 2 per worker)
+            max_queued: Requests allowed to wait for a slot before 503 is returned
+            max_body_bytes: Largest request body accepted (413 beyond it)
+            form_filler: FormFiller whose template and fill cache the workers use
+                (default: FormFiller with the shared fill cache)
+            pdf_processor: PDFProcessor whose OCR cache the workers use (default: PDFProcessor())
+            record_store: Optional RecordStore that receives every result
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrent = max_concurrent or 2 * self.workers
+        self.max_queued = max_queued
+        self.max_body_bytes = max_body_bytes
+        # Results come back pickled: responses are built from bytes in this process anyway
+        self.config = worker_config(pdf_processor or PDFProcessor(),
+                                    form_filler or FormFiller(fill_cache=FillCache()),
+                                    transport=TRANSPORT_PICKLE)
+        self.record_store = record_store
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queued = 0
+        self._active = 0
+        self._started_at = time.time()
+        self._routes = {
+            '/parse': ('POST', self._handle_parse),
+            '/fill': ('POST', self._handle_fill),
+            '/batch': ('POST', self._handle_batch),
+            '/health': ('GET', self._handle_health),
+            '/metrics': ('GET', self._handle_metrics)
+        }
+        self._requests: Dict[str, int] = {}
+        self._responses: Dict[int, int] = {}
+        self._documents: Dict[str, int] = {}
+        self._rejected = 0
+        self._latencies: Dict[str, deque] = {}
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        """
+        Serve until cancelled or sent SIGTERM/SIGINT
+
+        Either way the listening socket is closed and the worker pool shut
+        down, so no spawned worker outlives the service.
+        """
+        self._start_pool()
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        handled_signals = []
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+                handled_signals.append(signum)
+            except (NotImplementedError, RuntimeError):
+                # No signal handlers outside the main thread or on Windows
+                pass
+        try:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            logger.info("Serving on http://%s:%d with %d worker(s), %d concurrent request(s)",
+                        host, port, self.workers, self.max_concurrent)
+            async with server:
+                await stop.wait()
+            logger.info("Shutting down")
+        finally:
+            for signum in handled_signals:
+                loop.remove_signal_handler(signum)
+            self._executor.shutdown(cancel_futures=True)
+
+    def _start_pool(self) -> None:
+        # Spawn rather than fork, like the batch worker pool
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_service_worker, initargs=(self.config,))
+
+    # --- HTTP/1.1 ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    # The rest of the request is unread, so the connection cannot be reused
+                    await self._send_json(writer, e.status, {'error': e.message}, keep_alive=False)
+                    self._count_response(e.status)
+                    break
+                if request is None:
+                    break
+                if not await self._dispatch(request, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            line = await reader.readline()
+            if not line:
+                return None
+            try:
+                method, target, version = line.decode('latin-1').split()
+            except ValueError:
+                raise HTTPError(400, "Malformed request line")
+
+            headers: Dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                if len(headers) >= MAX_HEADERS:
+                    raise HTTPError(431, "Too many headers")
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except ValueError:
+            # StreamReader line limit exceeded
+            raise HTTPError(431, "Header line too long")
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(reader)
+        else:
+            try:
+                length = int(headers.get('content-length', 0))
+            except ValueError:
+                raise HTTPError(400, "Invalid Content-Length")
+            if length > self.max_body_bytes:
+                raise HTTPError(413, f"Request body exceeds {self.max_body_bytes} bytes")
+            body = await reader.readexactly(length) if length else b''
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        url = urllib.parse.urlsplit(target)
+        return Request(method.upper(), url.path, dict(urllib.parse.parse_qsl(url.query)),
+                       headers, body, keep_alive)
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        total = 0
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise HTTPError(400, "Malformed chunk size")
+            if size == 0:
+                # Skip trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            total += size
+            if total > self.max_body_bytes:
+                raise HTTPError(413, f"Request body exceeds {self.max_body_bytes} bytes")
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def _dispatch(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """Route one request; returns whether the connection stays open"""
+        route = self._routes.get(request.path)
+        endpoint = request.path if route else 'other'
+        self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+        try:
+            if route is None:
+                raise HTTPError(404, f"No endpoint {request.path}")
+            method, handler = route
+            if request.method != method:
+                raise HTTPError(405, f"{request.path} accepts {method} only")
+            status = await handler(request, writer)
+        except HTTPError as e:
+            status = e.status
+            await self._send_json(writer, status, {'error': e.message}, request.keep_alive,
+                                  {'Retry-After': '1'} if status == 503 else None)
+        except Exception as e:
+            logger.exception("Error handling %s %s", request.method, request.path)
+            status = 500
+            await self._send_json(writer, status, {'error': str(e)}, request.keep_alive)
+        self._count_response(status)
+        self._latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(
+            time.perf_counter() - request.received_at)
+        return request.keep_alive
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str,
+                    keep_alive: bool, headers: Optional[Dict[str, str]] = None) -> None:
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+                 f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool,
+                         headers: Optional[Dict[str, str]] = None) -> None:
+        await self._send(writer, status, json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                         'application/json; charset=utf-8', keep_alive, headers)
+
+    def _count_response(self, status: int) -> None:
+        self._responses[status] = self._responses.get(status, 0) + 1
+
+    # --- Pipeline ---
+
+    @asynccontextmanager
+    async def _admit(self):
+        """Hold one request slot, or reject with 503 when too many requests are already waiting"""
+        if self._slots.locked() and self._queued >= self.max_queued:
+            self._rejected += 1
+            raise HTTPError(503, "Too many requests in progress, retry later")
+        self._queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._slots.release()
+
+    def _documents_of(self, request: Request) -> List[Tuple[str, bytes]]:
+        """(name, PDF bytes) pairs from a raw PDF body or multipart/form-data uploads"""
+        content_type = request.headers.get('content-type', '')
+        if content_type.lower().startswith('multipart/form-data'):
+            message = BytesParser(policy=policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + request.body)
+            if not message.is_multipart():
+                raise HTTPError(400, "Malformed multipart body")
+            documents = []
+            for part in message.iter_parts():
+                data = part.get_payload(decode=True)
+                if part.get_filename() or part.get_content_type() == 'application/pdf':
+                    documents.append((part.get_filename() or f"document_{len(documents) + 1}.pdf", data or b''))
+        else:
+            documents = [(request.query.get('name', 'document.pdf'), request.body)] if request.body else []
+        if not documents:
+            raise HTTPError(400, "No PDF in the request")
+        return documents
+
+    async def _run(self, name: str, data: bytes, fill: bool) -> Dict:
+        """Run one document in the process pool and record its result"""
+        source_hash = hash_bytes(data)
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            result = await loop.run_in_executor(executor, _service_task, name, data, source_hash, fill)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); later requests get a fresh pool. Every
+            # request in flight on the broken pool fails with it, but only the first restarts it
+            if self._executor is executor:
+                logger.error("Worker pool broke while processing %s; restarting it", name)
+                self._start_pool()
+                executor.shutdown(wait=False, cancel_futures=True)
+            result = new_result(name, source_hash)
+            result['error'] = "Worker process died"
+
+        self._documents[result['status']] = self._documents.get(result['status'], 0) + 1
+        if self.record_store is not None:
+            # SQLite writes (a full buffer flushes) stay off the event loop
+            await loop.run_in_executor(None, self._store, source_hash, name, result)
+        return result
+
+    def _store(self, source_hash: str, name: str, result: Dict) -> None:
+        if result['status'] == RESULT_SUCCESS:
+            self.record_store.add(source_hash, name, result['parsed_data'], output_name=result['output_name'])
+        else:
+            self.record_store.add(source_hash, name, result['parsed_data'],
+                                  status=STATUS_FAILED, error=result['error'])
+
+    @staticmethod
+    def _status_for(result: Dict) -> int:
+        if result['status'] == RESULT_SUCCESS:
+            return 200
+        return 500 if result['status'] == RESULT_ERROR else 422
+
+    async def _handle_parse(self, request: Request, writer: asyncio.StreamWriter) -> int:
+        name, data = self._documents_of(request)[0]
+        async with self._admit():
+            result = await self._run(name, data, fill=False)
+        status = self._status_for(result)
+        await self._send_json(writer, status, result_json(result), request.keep_alive)
+        return status
+
+    async def _handle_fill(self, request: Request, writer: asyncio.StreamWriter) -> int:
+        name, data = self._documents_of(request)[0]
+        async with self._admit():
+            result = await self._run(name, data, fill=True)
+        status = self._status_for(result)
+        if status != 200:
+            await self._send_json(writer, status, result_json(result), request.keep_alive)
+            return status
+        await self._send(writer, status, result['pdf_data'], 'application/pdf', request.keep_alive, {
+            'Content-Disposition': f'attachment; filename="{result["output_name"]}"',
+            'X-Source-Hash': result['source_hash'],
+            'X-Extraction-Tier': result['extraction_tier'] or ''
+        })
+        return status
+
+    async def _handle_batch(self, request: Request, writer: asyncio.StreamWriter) -> int:
+        mode = request.query.get('mode', 'fill')
+        if mode not in ('fill', 'parse'):
+            raise HTTPError(400, "mode must be 'fill' or 'parse'")
+        documents = self._documents_of(request)
+        fill = mode == 'fill'
+
+        async with self._admit():
+            start = time.perf_counter()
+            writer.write((f"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                          f"Transfer-Encoding: chunked\r\n"
+                          f"Connection: {'keep-alive' if request.keep_alive else 'close'}\r\n\r\n").encode('latin-1'))
+            # One document per worker in the pool at a time, so other requests interleave
+            in_pool = asyncio.Semaphore(self.workers)
+
+            async def run_one(index: int, name: str, data: bytes):
+                async with in_pool:
+                    return index, await self._run(name, data, fill)
+
+            tasks = [asyncio.create_task(run_one(i, name, data)) for i, (name, data) in enumerate(documents)]
+            summary = {'total': len(documents), 'success': 0, 'failed': 0}
+            # The 200 status line is already out: from here on, failures end the stream instead
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    index, result = await next_result
+                    summary['success' if result['status'] == RESULT_SUCCESS else 'failed'] += 1
+                    line = result_json(result, include_pdf=fill)
+                    line['index'] = index
+                    await self._write_chunk(writer, json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n')
+                summary['seconds'] = round(time.perf_counter() - start, 3)
+                await self._write_chunk(writer, json.dumps({'summary': summary}).encode('utf-8') + b'\n')
+                writer.write(b'0\r\n\r\n')
+                await writer.drain()
+            except ConnectionError:
+                logger.warning("Client disconnected from a batch after %d of %d document(s)",
+                               summary['success'] + summary['failed'], summary['total'])
+                request.keep_alive = False
+            except Exception as e:
+                logger.exception("Batch request failed after %d of %d document(s)",
+                                 summary['success'] + summary['failed'], summary['total'])
+                await self._end_stream(writer, request, str(e))
+            finally:
+                # Documents not yet handed to the pool are dropped with the request
+                for task in tasks:
+                    task.cancel()
+        return 200
+
+    async def _end_stream(self, writer: asyncio.StreamWriter, request: Request, error: str) -> None:
+        """Close a chunked response with an error line, or drop the connection if it cannot be written"""
+        try:
+            await self._write_chunk(writer, json.dumps({'error': error}, ensure_ascii=False).encode('utf-8') + b'\n')
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        except Exception:
+            # The client is gone
+            request.keep_alive = False
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        await writer.drain()
+
+    # --- Health and metrics ---
+
+    async def _handle_health(self, request: Request, writer: asyncio.StreamWriter) -> int:
+        await self._send_json(writer, 200, {'status': 'ok', 'workers': self.workers,
+                                            'active_requests': self._active,
+                                            'queued_requests': self._queued}, request.keep_alive)
+        return 200
+
+    def metrics(self) -> Dict:
+        """Counters since start, and latency percentiles over each endpoint's recent requests"""
+        return {
+            'uptime_seconds': round(time.time() - self._started_at, 1),
+            'workers': self.workers,
+            'max_concurrent': self.max_concurrent,
+            'active_requests': self._active,
+            'queued_requests': self._queued,
+            'rejected_requests': self._rejected,
+            'requests': dict(self._requests),
+            'responses': {str(status): count for status, count in sorted(self._responses.items())},
+            'documents': dict(self._documents),
+            'latency_ms': {endpoint: {'count': len(values),
+                                      'p50': round(percentile(list(values), 0.50) * 1000, 1),
+                                      'p99': round(percentile(list(values), 0.99) * 1000, 1)}
+                           for endpoint, values in self._latencies.items()}
+        }
+
+    async def _handle_metrics(self, request: Request, writer: asyncio.StreamWriter) -> int:
+        await self._send_json(writer, 200, self.metrics(), request.keep_alive)
+        return 200
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the extract/parse/fill pipeline over HTTP")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Interface to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--max-concurrent', type=int, help="Requests processed at once (default: 2 per worker)")
+    parser.add_argument('--max-queued', type=int, default=64, help="Requests waiting for a slot before 503")
+    parser.add_argument('--record-db', help="Record store database that receives every result")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    record_store = None
+    if args.record_db:
+        from record_store import RecordStore
+        record_store = RecordStore(args.record_db)
+
+    service = PipelineService(workers=args.workers, max_concurrent=args.max_concurrent,
+                              max_queued=args.max_queued, record_store=record_store)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if record_store is not None:
+            record_store.close()
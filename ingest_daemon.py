@@ -0,0 +1,333 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Dict, Optional, Tuple
+
+from batch_processor import RESULT_SUCCESS, init_worker, new_result, worker_config, worker_run
+from form_filler import FormFiller
+from payload_transport import TRANSPORT_PICKLE
+from pdf_processor import PDFProcessor
+from record_store import STATUS_FAILED
+from worker_pool import RecyclingProcessPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INBOX_DIR = './inbox'
+
+# Consecutive pool restarts, with no document finishing in between, before the daemon gives up
+MAX_POOL_RESTARTS = 3
+
+# Subdirectories of the inbox: claimed inputs, finished inputs with their outputs, failed inputs
+PROCESSING_DIR = '.processing'
+DONE_DIR = 'done'
+FAILED_DIR = 'failed'
+
+# Names that writers use while a file is still being copied in
+_PARTIAL_SUFFIXES = ('.part', '.partial', '.tmp', '.crdownload')
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file on disk, read in chunks (same digest as record_store.hash_bytes)"""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def is_candidate(name: str) -> bool:
+    """True for PDF names a branch drops in, excluding hidden and partially copied files"""
+    lowered = name.lower()
+    return (not name.startswith('.') and lowered.endswith('.pdf')
+            and not lowered.endswith(_PARTIAL_SUFFIXES))
+
+
+def unique_path(directory: str, name: str) -> str:
+    """Path for name in directory that does not overwrite an existing file"""
+    path = os.path.join(directory, name)
+    stem, ext = os.path.splitext(name)
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{stem}.{counter}{ext}")
+        counter += 1
+    return path
+
+
+class _InboxEvents:
+    """Wakes the daemon on inbox changes via inotify (watchdog), when it is installed"""
+
+    def __init__(self, inbox_dir: str, wakeup: threading.Event):
+        self.observer = None
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wakeup.set()
+
+        self.observer = Observer()
+        self.observer.schedule(_Handler(), inbox_dir, recursive=False)
+        self.observer.daemon = True
+        self.observer.start()
+
+    @property
+    def active(self) -> bool:
+        return self.observer is not None
+
+    def stop(self) -> None:
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+
+
+class IngestDaemon:
+    """
+    Long-running ingestion of PDFs dropped into an inbox directory
+
+    The inbox is watched with inotify when watchdog is installed and polled
+    otherwise. A file is only picked up once its size and modification time have
+    been stable for settle_seconds, so partially copied files are left alone.
+    Ready files are claimed into the inbox's .processing directory and run
+    through the extract/parse/fill pipeline in a process pool; at most
+    max_in_flight documents are claimed at once and the rest wait in the inbox,
+    which is the daemon's backpressure. Inputs then move to done/ (next to their
+    filled PDF) or failed/, and the drop-to-output latency is logged per file.
+
+    A worker that dies (out of memory, a crash in MuPDF) fails only the
+    document it was running and is replaced. Should the pool itself break,
+    it is rebuilt and the documents in flight are submitted again.
+    """
+
+    def __init__(self, inbox_dir: str = DEFAULT_INBOX_DIR, workers: int = 1,
+                 max_in_flight: Optional[int] = None, settle_seconds: float = 2.0,
+                 poll_seconds: float = 1.0, form_filler: Optional[FormFiller] = None,
+                 pdf_processor: Optional[PDFProcessor] = None, record_store=None):
+        """
+        Args:
+            inbox_dir: Directory that branches drop source PDFs into
+            workers: Pipeline worker processes
+            max_in_flight: Documents claimed from the inbox at once (default: 2 per worker)
+            settle_seconds: Time a file's size and mtime must stay unchanged before it is picked up
+            poll_seconds: Inbox scan interval without inotify (with it, the fallback rescan interval)
+            form_filler: FormFiller whose template and fill cache the workers use (default: FormFiller())
+            pdf_processor: PDFProcessor whose OCR cache the workers use (default: PDFProcessor())
+            record_store: Optional RecordStore that receives every result
+        """
+        self.inbox_dir = inbox_dir
+        self.processing_dir = os.path.join(inbox_dir, PROCESSING_DIR)
+        self.done_dir = os.path.join(inbox_dir, DONE_DIR)
+        self.failed_dir = os.path.join(inbox_dir, FAILED_DIR)
+        for directory in (self.processing_dir, self.done_dir, self.failed_dir):
+            os.makedirs(directory, exist_ok=True)
+        self.workers = max(1, workers)
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        # Results come back pickled: outputs are written to disk by this process anyway
+        self.config = worker_config(pdf_processor or PDFProcessor(), form_filler or FormFiller(),
+                                    transport=TRANSPORT_PICKLE)
+        self.record_store = record_store
+        self.stats = {'processed': 0, 'succeeded': 0, 'failed': 0, 'latency_seconds': 0.0, 'pool_restarts': 0}
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        # Files seen in the inbox but not yet settled: name -> (size, mtime_ns, first seen, stable since)
+        self._candidates: Dict[str, Tuple[int, int, float, float]] = {}
+
+    def stop(self) -> None:
+        """Stop claiming new files; documents in flight still finish"""
+        self._stop.set()
+        self._wakeup.set()
+
+    def run(self) -> None:
+        """Process the inbox until stop() is called"""
+        events = _InboxEvents(self.inbox_dir, self._wakeup)
+        logger.info("Watching %s with %s, %d worker(s), at most %d in flight",
+                    self.inbox_dir, 'inotify' if events.active else 'polling',
+                    self.workers, self.max_in_flight)
+        executor = self._new_pool()
+        in_flight: Dict = {}
+        restarts = 0
+        try:
+            # Files claimed by a run that was killed are processed again first
+            for name in sorted(os.listdir(self.processing_dir)):
+                self._submit(executor, in_flight, name, time.time(), time.time())
+
+            while not self._stop.is_set() or in_flight:
+                if not self._stop.is_set() and len(in_flight) < self.max_in_flight:
+                    for name, first_seen, ready_at in self._ready_files(self.max_in_flight - len(in_flight)):
+                        if self._claim(name):
+                            self._submit(executor, in_flight, name, first_seen, ready_at)
+
+                # Wake on a finished document, an inbox event, or the next debounce/poll check
+                timeout = self.settle_seconds / 2 if self._candidates else self.poll_seconds
+                if events.active and not self._candidates:
+                    timeout = max(timeout, 30.0)
+                if in_flight:
+                    done, _ = wait(list(in_flight), timeout=min(timeout, 0.5), return_when=FIRST_COMPLETED)
+                    broken = executor.broken
+                    for future in done:
+                        if not broken or future.exception() is None:
+                            self._finish(future, in_flight.pop(future))
+                            restarts = 0
+                    if broken:
+                        # The rest failed with the pool, not because of their documents: requeue them
+                        restarts += 1
+                        if restarts > MAX_POOL_RESTARTS:
+                            raise RuntimeError(f"Worker pool broke {restarts} times in a row: {broken}")
+                        logger.error("Worker pool broke (%s); restarting it and requeueing %d document(s)",
+                                     broken, len(in_flight))
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        executor = self._new_pool()
+                        self.stats['pool_restarts'] += 1
+                        requeued, in_flight = list(in_flight.values()), {}
+                        for name, source_hash, first_seen, ready_at, _ in requeued:
+                            self._dispatch(executor, in_flight, name, source_hash, first_seen, ready_at)
+                else:
+                    if self.record_store is not None:
+                        self.record_store.flush()
+                    self._wakeup.wait(timeout)
+                self._wakeup.clear()
+        finally:
+            events.stop()
+            executor.shutdown()
+            if self.record_store is not None:
+                self.record_store.flush()
+        logger.info("Stopped after %d document(s): %d succeeded, %d failed",
+                    self.stats['processed'], self.stats['succeeded'], self.stats['failed'])
+
+    def _ready_files(self, limit: int):
+        """Yield up to limit (name, first seen, ready at) for inbox files that have settled"""
+        now = time.time()
+        seen = set()
+        with os.scandir(self.inbox_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not is_candidate(entry.name):
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                previous = self._candidates.get(entry.name)
+                if previous is None or previous[:2] != (stat.st_size, stat.st_mtime_ns):
+                    first_seen = previous[2] if previous else now
+                    self._candidates[entry.name] = (stat.st_size, stat.st_mtime_ns, first_seen, now)
+        for name in list(self._candidates):
+            if name not in seen:
+                del self._candidates[name]
+
+        # Oldest drops first
+        for name, (size, _, first_seen, stable_since) in sorted(self._candidates.items(),
+                                                               key=lambda item: item[1][2]):
+            if limit <= 0:
+                break
+            if size > 0 and now - stable_since >= self.settle_seconds:
+                del self._candidates[name]
+                limit -= 1
+                yield name, first_seen, now
+
+    def _claim(self, name: str) -> bool:
+        target = os.path.join(self.processing_dir, name)
+        if os.path.exists(target):
+            # A file of the same name is still in flight; pick this one up after it finishes
+            return False
+        try:
+            os.rename(os.path.join(self.inbox_dir, name), target)
+            return True
+        except FileNotFoundError:
+            # Removed (or taken by another daemon) since the scan
+            return False
+
+    def _new_pool(self) -> RecyclingProcessPool:
+        # Spawn rather than fork, like the batch worker pool
+        return RecyclingProcessPool(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=init_worker, initargs=(self.config,))
+
+    def _submit(self, executor, in_flight: Dict, name: str, first_seen: float, ready_at: float) -> None:
+        try:
+            source_hash = file_hash(os.path.join(self.processing_dir, name))
+        except OSError as e:
+            logger.error("Cannot read %s: %s", name, e)
+            return
+        self._dispatch(executor, in_flight, name, source_hash, first_seen, ready_at)
+
+    def _dispatch(self, executor, in_flight: Dict, name: str, source_hash: str,
+                  first_seen: float, ready_at: float) -> None:
+        try:
+            # Workers open the claimed file by path, straight from disk
+            future = executor.submit(worker_run, name, os.path.join(self.processing_dir, name), source_hash)
+        except RuntimeError as e:
+            # The pool broke since run() last checked; the failed future gets the document requeued
+            future = Future()
+            future.set_exception(e)
+        in_flight[future] = (name, source_hash, first_seen, ready_at, time.time())
+
+    def _finish(self, future, task: Tuple) -> None:
+        name, source_hash, first_seen, ready_at, submitted_at = task
+        try:
+            result = future.result()
+        except Exception as e:
+            result = new_result(name, source_hash)
+            result['error'] = str(e)
+
+        source_path = os.path.join(self.processing_dir, name)
+        if result['status'] == RESULT_SUCCESS:
+            output_path = unique_path(self.done_dir, result['output_name'])
+            with open(output_path, 'wb') as f:
+                f.write(result['pdf_data'])
+            shutil.move(source_path, unique_path(self.done_dir, name))
+            self.stats['succeeded'] += 1
+        else:
+            output_path = None
+            shutil.move(source_path, unique_path(self.failed_dir, name))
+            self.stats['failed'] += 1
+
+        if self.record_store is not None:
+            if result['status'] == RESULT_SUCCESS:
+                self.record_store.add(source_hash, name, result['parsed_data'], output_name=result['output_name'])
+            else:
+                self.record_store.add(source_hash, name, result['parsed_data'],
+                                      status=STATUS_FAILED, error=result['error'])
+
+        finished_at = time.time()
+        latency = finished_at - first_seen
+        self.stats['processed'] += 1
+        self.stats['latency_seconds'] += latency
+        log = logger.info if output_path else logger.warning
+        log("%s: %s in %.2fs (settle %.2fs, queue %.2fs, pipeline %.2fs)%s",
+            name, result['status'], latency, ready_at - first_seen, submitted_at - ready_at,
+            result.get('task_seconds') or finished_at - submitted_at,
+            f" -> {output_path}" if output_path else f": {result['error']}" if result['error'] else '')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Watch an inbox directory and fill every PDF dropped into it")
+    parser.add_argument('inbox', nargs='?', default=DEFAULT_INBOX_DIR, help="Inbox directory")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--max-in-flight', type=int, help="Documents claimed at once (default: 2 per worker)")
+    parser.add_argument('--settle', type=float, default=2.0, help="Seconds a file must stay unchanged")
+    parser.add_argument('--poll', type=float, default=1.0, help="Inbox scan interval without inotify")
+    parser.add_argument('--record-db', help="Record store database that receives every result")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    record_store = None
+    if args.record_db:
+        from record_store import RecordStore
+        record_store = RecordStore(args.record_db)
+
+    daemon = IngestDaemon(args.inbox, workers=args.workers, max_in_flight=args.max_in_flight,
+                          settle_seconds=args.settle, poll_seconds=args.poll, record_store=record_store)
+    # Finish the documents in flight before exiting
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run()
+    finally:
+        if record_store is not None:
+            record_store.close()
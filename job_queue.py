@@ -0,0 +1,482 @@
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from batch_processor import RESULT_ERROR, RESULT_SUCCESS, build_pipeline, run_pipeline
+from kyc_record import KYCRecord
+from record_store import STATUS_FAILED, RecordStore, hash_bytes
+
+DEFAULT_QUEUE_DB_PATH = './kyc_jobs.db'
+DEFAULT_SPOOL_DIR = './.job_spool'
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_CANCELLED = 'cancelled'
+
+FILE_QUEUED = 'queued'
+FILE_RUNNING = 'running'
+FILE_CANCELLED = 'cancelled'
+
+# A claimed file whose lease has not been renewed within this time is queued again;
+# a worker renews the lease of the file it is running every third of this
+DEFAULT_LEASE_SECONDS = 60
+# Claims of one file before it is failed instead of queued again (it keeps killing its worker)
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of batch jobs, shared by the app and worker processes
+
+    A job is a batch of source PDFs submitted by one operator; each file is a
+    separate work item. Source files are spooled to disk on submit and filled
+    PDFs are written next to them, so jobs and results outlive the Streamlit
+    session that submitted them. Workers claim one file at a time from the
+    operator with the fewest files in flight, so concurrent batches share the
+    worker pool fairly instead of first-come-first-served.
+
+    A claim is a lease that the worker renews while the file runs, so slow
+    files are never taken over from a live worker. A file whose worker died
+    is queued again, up to max_attempts claims in all; after that it fails.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_QUEUE_DB_PATH, spool_dir: str = DEFAULT_SPOOL_DIR):
+        """
+        Args:
+            db_path: SQLite database file for jobs and work items
+            spool_dir: Directory for spooled source PDFs and filled outputs
+        """
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        # isolation_level=None: transactions are opened explicitly (BEGIN IMMEDIATE for claims)
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+
+    def _create_schema(self):
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                succeeded INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS job_files (
+                id INTEGER PRIMARY KEY,
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                source_name TEXT NOT NULL,
+                source_hash TEXT NOT NULL,
+                source_path TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                claimed_at REAL,
+                finished_at REAL,
+                output_name TEXT,
+                output_path TEXT,
+                parsed TEXT,
+                extraction_tier TEXT,
+                identity_matches TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                heartbeat_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, created_at);
+            CREATE INDEX IF NOT EXISTS idx_job_files_job ON job_files (job_id, seq);
+            CREATE INDEX IF NOT EXISTS idx_job_files_status ON job_files (status, job_id);
+        ''')
+        # Queues created before claims were counted and renewed get the columns added
+        existing = {row[1] for row in self._conn.execute('PRAGMA table_info(job_files)')}
+        if 'attempts' not in existing:
+            self._conn.execute('ALTER TABLE job_files ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+        if 'heartbeat_at' not in existing:
+            self._conn.execute('ALTER TABLE job_files ADD COLUMN heartbeat_at REAL')
+
+    def submit(self, owner: str, files: Iterable[Tuple[str, bytes]]) -> str:
+        """
+        Queue a batch
+
+        Args:
+            owner: Operator submitting the batch (the unit of fair sharing)
+            files: (source name, PDF bytes) pairs
+
+        Returns:
+            str: Job id
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(os.path.join(job_dir, 'out'), exist_ok=True)
+        rows = []
+        for seq, (name, data) in enumerate(files):
+            source_path = os.path.join(job_dir, f"{seq:05d}.pdf")
+            with open(source_path, 'wb') as f:
+                f.write(data)
+            rows.append((job_id, seq, name, hash_bytes(data), source_path, FILE_QUEUED))
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute(
+                    'INSERT INTO jobs (id, owner, status, total, created_at) VALUES (?, ?, ?, ?, ?)',
+                    (job_id, owner, JOB_QUEUED if rows else JOB_DONE, len(rows), time.time())
+                )
+                self._conn.executemany(
+                    'INSERT INTO job_files (job_id, seq, source_name, source_hash, source_path, status) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', rows
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """
+        Take the next work item, favouring the operator with the fewest files in flight
+
+        Returns:
+            dict: The claimed job_files row (as updated by the claim), or None when the queue is empty
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('''
+                    SELECT f.* FROM job_files f JOIN jobs j ON j.id = f.job_id
+                    WHERE f.status = ? AND j.status IN (?, ?)
+                    ORDER BY (
+                        SELECT COUNT(*) FROM job_files r JOIN jobs rj ON rj.id = r.job_id
+                        WHERE r.status = ? AND rj.owner = j.owner
+                    ), j.created_at, f.seq
+                    LIMIT 1
+                ''', (FILE_QUEUED, JOB_QUEUED, JOB_RUNNING, FILE_RUNNING)).fetchone()
+                if row is None:
+                    self._conn.execute('COMMIT')
+                    return None
+                now = time.time()
+                self._conn.execute(
+                    'UPDATE job_files SET status = ?, worker = ?, claimed_at = ?, heartbeat_at = ?, '
+                    'attempts = attempts + 1 WHERE id = ?',
+                    (FILE_RUNNING, worker, now, now, row['id'])
+                )
+                self._conn.execute(
+                    'UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ?',
+                    (JOB_RUNNING, now, row['job_id'])
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        item = dict(row)
+        item.update(status=FILE_RUNNING, worker=worker, claimed_at=now, heartbeat_at=now,
+                    attempts=item['attempts'] + 1)
+        return item
+
+    def renew(self, item: Dict) -> bool:
+        """Extend the lease on a claimed item; False once it is no longer held by item['worker']"""
+        with self._lock:
+            return self._conn.execute(
+                'UPDATE job_files SET heartbeat_at = ? WHERE id = ? AND status = ? AND worker = ?',
+                (time.time(), item['id'], FILE_RUNNING, item['worker'])
+            ).rowcount > 0
+
+    def keep_alive(self, item: Dict, lease_seconds: float = DEFAULT_LEASE_SECONDS
+                   ) -> Tuple[threading.Thread, threading.Event]:
+        """Renew the item's lease in the background until the returned event is set"""
+        stop = threading.Event()
+
+        def renew_loop():
+            while not stop.wait(lease_seconds / 3):
+                self.renew(item)
+
+        thread = threading.Thread(target=renew_loop, daemon=True)
+        thread.start()
+        return thread, stop
+
+    def complete(self, item: Dict, result: Dict) -> bool:
+        """
+        Record a claimed item's pipeline result, writing its filled PDF to the spool
+
+        The job is marked done when its last item completes.
+
+        Returns:
+            bool: False when the claim had lapsed and the item was requeued or failed meanwhile;
+                the result is then discarded
+        """
+        output_path = None
+        if result.get('pdf_data'):
+            output_path = os.path.join(self.spool_dir, item['job_id'], 'out',
+                                       f"{item['seq']:05d}_{result['output_name']}")
+            with open(output_path, 'wb') as f:
+                f.write(result['pdf_data'])
+        parsed_data = result.get('parsed_data')
+        matches = [{'source_name': m.get('source_name'), 'source_hash': m.get('source_hash')}
+                   for m in result.get('identity_matches') or []]
+        succeeded = int(result['status'] == RESULT_SUCCESS)
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                updated = self._conn.execute('''
+                    UPDATE job_files SET status = ?, finished_at = ?, output_name = ?, output_path = ?,
+                        parsed = ?, extraction_tier = ?, identity_matches = ?, error = ?
+                    WHERE id = ? AND status = ? AND worker = ?
+                ''', (result['status'], now, result.get('output_name'), output_path,
+                      parsed_data.to_json() if parsed_data else None, result.get('extraction_tier'),
+                      json.dumps(matches), result.get('error'), item['id'], FILE_RUNNING,
+                      item['worker'])).rowcount
+                # Only the worker still holding the claim counts the item
+                if updated:
+                    self._count_completed(item['job_id'], 1, succeeded, now)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return updated > 0
+
+    def _count_completed(self, job_id: str, completed: int, succeeded: int, now: float) -> None:
+        """Add finished items to a job's counters, marking it done with its last item (inside a transaction)"""
+        self._conn.execute('''
+            UPDATE jobs SET completed = completed + ?, succeeded = succeeded + ?,
+                status = CASE WHEN completed + ? >= total AND status = ? THEN ? ELSE status END,
+                finished_at = CASE WHEN completed + ? >= total THEN ? ELSE finished_at END
+            WHERE id = ?
+        ''', (completed, succeeded, completed, JOB_RUNNING, JOB_DONE, completed, now, job_id))
+
+    def requeue_stale(self, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                      max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        """
+        Release the items whose lease has not been renewed for lease_seconds (their worker died)
+
+        Each is queued again, unless it has already been claimed max_attempts
+        times: then it fails, so a file that kills its worker cannot hold its
+        operator's share of the pool forever.
+
+        Returns:
+            int: Items queued again or failed
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                stale = self._conn.execute(
+                    'SELECT id, job_id, attempts FROM job_files '
+                    'WHERE status = ? AND COALESCE(heartbeat_at, claimed_at) < ?',
+                    (FILE_RUNNING, now - lease_seconds)
+                ).fetchall()
+                failed = [row for row in stale if row['attempts'] >= max_attempts]
+                self._conn.executemany(
+                    'UPDATE job_files SET status = ?, worker = NULL, claimed_at = NULL, heartbeat_at = NULL '
+                    'WHERE id = ?',
+                    [(FILE_QUEUED, row['id']) for row in stale if row['attempts'] < max_attempts]
+                )
+                self._conn.executemany(
+                    'UPDATE job_files SET status = ?, finished_at = ?, error = ? WHERE id = ?',
+                    [(RESULT_ERROR, now, f"Worker stopped responding on each of {row['attempts']} attempts",
+                      row['id']) for row in failed]
+                )
+                for job_id in {row['job_id'] for row in failed}:
+                    self._count_completed(job_id, sum(row['job_id'] == job_id for row in failed), 0, now)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return len(stale)
+
+    def cancel(self, job_id: str) -> None:
+        """Stop a job: items not yet claimed are dropped, running ones finish normally"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('UPDATE job_files SET status = ? WHERE job_id = ? AND status = ?',
+                                   (FILE_CANCELLED, job_id, FILE_QUEUED))
+                self._conn.execute(
+                    'UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)',
+                    (JOB_CANCELLED, time.time(), job_id, JOB_QUEUED, JOB_RUNNING)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, owner: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Most recent jobs first, optionally for one operator"""
+        with self._lock:
+            if owner is None:
+                rows = self._conn.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?',
+                                          (limit,)).fetchall()
+            else:
+                rows = self._conn.execute('SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?',
+                                          (owner, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def job_results(self, job_id: str) -> List[Dict]:
+        """
+        Per-file results of a job in submission order
+
+        Returns:
+            list: job_files rows with parsed_data (KYCRecord or None) and identity_matches decoded
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM job_files WHERE job_id = ? ORDER BY seq',
+                                      (job_id,)).fetchall()
+        results = []
+        for row in rows:
+            result = dict(row)
+            result['parsed_data'] = KYCRecord.from_json(result.pop('parsed')) if result['parsed'] else None
+            result['identity_matches'] = json.loads(result['identity_matches'] or '[]')
+            results.append(result)
+        return results
+
+    def delete_job(self, job_id: str) -> None:
+        """Remove a finished job and its spooled files"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('DELETE FROM job_files WHERE job_id = ?', (job_id,))
+                self._conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def run_worker(db_path: str, spool_dir: str, config: Dict, record_db_path: Optional[str] = None,
+               stop_event=None, poll_seconds: float = 1.0, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> None:
+    """
+    Worker loop: claim an item, run the pipeline on its spooled file, record the result
+
+    Args:
+        db_path: Job queue database
+        spool_dir: Job queue spool directory
+        config: Pipeline settings from batch_processor.worker_config()
+        record_db_path: Optional RecordStore database that receives every result
+        stop_event: Event that ends the loop once set (runs forever when None)
+        poll_seconds: Sleep between polls of an empty queue
+        lease_seconds: Claim lease, renewed while an item runs; items of dead workers are requeued after it
+    """
+    queue = JobQueue(db_path, spool_dir)
+    record_store = RecordStore(record_db_path, batch_size=1) if record_db_path else None
+    pdf_processor, data_parser, form_filler = build_pipeline(config)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        while stop_event is None or not stop_event.is_set():
+            queue.requeue_stale(lease_seconds)
+            item = queue.claim(worker)
+            if item is None:
+                time.sleep(poll_seconds)
+                continue
+            renewer, stop_renewing = queue.keep_alive(item, lease_seconds)
+            try:
+                # The spooled file is opened by path, straight from disk
+                result = run_pipeline(pdf_processor, data_parser, form_filler, item['source_path'],
+                                      item['source_hash'], source_name=item['source_name'])
+            finally:
+                stop_renewing.set()
+                renewer.join()
+            if record_store is not None and result['status'] == RESULT_SUCCESS:
+                result['identity_matches'] = record_store.find_duplicates(
+                    result['parsed_data'], exclude_hash=item['source_hash'])
+            # A claim that lapsed meanwhile belongs to another run: leave the record store to it
+            if queue.complete(item, result) and record_store is not None:
+                if result['status'] == RESULT_SUCCESS:
+                    record_store.add(item['source_hash'], item['source_name'], result['parsed_data'],
+                                     output_name=result['output_name'])
+                else:
+                    record_store.add(item['source_hash'], item['source_name'], result['parsed_data'],
+                                     status=STATUS_FAILED, error=result['error'])
+    finally:
+        if record_store is not None:
+            record_store.close()
+        queue.close()
+
+
+class JobWorkerPool:
+    """Background worker processes serving a JobQueue"""
+
+    def __init__(self, workers: int, db_path: str = DEFAULT_QUEUE_DB_PATH,
+                 spool_dir: str = DEFAULT_SPOOL_DIR, config: Optional[Dict] = None,
+                 record_db_path: Optional[str] = None):
+        """
+        Args:
+            workers: Number of worker processes
+            db_path: Job queue database
+            spool_dir: Job queue spool directory
+            config: Pipeline settings from batch_processor.worker_config() (defaults when omitted)
+            record_db_path: Optional RecordStore database that receives every result
+        """
+        if config is None:
+            from batch_processor import worker_config
+            from pdf_processor import PDFProcessor
+            from form_filler import FormFiller
+            config = worker_config(PDFProcessor(), FormFiller())
+        self.workers = workers
+        self._args = (db_path, spool_dir, config, record_db_path)
+        # Spawn rather than fork: the Streamlit server process is multi-threaded
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = self._context.Event()
+        self._processes: List = []
+
+    def start(self) -> 'JobWorkerPool':
+        """Start the workers (restarting any that have exited)"""
+        self._processes = [p for p in self._processes if p.is_alive()]
+        while len(self._processes) < self.workers:
+            process = self._context.Process(target=run_worker, args=self._args,
+                                            kwargs={'stop_event': self._stop_event}, daemon=True)
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def alive(self) -> int:
+        return sum(1 for p in self._processes if p.is_alive())
+
+    def stop(self, timeout: float = 30) -> None:
+        """Let each worker finish its current item, then stop"""
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+        self._processes = []
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run job queue workers outside the Streamlit server")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--db', default=DEFAULT_QUEUE_DB_PATH, help="Job queue database")
+    parser.add_argument('--spool', default=DEFAULT_SPOOL_DIR, help="Spool directory")
+    parser.add_argument('--record-db', help="Record store database that receives every result")
+    args = parser.parse_args()
+
+    pool = JobWorkerPool(args.workers, args.db, args.spool, record_db_path=args.record_db).start()
+    try:
+        while True:
+            time.sleep(5)
+            pool.start()
+    except KeyboardInterrupt:
+        pool.stop()
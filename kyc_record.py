@@ -0,0 +1,263 @@
+import json
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Fixed field schema produced by DataParser, in export/column order
+PERSONAL_FIELDS = (
+    'name', 'date_of_birth', 'gender', 'citizenship_no', 'beneficiary_id',
+    'pan_no', 'national_id', 'issue_district', 'issue_date'
+)
+CURRENT_ADDRESS_FIELDS = tuple(f'current_{field}' for field in (
+    'country', 'province', 'district', 'municipality', 'ward_no', 'tole',
+    'telephone', 'mobile', 'email'
+))
+PERMANENT_ADDRESS_FIELDS = tuple(f'permanent_{field}' for field in (
+    'country', 'province', 'district', 'municipality', 'ward_no', 'tole',
+    'telephone', 'block_no'
+))
+FAMILY_FIELDS = (
+    'father_name', 'mother_name', 'grandfather_name', 'spouse_name',
+    'son_name', 'daughter_name'
+)
+BANK_FIELDS = ('bank_account_type', 'bank_account_number', 'bank_name')
+OCCUPATION_FIELDS = ('occupation', 'organization', 'designation')
+TEMPORARY_ADDRESS_FIELDS = tuple(f'temporary_{field}' for field in (
+    'country', 'province', 'district', 'municipality', 'ward_no', 'tole',
+    'telephone', 'mobile', 'email'
+))
+FINANCIAL_FIELDS = ('income_limit', 'annual_income')
+# Bikram Sambat counterparts of AD dates; appended last so existing column positions stay put
+BS_DATE_FIELDS = ('date_of_birth_bs',)
+
+KYC_FIELDS = (
+    PERSONAL_FIELDS + CURRENT_ADDRESS_FIELDS + PERMANENT_ADDRESS_FIELDS +
+    FAMILY_FIELDS + BANK_FIELDS + OCCUPATION_FIELDS +
+    TEMPORARY_ADDRESS_FIELDS + FINANCIAL_FIELDS + BS_DATE_FIELDS
+)
+
+
+class KYCRecord:
+    """Fixed-schema parsed KYC data with one slot per DataParser field"""
+
+    __slots__ = KYC_FIELDS
+
+    def __init__(self, **values):
+        for field in KYC_FIELDS:
+            setattr(self, field, values.get(field))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'KYCRecord':
+        """Build a record from a parsed_data dict, ignoring keys outside the schema"""
+        record = cls.__new__(cls)
+        for field in KYC_FIELDS:
+            value = data.get(field)
+            setattr(record, field, str(value) if value is not None else None)
+        return record
+
+    def to_dict(self) -> Dict[str, str]:
+        """Return the populated fields as a plain dict (same shape as parse_data)"""
+        return {field: value for field, value in self.items()}
+
+    def to_row(self) -> Tuple[Optional[str], ...]:
+        """Return all field values in KYC_FIELDS order"""
+        return tuple(getattr(self, field) for field in KYC_FIELDS)
+
+    @classmethod
+    def from_row(cls, row) -> 'KYCRecord':
+        """Build a record from values in KYC_FIELDS order"""
+        record = cls.__new__(cls)
+        for field, value in zip(KYC_FIELDS, row):
+            setattr(record, field, value)
+        return record
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, payload) -> 'KYCRecord':
+        return cls.from_dict(json.loads(payload))
+
+    def to_msgpack(self) -> bytes:
+        """Serialize as a positional msgpack array (requires the msgpack package)"""
+        import msgpack
+        return msgpack.packb(self.to_row(), use_bin_type=True)
+
+    @classmethod
+    def from_msgpack(cls, payload: bytes) -> 'KYCRecord':
+        import msgpack
+        return cls.from_row(msgpack.unpackb(payload, raw=False))
+
+    # Mapping-style access so existing dict consumers keep working
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None) if key in KYC_FIELDS else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> str:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        for field in KYC_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                yield field, value
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.items())
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, field) is not None for field in KYC_FIELDS)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, KYCRecord) and self.to_row() == other.to_row()
+
+    def __repr__(self) -> str:
+        return f"KYCRecord({self.to_dict()!r})"
+
+    def __getstate__(self):
+        return self.to_row()
+
+    def __setstate__(self, state):
+        for field, value in zip(KYC_FIELDS, state):
+            setattr(self, field, value)
+
+
+class KYCRecordBatch:
+    """
+    Column-oriented storage for many records
+
+    Each schema field is kept as one UTF-8 byte buffer plus an offsets array and a
+    validity byte per record, so a batch holds no per-record Python objects.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, bytearray] = {field: bytearray() for field in KYC_FIELDS}
+        self._offsets: Dict[str, array] = {field: array('I', [0]) for field in KYC_FIELDS}
+        self._valid: Dict[str, bytearray] = {field: bytearray() for field in KYC_FIELDS}
+        self._length = 0
+
+    def append(self, record) -> None:
+        """Append a KYCRecord or parsed_data dict"""
+        if not isinstance(record, KYCRecord):
+            record = KYCRecord.from_dict(record)
+        for field in KYC_FIELDS:
+            value = getattr(record, field)
+            data = self._data[field]
+            if value is None:
+                self._valid[field].append(0)
+            else:
+                data += value.encode('utf-8')
+                self._valid[field].append(1)
+            self._offsets[field].append(len(data))
+        self._length += 1
+
+    def extend(self, records) -> None:
+        for record in records:
+            self.append(record)
+
+    def value(self, index: int, field: str) -> Optional[str]:
+        if not self._valid[field][index]:
+            return None
+        offsets = self._offsets[field]
+        return self._data[field][offsets[index]:offsets[index + 1]].decode('utf-8')
+
+    def column(self, field: str) -> List[Optional[str]]:
+        """Decode one field for every record"""
+        data = bytes(self._data[field])
+        offsets = self._offsets[field]
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') if valid else None
+                for i, valid in enumerate(self._valid[field])]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> KYCRecord:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return KYCRecord.from_row(self.value(index, field) for field in KYC_FIELDS)
+
+    def __iter__(self) -> Iterator[KYCRecord]:
+        for index in range(self._length):
+            yield self[index]
+
+    def rows(self) -> Iterator[Tuple[Optional[str], ...]]:
+        return zip(*(self.column(field) for field in KYC_FIELDS))
+
+    def nbytes(self) -> int:
+        """Approximate buffer size of the batch in bytes"""
+        return sum(len(self._data[f]) + len(self._valid[f]) +
+                   self._offsets[f].itemsize * len(self._offsets[f]) for f in KYC_FIELDS)
+
+    def to_jsonl(self) -> str:
+        return ''.join(record.to_json() + '\n' for record in self)
+
+    @classmethod
+    def from_jsonl(cls, payload: str) -> 'KYCRecordBatch':
+        batch = cls()
+        for line in payload.splitlines():
+            if line.strip():
+                batch.append(KYCRecord.from_json(line))
+        return batch
+
+
+def measure_memory(record_count: int = 100_000) -> Dict[str, Dict[str, float]]:
+    """
+    Compare memory used by dict, KYCRecord and KYCRecordBatch storage
+
+    Args:
+        record_count: Number of synthetic records to hold in memory
+
+    Returns:
+        dict: Total MB and bytes per record for each representation
+    """
+    import gc
+    import tracemalloc
+
+    def sample(i: int) -> Dict[str, str]:
+        return {
+            'name': f'RAM BAHADUR {i}', 'date_of_birth': '1990-01-01', 'gender': 'Male',
+            'citizenship_no': f'27-01-{i}', 'issue_district': 'Kathmandu',
+            'current_country': 'Nepal', 'current_province': 'Bagmati', 'current_district': 'Kathmandu',
+            'current_municipality': 'Kathmandu', 'current_ward_no': str(i % 32 + 1),
+            'current_mobile': f'98{i:08d}', 'permanent_country': 'Nepal',
+            'permanent_district': 'Lalitpur', 'permanent_ward_no': str(i % 20 + 1),
+            'father_name': f'HARI BAHADUR {i}', 'mother_name': f'SITA DEVI {i}',
+            'bank_account_type': 'Saving', 'bank_account_number': f'{i:014d}',
+            'occupation': 'Service'
+        }
+
+    def measure(build) -> Dict[str, float]:
+        gc.collect()
+        tracemalloc.start()
+        held = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del held
+        return {'total_mb': round(current / 1024 / 1024, 2),
+                'bytes_per_record': round(current / record_count, 1)}
+
+    def build_batch():
+        batch = KYCRecordBatch()
+        for i in range(record_count):
+            batch.append(KYCRecord.from_dict(sample(i)))
+        return batch
+
+    return {
+        'dict': measure(lambda: [sample(i) for i in range(record_count)]),
+        'KYCRecord': measure(lambda: [KYCRecord.from_dict(sample(i)) for i in range(record_count)]),
+        'KYCRecordBatch': measure(build_batch)
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(json.dumps(measure_memory(count), indent=2))
@@ -0,0 +1,215 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+DEFAULT_OCR_CACHE_DIR = './.ocr_cache'
+DEFAULT_OCR_LANGUAGE = 'eng+nep'
+
+# Pages with fewer non-whitespace characters than this are treated as scans
+MIN_TEXT_CHARS = 20
+
+
+def tesseract_available() -> bool:
+    """True when PyMuPDF can find a local Tesseract language data directory"""
+    try:
+        return bool(fitz.get_tessdata())
+    except Exception:
+        return False
+
+
+def page_range(pdf_document, pages: Optional[Tuple[int, int]] = None) -> range:
+    """Page indexes of a 0-based [start, stop) range, clipped to the document (all pages when None)"""
+    if pages is None:
+        return range(pdf_document.page_count)
+    start, stop = pages
+    return range(max(start, 0), min(stop, pdf_document.page_count))
+
+
+def choose_dpi(page, default_dpi: int = 300, min_dpi: int = 200, max_dpi: int = 400) -> int:
+    """
+    Pick a render resolution for OCR from the page's own scan resolution
+
+    The largest image on the page is assumed to be the scan; rendering at its
+    native resolution adds no detail above it and loses detail below it. The
+    result is clamped to [min_dpi, max_dpi]; pages without images use default_dpi.
+    """
+    images = [info for info in page.get_image_info() if info.get('width')]
+    if not images:
+        return default_dpi
+    image = max(images, key=lambda info: fitz.Rect(info['bbox']).get_area())
+    bbox_width = fitz.Rect(image['bbox']).width
+    if bbox_width <= 0:
+        return default_dpi
+    native_dpi = image['width'] / (bbox_width / 72)
+    return int(min(max(native_dpi, min_dpi), max_dpi))
+
+
+def ocr_pixmap(width: int, height: int, samples: bytes, dpi: int, language: str) -> str:
+    """OCR one greyscale page image with Tesseract and return its text (runs in pool workers)"""
+    pixmap = fitz.Pixmap(fitz.csGRAY, width, height, samples, False)
+    pixmap.set_dpi(dpi, dpi)
+    ocr_document = fitz.open("pdf", pixmap.pdfocr_tobytes(language=language))
+    try:
+        return ocr_document[0].get_text("text")
+    finally:
+        ocr_document.close()
+
+
+class OCRCache:
+    """OCR text on disk, keyed by hash of the rendered page image and language"""
+
+    def __init__(self, cache_dir: str = DEFAULT_OCR_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(width: int, height: int, samples: bytes, language: str) -> str:
+        digest = hashlib.sha256(samples)
+        digest.update(f"\0{width}x{height}\0{language}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+class OCRStage:
+    """
+    OCR for the pages of a document that have no text layer
+
+    Only pages with fewer than MIN_TEXT_CHARS characters are rendered, each at
+    a resolution chosen from its scan (see choose_dpi). Rendered pages are looked
+    up in the OCR cache by image hash; the misses are recognised across a process
+    pool and cached. Misses are submitted as they are rendered and at most
+    max_in_flight page images are held at once, so a long scan's memory stays
+    bounded by a few pages rather than growing with its length.
+    """
+
+    def __init__(self, language: str = DEFAULT_OCR_LANGUAGE, workers: Optional[int] = None,
+                 cache_dir: Optional[str] = DEFAULT_OCR_CACHE_DIR,
+                 default_dpi: int = 300, min_dpi: int = 200, max_dpi: int = 400,
+                 max_in_flight: Optional[int] = None):
+        """
+        Args:
+            language: Tesseract language models ('eng+nep' for English and Nepali)
+            workers: OCR processes (default: CPU count); 1 runs OCR in the calling process
+            cache_dir: OCR cache directory (None disables caching)
+            default_dpi: Render resolution for pages without an embedded scan image
+            min_dpi: Lowest render resolution
+            max_dpi: Highest render resolution
+            max_in_flight: Rendered pages waiting for or in recognition at once (default: 2 per worker)
+        """
+        self.language = language
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = OCRCache(cache_dir) if cache_dir else None
+        self.default_dpi = default_dpi
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+        self.max_in_flight = max(1, max_in_flight or 2 * self.workers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def ocr_document(self, pdf_document, pages: Optional[Tuple[int, int]] = None) -> Tuple[str, Dict]:
+        """
+        Text for a document, with OCR text substituted for pages that have none
+
+        Args:
+            pdf_document: Open PyMuPDF document
+            pages: Optional 0-based [start, stop) page range (default: all pages)
+
+        Returns:
+            tuple: (document text, stats with pages, ocr_pages, cache_hits, dpi per OCR page, seconds)
+        """
+        start = time.perf_counter()
+        page_numbers = page_range(pdf_document, pages)
+        page_texts: List[str] = []
+        stats = {'pages': len(page_numbers), 'ocr_pages': 0, 'cache_hits': 0, 'dpi': []}
+        # Pages submitted for recognition, oldest first: (position in page_texts, cache key, future)
+        in_flight = deque()
+        # The first miss waits here: a document with a single one recognises it inline, without the pool
+        held = None
+
+        def finish(position: int, key: Optional[str], text: str) -> None:
+            page_texts[position] = text
+            if self.cache:
+                self.cache.put(key, text)
+
+        for position, page_num in enumerate(page_numbers):
+            page = pdf_document.load_page(page_num)
+            text = page.get_text("text")
+            page_texts.append(text)
+            if len(''.join(text.split())) >= MIN_TEXT_CHARS:
+                continue
+
+            dpi = choose_dpi(page, self.default_dpi, self.min_dpi, self.max_dpi)
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            job = (pixmap.width, pixmap.height, pixmap.samples, dpi, self.language)
+            del pixmap, page
+            stats['ocr_pages'] += 1
+            stats['dpi'].append(dpi)
+
+            key = OCRCache.make_key(job[0], job[1], job[2], self.language) if self.cache else None
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                page_texts[position] = cached
+                stats['cache_hits'] += 1
+            elif self.workers <= 1:
+                finish(position, key, ocr_pixmap(*job))
+            elif held is None and not in_flight:
+                held = (position, key, job)
+            else:
+                executor = self._get_executor()
+                for miss_position, miss_key, miss_job in ([held] if held else []) + [(position, key, job)]:
+                    in_flight.append((miss_position, miss_key, executor.submit(ocr_pixmap, *miss_job)))
+                held = miss_job = None
+                while len(in_flight) >= self.max_in_flight:
+                    finish(*self._collect(in_flight))
+            del job
+
+        if held is not None:
+            finish(held[0], held[1], ocr_pixmap(*held[2]))
+        while in_flight:
+            finish(*self._collect(in_flight))
+
+        stats['seconds'] = round(time.perf_counter() - start, 4)
+        return "\n".join(page_texts), stats
+
+    @staticmethod
+    def _collect(in_flight: deque) -> Tuple[int, Optional[str], str]:
+        """Wait for the oldest submitted page and return (position, cache key, text)"""
+        position, key, future = in_flight.popleft()
+        return position, key, future.result()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawn rather than fork: callers include the multi-threaded Streamlit server
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,231 @@
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from data_parser import DataParser
+
+DEFAULT_GOLDEN_DIR = './parser_golden'
+CASES_FILE = 'cases.jsonl'
+BASELINE_FILE = 'baseline.json'
+
+# Allowed drop in a field's precision or recall before the run fails
+DEFAULT_ACCURACY_TOLERANCE = 0.01
+# Allowed relative slowdown of a field's (or the total) parse time before the run fails
+DEFAULT_LATENCY_TOLERANCE = 0.25
+# Slowdowns smaller than this (ms over the whole corpus) are timer noise and never fail a run
+LATENCY_FLOOR_MS = 2.0
+
+# Output-field prefix for each nested group of DataParser.patterns
+_GROUP_PREFIXES = {
+    'current_address': 'current_',
+    'permanent_address': 'permanent_',
+    'temporary_address': 'temporary_',
+    'bank_details': 'bank_',
+}
+
+
+def pattern_fields(patterns: Dict) -> Iterator[Tuple[str, str, List[str]]]:
+    """
+    Flatten DataParser.patterns
+
+    Yields:
+        tuple: (parse_data output field, pattern path such as 'permanent_address.ward_no', pattern list)
+    """
+    for key, value in patterns.items():
+        if isinstance(value, list):
+            yield key, key, value
+            continue
+        prefix = _GROUP_PREFIXES.get(key, '')
+        for field, field_patterns in value.items():
+            # bank_details.bank_name is already prefixed in the output
+            output = field if field.startswith(prefix) else f'{prefix}{field}'
+            yield output, f'{key}.{field}', field_patterns
+
+
+def load_cases(golden_dir: str = DEFAULT_GOLDEN_DIR) -> List[Dict]:
+    """Golden cases: {id, source, text, expected} per line"""
+    with open(os.path.join(golden_dir, CASES_FILE), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_cases(golden_dir: str = DEFAULT_GOLDEN_DIR, count: int = 100, seed: int = 7,
+                sample_paths: Optional[List[str]] = None, max_pages: int = 3) -> str:
+    """
+    Write the golden corpus: extracted texts with their expected parse_data output
+
+    Synthetic documents (synthetic_pdfs.py) carry their generated values as the
+    expectation. Real sample PDFs carry the parser's current output, which must
+    be reviewed by hand before it is committed.
+
+    Returns:
+        str: Path of the cases file
+    """
+    from pdf_processor import PDFProcessor
+    from synthetic_pdfs import generate_documents
+
+    pdf_processor, data_parser = PDFProcessor(), DataParser()
+    os.makedirs(golden_dir, exist_ok=True)
+    path = os.path.join(golden_dir, CASES_FILE)
+    with open(path, 'w', encoding='utf-8') as out:
+        for sample_path in sample_paths or []:
+            text = pdf_processor.extract_text_tiered(sample_path, data_parser)['text']
+            out.write(json.dumps({'id': os.path.basename(sample_path), 'source': 'sample', 'text': text,
+                                  'expected': data_parser.parse_data(text)}, ensure_ascii=False) + '\n')
+        for name, pdf_data, entry in generate_documents(count, seed=seed, max_pages=max_pages):
+            text = pdf_processor.extract_text_tiered(pdf_data, data_parser)['text']
+            out.write(json.dumps({'id': name, 'source': 'synthetic', 'text': text,
+                                  'expected': entry['expected']}, ensure_ascii=False) + '\n')
+    return path
+
+
+def _ratio(numerator: int, denominator: int) -> float:
+    return round(numerator / denominator, 4) if denominator else 1.0
+
+
+def evaluate(cases: List[Dict], data_parser: Optional[DataParser] = None, repeats: int = 5) -> Dict:
+    """
+    Accuracy and latency of DataParser over the golden cases
+
+    A field counts as a true positive when the parsed value equals the expected
+    one, a false positive when a value is parsed that is absent or different,
+    and a false negative when an expected value is missing or different.
+    Timings are the fastest of repeats runs, summed over the corpus: total time
+    is parse_data end to end, field time is that field's pattern list.
+
+    Returns:
+        dict: fields {field: precision, recall, tp, fp, fn, ms, pattern}, total_ms and overall scores
+    """
+    data_parser = data_parser or DataParser()
+    fields = {output: {'pattern': path, 'tp': 0, 'fp': 0, 'fn': 0, 'ms': 0.0}
+              for output, path, _ in pattern_fields(data_parser.patterns)}
+    total_seconds = 0.0
+
+    for case in cases:
+        text, expected = case['text'], case['expected']
+        runs = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            parsed = data_parser.parse_data(text)
+            runs.append(time.perf_counter() - start)
+        total_seconds += min(runs)
+
+        for field in set(parsed) | set(expected):
+            stats = fields.setdefault(field, {'pattern': None, 'tp': 0, 'fp': 0, 'fn': 0, 'ms': 0.0})
+            value, want = parsed.get(field), expected.get(field)
+            if value is not None and value == want:
+                stats['tp'] += 1
+                continue
+            if value is not None:
+                stats['fp'] += 1
+            if want is not None:
+                stats['fn'] += 1
+
+        for output, _, patterns in pattern_fields(data_parser.patterns):
+            runs = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                data_parser._extract_field(text, patterns)
+                runs.append(time.perf_counter() - start)
+            fields[output]['ms'] += min(runs) * 1000
+
+    tp = sum(stats['tp'] for stats in fields.values())
+    fp = sum(stats['fp'] for stats in fields.values())
+    fn = sum(stats['fn'] for stats in fields.values())
+    for stats in fields.values():
+        stats['precision'] = _ratio(stats['tp'], stats['tp'] + stats['fp'])
+        stats['recall'] = _ratio(stats['tp'], stats['tp'] + stats['fn'])
+        stats['ms'] = round(stats['ms'], 3)
+    return {
+        'cases': len(cases),
+        'repeats': repeats,
+        'precision': _ratio(tp, tp + fp),
+        'recall': _ratio(tp, tp + fn),
+        'total_ms': round(total_seconds * 1000, 3),
+        'mean_case_ms': round(total_seconds * 1000 / len(cases), 3) if cases else 0.0,
+        'fields': dict(sorted(fields.items()))
+    }
+
+
+def compare(result: Dict, baseline: Dict, accuracy_tolerance: float = DEFAULT_ACCURACY_TOLERANCE,
+            latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE) -> List[str]:
+    """Regressions of result against baseline, one message each (empty when none)"""
+    regressions = []
+
+    def slower(current: float, before: float) -> bool:
+        return current > before * (1 + latency_tolerance) and current - before > LATENCY_FLOOR_MS
+
+    if slower(result['total_ms'], baseline['total_ms']):
+        regressions.append(f"total parse time {baseline['total_ms']:.1f} -> {result['total_ms']:.1f} ms")
+    for metric in ('precision', 'recall'):
+        if result[metric] < baseline[metric] - accuracy_tolerance:
+            regressions.append(f"overall {metric} {baseline[metric]:.4f} -> {result[metric]:.4f}")
+
+    for field, before in baseline['fields'].items():
+        current = result['fields'].get(field)
+        if current is None:
+            regressions.append(f"{field}: no longer parsed")
+            continue
+        for metric in ('precision', 'recall'):
+            if current[metric] < before[metric] - accuracy_tolerance:
+                regressions.append(f"{field}: {metric} {before[metric]:.4f} -> {current[metric]:.4f}")
+        if slower(current['ms'], before['ms']):
+            regressions.append(f"{field} ({current['pattern']}): {before['ms']:.1f} -> {current['ms']:.1f} ms")
+    return regressions
+
+
+def format_result(result: Dict, baseline: Optional[Dict] = None) -> str:
+    lines = [f"{'field':<26} {'prec':>6} {'recall':>6} {'ms':>8} {'base ms':>8}"]
+    for field, stats in result['fields'].items():
+        before = (baseline or {}).get('fields', {}).get(field, {})
+        lines.append(f"{field:<26} {stats['precision']:>6.3f} {stats['recall']:>6.3f} {stats['ms']:>8.1f} "
+                     f"{before.get('ms', float('nan')):>8.1f}")
+    lines.append(f"{'TOTAL':<26} {result['precision']:>6.3f} {result['recall']:>6.3f} {result['total_ms']:>8.1f} "
+                 f"{(baseline or {}).get('total_ms', float('nan')):>8.1f}")
+    lines.append(f"{result['cases']} case(s), {result['mean_case_ms']:.2f} ms per case (best of {result['repeats']})")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="DataParser accuracy and latency regression harness")
+    parser.add_argument('command', choices=('run', 'build'), help="run the harness or rebuild the golden corpus")
+    parser.add_argument('--golden-dir', default=DEFAULT_GOLDEN_DIR, help="Golden corpus directory")
+    parser.add_argument('--update-baseline', action='store_true', help="Store this run as the new baseline")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed runs per case (fastest is kept)")
+    parser.add_argument('--accuracy-tolerance', type=float, default=DEFAULT_ACCURACY_TOLERANCE)
+    parser.add_argument('--latency-tolerance', type=float, default=DEFAULT_LATENCY_TOLERANCE)
+    parser.add_argument('--count', type=int, default=100, help="build: synthetic cases")
+    parser.add_argument('--seed', type=int, default=7, help="build: synthetic corpus seed")
+    parser.add_argument('--max-pages', type=int, default=3, help="build: largest synthetic page count")
+    parser.add_argument('--sample', nargs='*', default=['attached_assets/sample_1751787487430.pdf'],
+                        help="build: real PDFs snapshotted with the current parser output")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print(build_cases(args.golden_dir, args.count, args.seed, args.sample, args.max_pages))
+        sys.exit(0)
+
+    result = evaluate(load_cases(args.golden_dir), repeats=args.repeats)
+    baseline_path = os.path.join(args.golden_dir, BASELINE_FILE)
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(format_result(result, baseline))
+
+    if args.update_baseline or baseline is None:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+        sys.exit(0)
+
+    regressions = compare(result, baseline, args.accuracy_tolerance, args.latency_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against the baseline:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+    print("\nNo regressions against the baseline")
@@ -0,0 +1,129 @@
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+TRANSPORT_PICKLE = 'pickle'
+TRANSPORT_SHARED_MEMORY = 'shared_memory'
+TRANSPORTS = (TRANSPORT_PICKLE, TRANSPORT_SHARED_MEMORY)
+
+
+class PayloadHandle:
+    """Picklable reference to a payload held in a shared memory segment"""
+
+    __slots__ = ('name', 'size')
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+    def __getstate__(self):
+        return (self.name, self.size)
+
+    def __setstate__(self, state):
+        self.name, self.size = state
+
+    def __repr__(self):
+        return f"PayloadHandle({self.name!r}, {self.size})"
+
+
+def share_bytes(data) -> Tuple[shared_memory.SharedMemory, PayloadHandle]:
+    """
+    Copy a payload into a new shared memory segment
+
+    The caller owns the returned segment and must close() it; whichever process
+    consumes the payload last unlinks it.
+
+    Returns:
+        tuple: (segment, handle to send to the other process)
+    """
+    size = len(data)
+    # Zero-sized segments are not allowed
+    segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    segment.buf[:size] = data
+    return segment, PayloadHandle(segment.name, size)
+
+
+def attach(handle: PayloadHandle) -> Tuple[shared_memory.SharedMemory, memoryview]:
+    """
+    Map a shared payload without copying it
+
+    Returns:
+        tuple: (segment, memoryview over the payload); release the view before closing the segment
+    """
+    segment = shared_memory.SharedMemory(name=handle.name)
+    return segment, segment.buf[:handle.size]
+
+
+def take_bytes(handle: PayloadHandle) -> bytes:
+    """Copy a shared payload out into bytes and unlink its segment"""
+    segment, view = attach(handle)
+    try:
+        return bytes(view)
+    finally:
+        view.release()
+        segment.close()
+        segment.unlink()
+
+
+def release(segment: Optional[shared_memory.SharedMemory], unlink: bool = False) -> None:
+    if segment is None:
+        return
+    segment.close()
+    if unlink:
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class TransportStats:
+    """
+    Modeled estimate of bytes copied in user space while moving payloads to and from workers
+
+    Copies are not measured: each payload size is multiplied by the copies its
+    transport makes by construction, as follows.
+    pickle: each payload is pickled by the sender (1 copy), received from the
+    pipe into a message buffer (1) and unpickled from it (1).
+    shared_memory: the input is copied into a segment once and opened by the
+    worker from a memoryview (no further copy); the filled PDF is copied into
+    a segment by the worker and out of it by the parent (2).
+    """
+
+    INPUT_COPIES = {TRANSPORT_PICKLE: 3, TRANSPORT_SHARED_MEMORY: 1}
+    OUTPUT_COPIES = {TRANSPORT_PICKLE: 3, TRANSPORT_SHARED_MEMORY: 2}
+
+    def __init__(self, mode: str):
+        if mode not in TRANSPORTS:
+            raise ValueError(f"Unsupported transport '{mode}', expected one of {', '.join(TRANSPORTS)}")
+        self.mode = mode
+        self.documents = 0
+        self.input_bytes = 0
+        self.input_sent_bytes = 0
+        self.output_bytes = 0
+
+    def add(self, input_size: int, output_size: int, sends: int = 1) -> None:
+        """
+        Args:
+            input_size: Source PDF size
+            output_size: Filled PDF size (0 when none came back)
+            sends: Tasks the source was sent to; each pickles it again, a segment is shared by all
+        """
+        self.documents += 1
+        self.input_bytes += input_size
+        self.input_sent_bytes += input_size * sends
+        self.output_bytes += output_size
+
+    def summary(self) -> Dict:
+        input_bytes = self.input_sent_bytes if self.mode == TRANSPORT_PICKLE else self.input_bytes
+        copied = (input_bytes * self.INPUT_COPIES[self.mode] +
+                  self.output_bytes * self.OUTPUT_COPIES[self.mode])
+        baseline = (self.input_sent_bytes * self.INPUT_COPIES[TRANSPORT_PICKLE] +
+                    self.output_bytes * self.OUTPUT_COPIES[TRANSPORT_PICKLE])
+        return {
+            'mode': self.mode,
+            'documents': self.documents,
+            'payload_bytes': self.input_bytes + self.output_bytes,
+            # Payload sizes times INPUT_COPIES/OUTPUT_COPIES, not measurements
+            'modeled_bytes_copied': copied,
+            'modeled_bytes_copied_per_document': copied // self.documents if self.documents else 0,
+            'modeled_pickle_bytes_copied_per_document': baseline // self.documents if self.documents else 0
+        }
@@ -0,0 +1,35 @@
+from typing import List, Optional
+
+import fitz  # PyMuPDF
+
+# Thumbnails are for spotting misplaced or missing values, not for reading fine print
+DEFAULT_PREVIEW_DPI = 40
+MIN_PREVIEW_DPI = 20
+MAX_PREVIEW_DPI = 150
+PREVIEW_JPEG_QUALITY = 70
+
+
+def render_thumbnails(pdf_data: bytes, dpi: int = DEFAULT_PREVIEW_DPI, max_pages: Optional[int] = None,
+                      jpeg_quality: int = PREVIEW_JPEG_QUALITY) -> List[bytes]:
+    """
+    Render low-resolution JPEG thumbnails of a PDF's pages
+
+    Form field appearances are drawn, so filled values show as they would in a viewer.
+
+    Args:
+        pdf_data: PDF bytes (e.g. a filled template)
+        dpi: Render resolution
+        max_pages: Render at most this many leading pages (default: all)
+        jpeg_quality: JPEG quality (1-100)
+
+    Returns:
+        list: JPEG bytes per rendered page
+    """
+    dpi = max(MIN_PREVIEW_DPI, min(MAX_PREVIEW_DPI, dpi))
+    thumbnails = []
+    with fitz.open(stream=pdf_data, filetype="pdf") as pdf_document:
+        page_count = pdf_document.page_count if max_pages is None else min(max_pages, pdf_document.page_count)
+        for page_num in range(page_count):
+            pixmap = pdf_document.load_page(page_num).get_pixmap(dpi=dpi, alpha=False, annots=True)
+            thumbnails.append(pixmap.tobytes(output="jpeg", jpg_quality=jpeg_quality))
+    return thumbnails
@@ -1,41 +1,61 @@
+import io
+import mmap
+import os
+import time
 import fitz  # PyMuPDF
 import streamlit as st
-from typing import Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from kyc_record import FAMILY_FIELDS, PERSONAL_FIELDS, KYCRecord
+from ocr_stage import OCRStage, page_range, tesseract_available
+
+# Extraction tiers, cheapest first; later tiers only run when earlier ones score too low
+TIER_TEXT = 'text'
+TIER_BLOCKS = 'blocks'
+TIER_WORDS = 'words'
+TIER_OCR = 'ocr'
+EXTRACTION_TIERS = (TIER_TEXT, TIER_BLOCKS, TIER_WORDS, TIER_OCR)
+
+# Parsed fields whose presence shows the extracted text is usable
+QUALITY_FIELDS = PERSONAL_FIELDS + FAMILY_FIELDS
+
+# Score at which tiered extraction stops escalating. Fully printable text scores
+# 0.4 before any field is found, so this accepts clean text with two or more
+# QUALITY_FIELDS (sparse forms included) and escalates text with fewer, or with
+# mojibake. Calibrated on the parser_golden documents, where no text-tier score
+# falls below 0.6 except the blank template's 0.48.
+DEFAULT_MIN_QUALITY = 0.45
+
 
 class PDFProcessor:
     """Handles PDF text extraction with support for Nepali and English text"""
     
-    def __init__(self):
-        pass
+    def __init__(self, min_quality: float = DEFAULT_MIN_QUALITY, enable_ocr: bool = True,
+                 ocr_stage: Optional[OCRStage] = None):
+        """
+        Args:
+            min_quality: Quality score (0-1) at which tiered extraction stops escalating
+            enable_ocr: Allow the OCR tier when a local Tesseract install is found
+            ocr_stage: OCRStage used by the OCR tier (an in-process one is created when omitted)
+        """
+        self.min_quality = min_quality
+        self.enable_ocr = enable_ocr
+        self.ocr_stage = ocr_stage
+        self._ocr_available = None
     
     def extract_text(self, pdf_file) -> str:
         """
         Extract text from uploaded PDF file using PyMuPDF
         
         Args:
-            pdf_file: Streamlit uploaded file object
+            pdf_file: Streamlit uploaded file object, file path, or a bytes/memoryview/mmap buffer
             
         Returns:
             str: Extracted text from the PDF
         """
         try:
-            # Read the PDF file
-            pdf_bytes = pdf_file.read()
-            
-            # Open PDF with PyMuPDF
-            pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
-            
-            extracted_text = ""
-            
-            # Extract text from each page
-            for page_num in range(pdf_document.page_count):
-                page = pdf_document[page_num]
-                
-                # Extract text with Unicode support (important for Nepali text)
-                page_text = page.get_text("text")
-                extracted_text += page_text + "\n"
-            
-            pdf_document.close()
+            # Pages are loaded and released one at a time
+            extracted_text = "\n".join(text for _, text in self.iter_page_text(pdf_file))
             
             # Clean up the extracted text
             extracted_text = self._clean_text(extracted_text)
@@ -46,6 +66,197 @@ class PDFProcessor:
             st.error(f"Error extracting text from PDF: {str(e)}")
             return ""
     
+    def iter_page_text(self, pdf_file) -> Iterator[Tuple[int, str]]:
+        """
+        Lazily extract text page by page
+        
+        Only the current page is loaded at any time; with a path or mmap input
+        the document itself is read from disk on demand rather than held in memory.
+        
+        Args:
+            pdf_file: Streamlit uploaded file object, file path, or a bytes/memoryview/mmap buffer
+            
+        Yields:
+            tuple: (1-based page number, raw page text)
+        """
+        pdf_document = self._open_document(pdf_file)
+        try:
+            yield from self._iter_document_pages(pdf_document)
+        finally:
+            pdf_document.close()
+    
+    def _iter_document_pages(self, pdf_document, pages: Optional[Tuple[int, int]] = None
+                             ) -> Iterator[Tuple[int, str]]:
+        for page_num in page_range(pdf_document, pages):
+            page = pdf_document.load_page(page_num)
+            
+            # Extract text with Unicode support (important for Nepali text)
+            page_text = page.get_text("text")
+            del page
+            yield page_num + 1, page_text
+    
+    def _open_document(self, pdf_file):
+        """
+        Open a PDF from a path, an in-memory buffer or a file object
+        
+        Paths (and file objects opened from disk) are opened by MuPDF directly
+        from the file. bytes, memoryview and mmap buffers (e.g. a shared memory
+        segment or a mapped scan bundle) are handed over without a Python-side copy.
+        Any other file object is read into memory.
+        """
+        if isinstance(pdf_file, (str, os.PathLike)):
+            return fitz.open(pdf_file, filetype="pdf")
+        if isinstance(pdf_file, mmap.mmap):
+            return fitz.open(stream=memoryview(pdf_file), filetype="pdf")
+        if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+            return fitz.open(stream=pdf_file, filetype="pdf")
+        if isinstance(pdf_file, (io.BufferedReader, io.FileIO)) and os.path.isfile(pdf_file.name):
+            return fitz.open(pdf_file.name, filetype="pdf")
+        return fitz.open(stream=pdf_file.read(), filetype="pdf")
+    
+    def count_pages(self, pdf_file) -> int:
+        """Page count read from the document structure only (no page content is parsed)"""
+        pdf_document = self._open_document(pdf_file)
+        try:
+            return pdf_document.page_count
+        finally:
+            pdf_document.close()
+    
+    def extract_text_tiered(self, pdf_file, data_parser=None,
+                            pages: Optional[Tuple[int, int]] = None) -> Dict:
+        """
+        Extract text, escalating to costlier strategies only when needed
+        
+        Tiers run in EXTRACTION_TIERS order (plain text, sorted blocks, word
+        layout, then OCR when Tesseract is installed) and stop at the first
+        one whose quality score reaches min_quality. If none does, the best
+        scoring text is returned. With a data_parser, the record parsed to
+        score the returned text comes back too, so callers need not parse
+        the same text again.
+        
+        Args:
+            pdf_file: Streamlit uploaded file object, file path, or a bytes/memoryview/mmap buffer
+            data_parser: Optional DataParser used for the field hit rate part of the score
+            pages: Optional 0-based [start, stop) page range to extract
+            
+        Returns:
+            dict: text, tier, score, record (DataParser.parse_record of text, or None
+            without a data_parser) and attempts (tier, score, seconds, accepted per tier
+            tried; the OCR attempt also carries the OCRStage stats)
+        """
+        result = {'text': '', 'tier': None, 'score': 0.0, 'record': None, 'attempts': []}
+        try:
+            pdf_document = self._open_document(pdf_file)
+        except Exception as e:
+            st.error(f"Error extracting text from PDF: {str(e)}")
+            return result
+        
+        try:
+            for tier in self._available_tiers():
+                start = time.perf_counter()
+                ocr_stats = None
+                try:
+                    if tier == TIER_OCR:
+                        text, ocr_stats = self._get_ocr_stage().ocr_document(pdf_document, pages)
+                    else:
+                        text = self._extract_tier(pdf_document, tier, pages)
+                    text = self._clean_text(text)
+                except Exception:
+                    text = ""
+                score, record = self._score(text, data_parser)
+                accepted = score >= self.min_quality
+                attempt = {
+                    'tier': tier,
+                    'score': round(score, 3),
+                    'seconds': round(time.perf_counter() - start, 4),
+                    'accepted': accepted
+                }
+                if ocr_stats is not None:
+                    attempt['ocr'] = ocr_stats
+                result['attempts'].append(attempt)
+                if result['tier'] is None or score > result['score']:
+                    result.update(text=text, tier=tier, score=round(score, 3), record=record)
+                if accepted:
+                    break
+        finally:
+            pdf_document.close()
+        
+        return result
+    
+    def score_text(self, text: str, data_parser=None) -> float:
+        """
+        Cheap quality score in [0, 1] for extracted text
+        
+        Combines the share of printable characters (mojibake and unmapped glyphs
+        lower it) with, when a parser is given, the share of QUALITY_FIELDS it
+        can find in the text.
+        """
+        return self._score(text, data_parser)[0]
+    
+    def _score(self, text: str, data_parser=None) -> Tuple[float, Optional[KYCRecord]]:
+        """score_text, plus the record parsed for it (None without a parser or text)"""
+        characters = [c for c in text if not c.isspace()]
+        if not characters:
+            return 0.0, None
+        printable = sum(1 for c in characters
+                        if c.isprintable() and c != '\ufffd' and not '\ue000' <= c <= '\uf8ff')
+        printable_ratio = printable / len(characters)
+        if data_parser is None:
+            return printable_ratio, None
+        
+        record = data_parser.parse_record(text)
+        field_hit_rate = sum(1 for field in QUALITY_FIELDS if record.get(field)) / len(QUALITY_FIELDS)
+        return 0.4 * printable_ratio + 0.6 * field_hit_rate, record
+    
+    def _available_tiers(self) -> Tuple[str, ...]:
+        if self.enable_ocr and self.ocr_available():
+            return EXTRACTION_TIERS
+        return tuple(tier for tier in EXTRACTION_TIERS if tier != TIER_OCR)
+    
+    def ocr_available(self) -> bool:
+        """True when PyMuPDF can find a local Tesseract language data directory"""
+        if self._ocr_available is None:
+            self._ocr_available = tesseract_available()
+        return self._ocr_available
+    
+    def _get_ocr_stage(self) -> OCRStage:
+        if self.ocr_stage is None:
+            self.ocr_stage = OCRStage(workers=1)
+        return self.ocr_stage
+    
+    def _extract_tier(self, pdf_document, tier: str, pages: Optional[Tuple[int, int]] = None) -> str:
+        """Extract the document's text (or a page range of it) with one of the text-layer tiers"""
+        if tier == TIER_TEXT:
+            return "\n".join(text for _, text in self._iter_document_pages(pdf_document, pages))
+        
+        page_texts = []
+        for page_num in page_range(pdf_document, pages):
+            page = pdf_document.load_page(page_num)
+            if tier == TIER_BLOCKS:
+                # Text blocks in reading order (top-left to bottom-right)
+                blocks = page.get_text("blocks", sort=True)
+                page_texts.append("\n".join(block[4] for block in blocks if block[6] == 0))
+            elif tier == TIER_WORDS:
+                page_texts.append(self._layout_words(page.get_text("words", sort=True)))
+            del page
+        return "\n".join(page_texts)
+    
+    def _layout_words(self, words: List[tuple]) -> str:
+        """
+        Rebuild visual lines from positioned words
+        
+        Words whose vertical centres are within half a line height share a line,
+        so a label and its value in separate table cells end up side by side.
+        """
+        lines = []
+        for x0, y0, x1, y1, word, *_ in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+            centre = (y0 + y1) / 2
+            if lines and abs(centre - lines[-1][0]) <= (y1 - y0) / 2:
+                lines[-1][1].append((x0, word))
+            else:
+                lines.append([centre, [(x0, word)]])
+        return "\n".join(" ".join(word for _, word in sorted(line_words)) for _, line_words in lines)
+    
     def _clean_text(self, text: str) -> str:
         """
         Clean and normalize extracted text
@@ -76,39 +287,81 @@ class PDFProcessor:
         Extract text along with metadata from PDF
         
         Args:
-            pdf_file: Streamlit uploaded file object
+            pdf_file: Streamlit uploaded file object, file path, or a bytes/memoryview/mmap buffer
             
         Returns:
             dict: Contains text, page_count, and other metadata
         """
         try:
-            pdf_bytes = pdf_file.read()
-            pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+            pdf_document = self._open_document(pdf_file)
             
-            result = {
-                'text': '',
-                'page_count': pdf_document.page_count,
-                'metadata': pdf_document.metadata,
-                'pages': []
-            }
-            
-            for page_num in range(pdf_document.page_count):
-                page = pdf_document[page_num]
-                page_text = page.get_text("text")
-                
-                result['pages'].append({
-                    'page_number': page_num + 1,
-                    'text': page_text,
-                    'char_count': len(page_text)
-                })
+            try:
+                result = {
+                    'text': '',
+                    'page_count': pdf_document.page_count,
+                    'metadata': pdf_document.metadata,
+                    'pages': []
+                }
                 
-                result['text'] += page_text + "\n"
+                page_texts = []
+                for page_number, page_text in self._iter_document_pages(pdf_document):
+                    result['pages'].append({
+                        'page_number': page_number,
+                        'text': page_text,
+                        'char_count': len(page_text)
+                    })
+                    page_texts.append(page_text)
+            finally:
+                pdf_document.close()
             
-            pdf_document.close()
-            result['text'] = self._clean_text(result['text'])
+            result['text'] = self._clean_text("\n".join(page_texts))
             
             return result
             
         except Exception as e:
             st.error(f"Error extracting text with metadata: {str(e)}")
             return {'text': '', 'page_count': 0, 'metadata': {}, 'pages': []}
+
+
+class ExtractionStats:
+    """Per-tier run counts and latencies accumulated from extract_text_tiered attempts"""
+    
+    def __init__(self):
+        self.documents = 0
+        self.tiers = {tier: {'runs': 0, 'accepted': 0, 'seconds': 0.0} for tier in EXTRACTION_TIERS}
+        self.ocr_pages = 0
+        self.ocr_cache_hits = 0
+    
+    def add(self, attempts: List[Dict]) -> None:
+        if not attempts:
+            return
+        self.documents += 1
+        for attempt in attempts:
+            tier_stats = self.tiers[attempt['tier']]
+            tier_stats['runs'] += 1
+            tier_stats['accepted'] += int(attempt['accepted'])
+            tier_stats['seconds'] += attempt['seconds']
+            if 'ocr' in attempt:
+                self.ocr_pages += attempt['ocr']['ocr_pages']
+                self.ocr_cache_hits += attempt['ocr']['cache_hits']
+    
+    def summary(self) -> Dict:
+        """
+        Returns:
+            dict: documents, OCR page and cache hit counts, and per tier that ran: runs,
+            accepted, share of documents reaching it, avg_ms
+        """
+        return {
+            'documents': self.documents,
+            'ocr_pages': self.ocr_pages,
+            'ocr_cache_hits': self.ocr_cache_hits,
+            'tiers': {
+                tier: {
+                    'runs': stats['runs'],
+                    'accepted': stats['accepted'],
+                    'share': round(stats['runs'] / self.documents, 3),
+                    'avg_ms': round(stats['seconds'] * 1000 / stats['runs'], 1)
+                }
+                for tier, stats in self.tiers.items() if stats['runs']
+            }
+        }
@@ -0,0 +1,246 @@
+import csv
+import io
+import json
+import os
+import shutil
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from kyc_record import KYC_FIELDS, KYCRecord, KYCRecordBatch
+
+# Fixed export column order: source file first, then the DataParser schema
+EXPORT_COLUMNS = ('source_file',) + KYC_FIELDS
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+class RecordWriter:
+    """Buffered writer that streams parsed records to a file in EXPORT_COLUMNS order"""
+
+    def __init__(self, output, buffer_rows: int = 1000):
+        """
+        Args:
+            output: Path or binary file object to write to
+            buffer_rows: Number of rows held in memory before each flush
+        """
+        self._owns_file = isinstance(output, (str, os.PathLike))
+        self._file = open(output, 'wb') if self._owns_file else output
+        self.buffer_rows = buffer_rows
+        self._buffer: List[Tuple[str, KYCRecord]] = []
+        self.rows_written = 0
+
+    def write(self, source_file: str, record) -> None:
+        """Queue one record (KYCRecord or parsed_data dict)"""
+        if not isinstance(record, KYCRecord):
+            record = KYCRecord.from_dict(record)
+        self._buffer.append((source_file, record))
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._write_rows(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        self._finish()
+        if self._owns_file:
+            self._file.close()
+
+    def _write_rows(self, rows: List[Tuple[str, KYCRecord]]) -> None:
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CSVRecordWriter(RecordWriter):
+    """CSV with a header row; missing fields are written as empty cells"""
+
+    def __init__(self, output, buffer_rows: int = 1000):
+        super().__init__(output, buffer_rows)
+        self._text = io.TextIOWrapper(self._file, encoding='utf-8', newline='', write_through=True)
+        self._csv = csv.writer(self._text)
+        self._csv.writerow(EXPORT_COLUMNS)
+
+    def _write_rows(self, rows):
+        self._csv.writerows((source,) + tuple(v or '' for v in record.to_row())
+                            for source, record in rows)
+
+    def _finish(self):
+        self._text.flush()
+        # Leave closing the underlying file to RecordWriter.close
+        self._text.detach()
+
+
+class JSONLRecordWriter(RecordWriter):
+    """One JSON object per line with every column present (null when missing)"""
+
+    def _write_rows(self, rows):
+        lines = []
+        for source, record in rows:
+            lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, (source,) + record.to_row())),
+                                    ensure_ascii=False))
+        self._file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+
+
+class ParquetRecordWriter(RecordWriter):
+    """Parquet file with one row group per flushed buffer (requires pyarrow)"""
+
+    def __init__(self, output, buffer_rows: int = 10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires the pyarrow package")
+        super().__init__(output, buffer_rows)
+        self._pa = pa
+        self._schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+        self._parquet = pq.ParquetWriter(self._file, self._schema)
+
+    def _write_rows(self, rows):
+        batch = KYCRecordBatch()
+        batch.extend(record for _, record in rows)
+        arrays = [self._pa.array([source for source, _ in rows], type=self._pa.string())]
+        arrays.extend(self._pa.array(batch.column(field), type=self._pa.string())
+                      for field in KYC_FIELDS)
+        self._parquet.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def _finish(self):
+        self._parquet.close()
+
+
+def get_record_writer(output, fmt: str, buffer_rows: Optional[int] = None) -> RecordWriter:
+    """Create the writer for an export format ('csv', 'jsonl' or 'parquet')"""
+    writers = {
+        'csv': CSVRecordWriter,
+        'jsonl': JSONLRecordWriter,
+        'parquet': ParquetRecordWriter
+    }
+    if fmt not in writers:
+        raise ValueError(f"Unsupported export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if buffer_rows is None:
+        return writers[fmt](output)
+    return writers[fmt](output, buffer_rows)
+
+
+def concat_exports(paths: List[str], output: str, fmt: str) -> int:
+    """
+    Concatenate exports of one format into a single file, in the order given
+
+    Rows are copied as written (CSV keeps the first header only, Parquet
+    copies row groups), so nothing is re-parsed.
+
+    Returns:
+        int: Number of files concatenated
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires the pyarrow package")
+        writer = None
+        try:
+            for path in paths:
+                parquet_file = pq.ParquetFile(path)
+                if writer is None:
+                    writer = pq.ParquetWriter(output, parquet_file.schema_arrow)
+                for group in range(parquet_file.num_row_groups):
+                    writer.write_table(parquet_file.read_row_group(group))
+        finally:
+            if writer is not None:
+                writer.close()
+        return len(paths)
+
+    with open(output, 'wb') as out:
+        for index, path in enumerate(paths):
+            with open(path, 'rb') as f:
+                if fmt == 'csv' and index:
+                    # The header row is fixed (EXPORT_COLUMNS) and never spans lines
+                    f.readline()
+                shutil.copyfileobj(f, out)
+    return len(paths)
+
+
+def iter_pdf_paths(inputs: Iterable[str]) -> Iterator[str]:
+    """Yield PDF paths from files and (recursively) directories, in sorted order"""
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith('.pdf'):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def export_parsed_records(sources: Iterable[Tuple[str, object]], writer: RecordWriter,
+                          pdf_processor=None, data_parser=None) -> Dict[str, int]:
+    """
+    Parse-only pipeline: extract and parse each source and stream it to writer
+
+    FormFiller is never invoked, and each document is released as soon as its
+    record has been queued, so memory stays flat regardless of batch size.
+
+    Args:
+        sources: Iterable of (name, file object or path) pairs
+        writer: RecordWriter to receive the parsed records
+        pdf_processor: PDFProcessor instance (created when omitted)
+        data_parser: DataParser instance (created when omitted)
+
+    Returns:
+        dict: Counts of exported, empty-text and unparsed documents
+    """
+    if pdf_processor is None:
+        from pdf_processor import PDFProcessor
+        pdf_processor = PDFProcessor()
+    if data_parser is None:
+        from data_parser import DataParser
+        data_parser = DataParser()
+
+    summary = {'exported': 0, 'no_text': 0, 'no_data': 0}
+    for name, source in sources:
+        extraction = pdf_processor.extract_text_tiered(source, data_parser)
+        if not extraction['text'].strip():
+            summary['no_text'] += 1
+            continue
+        # The record tiered extraction scored the text with
+        record = extraction['record']
+        if not record:
+            summary['no_data'] += 1
+            continue
+        writer.write(name, record)
+        summary['exported'] += 1
+    writer.flush()
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Export parsed KYC records without filling PDFs")
+    parser.add_argument('inputs', nargs='+', help="Source PDF files or directories")
+    parser.add_argument('--output', required=True, help="Export file path")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, help="Export format (default: from extension)")
+    parser.add_argument('--buffer-rows', type=int, help="Rows buffered between flushes")
+    args = parser.parse_args()
+
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    start = time.perf_counter()
+    with get_record_writer(args.output, fmt, args.buffer_rows) as record_writer:
+        # PDFProcessor opens paths directly from disk
+        result = export_parsed_records(((path, path) for path in iter_pdf_paths(args.inputs)), record_writer)
+    result['seconds'] = round(time.perf_counter() - start, 2)
+    print(json.dumps(result))
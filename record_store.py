@@ -0,0 +1,207 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from kyc_record import KYC_FIELDS, KYCRecord
+from bs_calendar import ad_to_bs_column
+
+DEFAULT_DB_PATH = './kyc_records.db'
+
+# Identity fields that get their own index for duplicate-onboarding checks
+IDENTITY_FIELDS = ('citizenship_no', 'pan_no', 'national_id')
+
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+
+_METADATA_COLUMNS = ('source_hash', 'source_name', 'status', 'output_name', 'error', 'processed_at')
+
+
+def hash_bytes(data) -> str:
+    """SHA-256 hex digest used to identify source documents"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class RecordStore:
+    """SQLite-backed store for parsed KYC records and processing metadata"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, batch_size: int = 500):
+        """
+        Args:
+            db_path: SQLite database file (':memory:' for a throwaway store)
+            batch_size: Pending rows buffered before they are inserted in one transaction
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._pending: List[tuple] = []
+        # One store may be shared by several Streamlit sessions
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+
+    def _create_schema(self):
+        columns = ', '.join(f'{field} TEXT' for field in KYC_FIELDS)
+        self._conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                source_name TEXT,
+                status TEXT NOT NULL,
+                output_name TEXT,
+                error TEXT,
+                processed_at REAL NOT NULL,
+                {columns}
+            );
+            CREATE INDEX IF NOT EXISTS idx_records_source_hash ON records (source_hash, status);
+            CREATE INDEX IF NOT EXISTS idx_records_citizenship_no ON records (citizenship_no);
+            CREATE INDEX IF NOT EXISTS idx_records_pan_no ON records (pan_no);
+            CREATE INDEX IF NOT EXISTS idx_records_national_id ON records (national_id);
+        ''')
+        # Stores created before a field joined the schema get its column added
+        existing = {row[1] for row in self._conn.execute('PRAGMA table_info(records)')}
+        added = [field for field in KYC_FIELDS if field not in existing]
+        for field in added:
+            self._conn.execute(f'ALTER TABLE records ADD COLUMN {field} TEXT')
+        if 'date_of_birth_bs' in added:
+            self._backfill_bs_dates()
+        self._conn.commit()
+
+    def _backfill_bs_dates(self) -> None:
+        """Derive date_of_birth_bs for stored records that only have the AD date"""
+        rows = self._conn.execute(
+            'SELECT id, date_of_birth FROM records WHERE date_of_birth IS NOT NULL AND date_of_birth_bs IS NULL'
+        ).fetchall()
+        if rows:
+            bs_dates = ad_to_bs_column([date_of_birth for _, date_of_birth in rows])
+            self._conn.executemany('UPDATE records SET date_of_birth_bs = ? WHERE id = ?',
+                                   [(bs, row_id) for (row_id, _), bs in zip(rows, bs_dates) if bs])
+
+    def add(self, source_hash: str, source_name: str, record=None,
+            status: str = STATUS_SUCCESS, output_name: Optional[str] = None,
+            error: Optional[str] = None) -> None:
+        """Queue one processing result; rows are written in batches of batch_size"""
+        if record is None:
+            record = KYCRecord()
+        elif not isinstance(record, KYCRecord):
+            record = KYCRecord.from_dict(record)
+        with self._lock:
+            self._pending.append(
+                (source_hash, source_name, status, output_name, error, time.time()) + record.to_row()
+            )
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Insert all queued rows in a single transaction"""
+        columns = _METADATA_COLUMNS + KYC_FIELDS
+        placeholders = ', '.join('?' * len(columns))
+        with self._lock:
+            if not self._pending:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO records ({', '.join(columns)}) VALUES ({placeholders})",
+                    self._pending
+                )
+            self._pending = []
+
+    def is_processed(self, source_hash: str) -> bool:
+        """True when a document with this hash was already processed successfully"""
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT 1 FROM records WHERE source_hash = ? AND status = ? LIMIT 1',
+                (source_hash, STATUS_SUCCESS)
+            ).fetchone()
+        return row is not None
+
+    def processed_hashes(self, source_hashes: Iterable[str]) -> Set[str]:
+        """Return the subset of source_hashes already processed successfully"""
+        return self._stored_hashes(source_hashes, STATUS_SUCCESS)
+
+    def recorded_hashes(self, source_hashes: Iterable[str]) -> Set[str]:
+        """Return the subset of source_hashes with at least one row of any status"""
+        return self._stored_hashes(source_hashes)
+
+    def _stored_hashes(self, source_hashes: Iterable[str], status: Optional[str] = None) -> Set[str]:
+        self.flush()
+        hashes = list(source_hashes)
+        status_clause, status_params = ('status = ? AND ', [status]) if status else ('', [])
+        found = set()
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT DISTINCT source_hash FROM records WHERE {status_clause}"
+                    f"source_hash IN ({', '.join('?' * len(chunk))})",
+                    status_params + chunk
+                ).fetchall()
+            found.update(row[0] for row in rows)
+        return found
+
+    def find_by_identity(self, **identity) -> List[Dict]:
+        """
+        Look up successfully processed records by citizenship_no, pan_no or national_id
+
+        Args:
+            identity: One or more of the IDENTITY_FIELDS as keyword arguments
+
+        Returns:
+            list: Matching rows as dicts (metadata plus parsed fields)
+        """
+        clauses = []
+        params = []
+        for field, value in identity.items():
+            if field not in IDENTITY_FIELDS:
+                raise ValueError(f"'{field}' is not an indexed identity field")
+            if value:
+                clauses.append(f'{field} = ?')
+                params.append(value)
+        if not clauses:
+            return []
+        self.flush()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT * FROM records WHERE status = ? AND ({' OR '.join(clauses)})",
+                [STATUS_SUCCESS] + params
+            )
+            names = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        return [{k: v for k, v in zip(names, row) if v is not None} for row in rows]
+
+    def find_duplicates(self, record, exclude_hash: Optional[str] = None) -> List[Dict]:
+        """Return earlier records that share any identity field with record"""
+        identity = {field: record.get(field) for field in IDENTITY_FIELDS if record.get(field)}
+        matches = self.find_by_identity(**identity)
+        return [m for m in matches if m['source_hash'] != exclude_hash]
+
+    def get_record(self, source_hash: str) -> Optional[KYCRecord]:
+        """Return the latest successful record for a source document"""
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(KYC_FIELDS)} FROM records WHERE source_hash = ? AND status = ? "
+                f"ORDER BY id DESC LIMIT 1",
+                (source_hash, STATUS_SUCCESS)
+            ).fetchone()
+        return KYCRecord.from_row(row) if row else None
+
+    def count(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
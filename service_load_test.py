@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+from http_service import DEFAULT_HOST
+from latency_stats import percentile
+
+DEFAULT_SAMPLE_PDF = 'attached_assets/sample_1751787487430.pdf'
+
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bytes]:
+    """Read one HTTP/1.1 response: (status, lower-cased headers, body)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    else:
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers, body
+
+
+class LoadClient:
+    """Keep-alive connection that replays one request and times each response"""
+
+    def __init__(self, host: str, port: int, request: bytes):
+        self.host = host
+        self.port = port
+        self.request = request
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def send(self) -> Tuple[int, float]:
+        """Send the request once; returns (status, seconds), reconnecting when the server closed"""
+        start = time.perf_counter()
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._writer.write(self.request)
+        await self._writer.drain()
+        status, headers, _ = await read_response(self._reader)
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, time.perf_counter() - start
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+            self._writer = None
+
+
+def build_request(host: str, port: int, path: str, pdf: bytes, name: str) -> bytes:
+    """Raw-body POST of one PDF"""
+    target = f"{path}?{urllib.parse.urlencode({'name': name})}"
+    head = (f"POST {target} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/pdf\r\n"
+            f"Content-Length: {len(pdf)}\r\n\r\n")
+    return head.encode('latin-1') + pdf
+
+
+async def run_load(host: str, port: int, path: str, pdf: bytes, concurrency: int, total: int,
+                   name: str = 'load_test.pdf') -> Dict:
+    """
+    Send total requests over concurrency keep-alive connections
+
+    Returns:
+        dict: Request count, status counts, error count, requests per second and latency percentiles (ms)
+    """
+    request = build_request(host, port, path, pdf, name)
+    remaining = total
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    errors = 0
+
+    async def worker():
+        nonlocal remaining, errors
+        client = LoadClient(host, port, request)
+        try:
+            while remaining > 0:
+                remaining -= 1
+                try:
+                    status, seconds = await client.send()
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    errors += 1
+                    await client.close()
+                    continue
+                statuses[status] = statuses.get(status, 0) + 1
+                latencies.append(seconds)
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'endpoint': path,
+        'requests': total,
+        'concurrency': concurrency,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'errors': errors,
+        'seconds': round(elapsed, 2),
+        'requests_per_second': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {label: round(percentile(latencies, fraction) * 1000, 1)
+                       for label, fraction in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99))}
+    }
+
+
+async def wait_until_healthy(host: str, port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"GET /health HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+            await writer.drain()
+            status, _, _ = await read_response(reader)
+            writer.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Service on {host}:{port} did not become healthy")
+        await asyncio.sleep(0.5)
+
+
+async def fetch_metrics(host: str, port: int) -> Dict:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /metrics HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    _, _, body = await read_response(reader)
+    writer.close()
+    return json.loads(body)
+
+
+async def main(args) -> None:
+    with open(args.pdf, 'rb') as f:
+        pdf = f.read()
+
+    service = None
+    if args.url:
+        url = urllib.parse.urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        # Start a local service in its own process so the client does not share its event loop
+        host, port = DEFAULT_HOST, args.port
+        command = [sys.executable, 'http_service.py', '--port', str(port)]
+        if args.workers:
+            command += ['--workers', str(args.workers)]
+        service = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        await wait_until_healthy(host, port)
+        if args.warmup:
+            # Spawns the workers and warms their templates before measuring
+            await run_load(host, port, args.endpoint, pdf, min(args.concurrency, args.warmup), args.warmup)
+        report = await run_load(host, port, args.endpoint, pdf, args.concurrency, args.requests)
+        report['server'] = (await fetch_metrics(host, port))['latency_ms'].get(args.endpoint)
+        print(json.dumps(report, indent=2))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure requests per second and latency of http_service.py")
+    parser.add_argument('--url', help="Running service to test (default: start one locally)")
+    parser.add_argument('--port', type=int, default=8765, help="Port for the locally started service")
+    parser.add_argument('--workers', type=int, help="Workers for the locally started service")
+    parser.add_argument('--endpoint', default='/parse', choices=('/parse', '/fill'), help="Endpoint to load")
+    parser.add_argument('--pdf', default=DEFAULT_SAMPLE_PDF, help="Source PDF sent with every request")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent connections")
+    parser.add_argument('--requests', type=int, default=200, help="Requests to send")
+    parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests sent first")
+    asyncio.run(main(parser.parse_args()))
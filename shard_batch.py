@@ -0,0 +1,452 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from batch_journal import remove_checkpoint
+from batch_processor import RESULT_SKIPPED, RESULT_SUCCESS, BatchProcessor, SourceBuffer, new_result
+from record_export import EXPORT_FORMATS, concat_exports, get_record_writer, iter_pdf_paths
+
+logger = logging.getLogger(__name__)
+
+# Documents read into memory and handed to BatchProcessor at a time
+DEFAULT_CHUNK_SIZE = 200
+# Documents per work unit in lease mode
+DEFAULT_UNIT_SIZE = 1000
+# A lease not renewed for this long belongs to a dead node and may be taken over
+DEFAULT_LEASE_SECONDS = 600
+
+# Layout under the shared output root
+CLAIMS_DIR = '.claims'
+CHECKPOINT_DIR = '.checkpoints'
+MERGED_DIR = 'merged'
+PLAN_FILE = 'plan.json'
+
+# Files of each part (one shard or one work unit); summary.json is written last
+MANIFEST_FILE = 'manifest.jsonl'
+FAILURES_FILE = 'failures.jsonl'
+SUMMARY_FILE = 'summary.json'
+RECORDS_STEM = 'records'
+FILLED_DIR = 'filled'
+
+
+def node_name() -> str:
+    """Identifies this process in leases and part summaries"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def list_inputs(input_root: str) -> List[str]:
+    """Relative POSIX paths of every PDF under input_root, sorted (identical on every node)"""
+    return sorted(os.path.relpath(path, input_root).replace(os.sep, '/')
+                  for path in iter_pdf_paths([input_root]))
+
+
+def shard_of(relative_path: str, shard_count: int) -> int:
+    """
+    Shard owning a document
+
+    Keyed on the relative path rather than the position in the listing, so
+    files added to the tree later do not move existing files between shards.
+    """
+    digest = hashlib.sha256(relative_path.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+def shard_part_name(shard_index: int, shard_count: int) -> str:
+    return f"shard-{shard_index:03d}-of-{shard_count:03d}"
+
+
+def unit_part_name(unit: int) -> str:
+    return f"unit-{unit:05d}"
+
+
+def is_part_complete(part_dir: str) -> bool:
+    return os.path.isfile(os.path.join(part_dir, SUMMARY_FILE))
+
+
+def _chunks(items: List[str], size: int) -> Iterator[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def process_part(input_root: str, relative_paths: List[str], output_root: str, part: str,
+                 batch_processor: BatchProcessor, fmt: str = 'jsonl', chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 part_info: Optional[Dict] = None) -> Dict:
+    """
+    Run the full pipeline over one part's documents and write its outputs
+
+    The part is built in a private temporary directory and renamed into place
+    once complete, so a part directory with a summary always holds a full
+    result. If another node finished the same part first (a lease taken over
+    from a node that was only slow), its result is kept and this one dropped.
+
+    Outputs: manifest.jsonl (one line per document), records.<fmt> (parsed
+    records), failures.jsonl and the filled PDFs under filled/, mirroring the
+    input tree.
+
+    Returns:
+        dict: The part summary
+    """
+    part_dir = os.path.join(output_root, part)
+    work_dir = f"{part_dir}.tmp-{node_name()}"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+
+    summary = dict(part_info or {}, part=part, node=node_name(), format=fmt, documents=len(relative_paths),
+                   records=0, statuses={})
+    start = time.perf_counter()
+    batch_ids = []
+    with open(os.path.join(work_dir, MANIFEST_FILE), 'w', encoding='utf-8') as manifest, \
+            open(os.path.join(work_dir, FAILURES_FILE), 'w', encoding='utf-8') as failures, \
+            get_record_writer(os.path.join(work_dir, f'{RECORDS_STEM}.{fmt}'), fmt) as record_writer:
+
+        def write(relative_path: str, result: Dict) -> None:
+            entry = {'path': relative_path, 'source_hash': result['source_hash'], 'status': result['status'],
+                     'output': None, 'extraction_tier': result['extraction_tier'], 'error': result['error']}
+            if result.get('duplicate_of'):
+                entry['duplicate_of'] = result['duplicate_of']
+            if result.get('flags'):
+                entry['flags'] = result['flags']
+            if result.get('verification') and not result['verification']['ok']:
+                entry['verification'] = result['verification']
+            if result['status'] == RESULT_SUCCESS and result['pdf_data']:
+                output_path = os.path.join(work_dir, FILLED_DIR, result['output_name'])
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                with open(output_path, 'wb') as f:
+                    f.write(result['pdf_data'])
+                entry['output'] = f"{part}/{FILLED_DIR}/{result['output_name']}"
+            if result['parsed_data']:
+                record_writer.write(relative_path, result['parsed_data'])
+                summary['records'] += 1
+            if result['status'] not in (RESULT_SUCCESS, RESULT_SKIPPED):
+                failures.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            summary['statuses'][result['status']] = summary['statuses'].get(result['status'], 0) + 1
+
+        # Chunks bound memory; each chunk is a resumable batch of its own (see BatchJournal)
+        for chunk in _chunks(relative_paths, chunk_size):
+            sources = []
+            for relative_path in chunk:
+                try:
+                    with open(os.path.join(input_root, relative_path), 'rb') as f:
+                        sources.append(SourceBuffer(relative_path, f.read()))
+                except OSError as e:
+                    result = new_result(relative_path, '')
+                    result['error'] = f"Could not read source: {e}"
+                    write(relative_path, result)
+            if not sources:
+                continue
+            for _, result in batch_processor.process(sources):
+                write(result['original_name'], result)
+            if batch_processor.summary.get('batch_id'):
+                batch_ids.append(batch_processor.summary['batch_id'])
+
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    summary['finished_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    with open(os.path.join(work_dir, SUMMARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    try:
+        os.rename(work_dir, part_dir)
+    except OSError:
+        if not is_part_complete(part_dir):
+            raise
+        logger.warning("Part %s was completed by another node; discarding this run", part)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        with open(os.path.join(part_dir, SUMMARY_FILE), 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+
+    # The part is durable now; its resume checkpoints are no longer needed
+    if batch_processor.checkpoint_dir:
+        for batch_id in batch_ids:
+            remove_checkpoint(batch_processor.checkpoint_dir, batch_id)
+    return summary
+
+
+def run_shard(input_root: str, output_root: str, shard_index: int, shard_count: int,
+              batch_processor: BatchProcessor, fmt: str = 'jsonl', chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """
+    Process the documents of one static shard of the input tree
+
+    Every node lists the tree and keeps the paths whose shard_of matches its
+    index, so N nodes started with indices 0..N-1 cover the tree exactly once.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard index {shard_index} is outside 0..{shard_count - 1}")
+    part = shard_part_name(shard_index, shard_count)
+    if is_part_complete(os.path.join(output_root, part)):
+        logger.info("Shard %s is already complete", part)
+        with open(os.path.join(output_root, part, SUMMARY_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    paths = [path for path in list_inputs(input_root) if shard_of(path, shard_count) == shard_index]
+    logger.info("Shard %s: %d document(s)", part, len(paths))
+    return process_part(input_root, paths, output_root, part, batch_processor, fmt, chunk_size,
+                        {'mode': 'shard', 'shard_index': shard_index, 'shard_count': shard_count})
+
+
+class UnitClaims:
+    """
+    Lease-based claims on the work units of one input tree, in a directory every node shares
+
+    The first node writes the plan (the sorted input listing cut into units);
+    all nodes then claim units through exclusively created lease files. A
+    claimed unit's lease is renewed while it runs; one left unrenewed for
+    lease_seconds is taken over. A unit is done once its part directory is
+    complete, so there is no separate done marker to lose.
+    """
+
+    def __init__(self, claim_dir: str, output_root: str, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.claim_dir = claim_dir
+        self.output_root = output_root
+        self.lease_seconds = lease_seconds
+        self.node = node_name()
+        os.makedirs(claim_dir, exist_ok=True)
+
+    def plan(self, input_root: str, unit_size: int = DEFAULT_UNIT_SIZE) -> List[List[str]]:
+        """The shared plan, written by whichever node gets here first"""
+        plan_path = os.path.join(self.claim_dir, PLAN_FILE)
+        if not os.path.exists(plan_path):
+            paths = list_inputs(input_root)
+            temp_path = f"{plan_path}.tmp-{self.node}"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'unit_size': unit_size, 'created_by': self.node,
+                           'units': list(_chunks(paths, unit_size))}, f)
+            try:
+                # A hard link publishes the complete file atomically and fails if another node won
+                os.link(temp_path, plan_path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(temp_path)
+        with open(plan_path, 'r', encoding='utf-8') as f:
+            return json.load(f)['units']
+
+    def _lease_path(self, unit: int) -> str:
+        return os.path.join(self.claim_dir, f"{unit_part_name(unit)}.lease")
+
+    def is_done(self, unit: int) -> bool:
+        return is_part_complete(os.path.join(self.output_root, unit_part_name(unit)))
+
+    def claim(self, unit_count: int) -> Optional[int]:
+        """Lease the first unit that is neither done nor held by a live node (None when none is left)"""
+        for unit in range(unit_count):
+            if self.is_done(unit):
+                continue
+            lease_path = self._lease_path(unit)
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._take_over(lease_path):
+                    continue
+                try:
+                    fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.node)
+            # It may have finished between the check and the claim
+            if self.is_done(unit):
+                self.release(unit)
+                continue
+            return unit
+        return None
+
+    def _take_over(self, lease_path: str) -> bool:
+        """Remove a lease its holder stopped renewing; only one node wins the rename"""
+        try:
+            if time.time() - os.path.getmtime(lease_path) < self.lease_seconds:
+                return False
+            stale_path = f"{lease_path}.stale-{self.node}"
+            os.rename(lease_path, stale_path)
+        except OSError:
+            return False
+        logger.warning("Taking over expired lease %s", os.path.basename(lease_path))
+        os.remove(stale_path)
+        return True
+
+    def renew(self, unit: int) -> None:
+        try:
+            os.utime(self._lease_path(unit))
+        except OSError:
+            pass
+
+    def release(self, unit: int) -> None:
+        try:
+            os.remove(self._lease_path(unit))
+        except OSError:
+            pass
+
+    def keep_alive(self, unit: int) -> Tuple[threading.Thread, threading.Event]:
+        """Renew the unit's lease in the background until the returned event is set"""
+        stop = threading.Event()
+
+        def renew_loop():
+            while not stop.wait(self.lease_seconds / 3):
+                self.renew(unit)
+
+        thread = threading.Thread(target=renew_loop, daemon=True)
+        thread.start()
+        return thread, stop
+
+
+def run_units(input_root: str, output_root: str, batch_processor: BatchProcessor, fmt: str = 'jsonl',
+              chunk_size: int = DEFAULT_CHUNK_SIZE, unit_size: int = DEFAULT_UNIT_SIZE,
+              claim_dir: Optional[str] = None, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[Dict]:
+    """
+    Claim and process work units until none is left
+
+    Any number of nodes may run this against the same shared output root;
+    nodes can join late or die, and their units are picked up by the rest.
+
+    Returns:
+        list: Summaries of the units this node completed
+    """
+    claims = UnitClaims(claim_dir or os.path.join(output_root, CLAIMS_DIR), output_root, lease_seconds)
+    units = claims.plan(input_root, unit_size)
+    completed = []
+    while True:
+        unit = claims.claim(len(units))
+        if unit is None:
+            break
+        logger.info("Claimed %s: %d document(s)", unit_part_name(unit), len(units[unit]))
+        thread, stop = claims.keep_alive(unit)
+        try:
+            completed.append(process_part(input_root, units[unit], output_root, unit_part_name(unit),
+                                          batch_processor, fmt, chunk_size,
+                                          {'mode': 'unit', 'unit': unit, 'unit_count': len(units)}))
+        finally:
+            stop.set()
+            thread.join()
+            claims.release(unit)
+    return completed
+
+
+def merge_parts(output_root: str, merged_dir: Optional[str] = None) -> Dict:
+    """
+    Combine every complete part into one manifest, records export and failure list
+
+    Expected parts are derived from the part summaries (shard count or unit
+    count); any that are missing are listed and the result is marked
+    incomplete. Documents whose content hash appears in more than one part
+    (identical files under different paths) are counted.
+
+    Returns:
+        dict: Consolidated summary, also written as merged/summary.json
+    """
+    merged_dir = merged_dir or os.path.join(output_root, MERGED_DIR)
+    parts, summaries = [], []
+    for name in sorted(os.listdir(output_root)):
+        if not is_part_complete(os.path.join(output_root, name)):
+            continue
+        with open(os.path.join(output_root, name, SUMMARY_FILE), 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+        # Skips the merged directory and parts still being renamed into place
+        if summary.get('part') == name:
+            parts.append(name)
+            summaries.append(summary)
+
+    formats = {summary['format'] for summary in summaries}
+    if len(formats) > 1:
+        raise ValueError(f"Parts were exported in different formats: {', '.join(sorted(formats))}")
+    layouts = {(summary['mode'], summary.get('shard_count', summary.get('unit_count'))) for summary in summaries}
+    if len(layouts) > 1:
+        raise ValueError("Parts come from different shard counts or unit plans")
+
+    expected = []
+    if layouts:
+        mode, count = layouts.pop()
+        expected = ([shard_part_name(index, count) for index in range(count)] if mode == 'shard'
+                    else [unit_part_name(unit) for unit in range(count)])
+    missing = [part for part in expected if part not in parts]
+
+    os.makedirs(merged_dir, exist_ok=True)
+    statuses: Dict[str, int] = {}
+    parts_by_hash: Dict[str, set] = {}
+    with open(os.path.join(merged_dir, MANIFEST_FILE), 'w', encoding='utf-8') as manifest, \
+            open(os.path.join(merged_dir, FAILURES_FILE), 'wb') as failures:
+        for part in parts:
+            with open(os.path.join(output_root, part, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    manifest.write(line)
+                    statuses[entry['status']] = statuses.get(entry['status'], 0) + 1
+                    if entry['source_hash']:
+                        parts_by_hash.setdefault(entry['source_hash'], set()).add(part)
+            with open(os.path.join(output_root, part, FAILURES_FILE), 'rb') as f:
+                shutil.copyfileobj(f, failures)
+
+    fmt = formats.pop() if formats else 'jsonl'
+    records_path = os.path.join(merged_dir, f'{RECORDS_STEM}.{fmt}')
+    concat_exports([os.path.join(output_root, part, f'{RECORDS_STEM}.{fmt}') for part in parts], records_path, fmt)
+
+    result = {
+        'parts': len(parts),
+        'missing_parts': missing,
+        'complete': bool(parts) and not missing,
+        'documents': sum(summary['documents'] for summary in summaries),
+        'records': sum(summary['records'] for summary in summaries),
+        'statuses': statuses,
+        'failed': sum(count for status, count in statuses.items() if status not in (RESULT_SUCCESS, RESULT_SKIPPED)),
+        'cross_part_duplicates': sum(1 for part_set in parts_by_hash.values() if len(part_set) > 1),
+        'format': fmt,
+        'seconds': round(sum(summary['seconds'] for summary in summaries), 2),
+        'nodes': sorted({summary['node'] for summary in summaries})
+    }
+    with open(os.path.join(merged_dir, SUMMARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Split one input tree across machines, then merge the results")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Process this node's share of the input tree")
+    run_parser.add_argument('input_root', help="Input tree of source PDFs (same tree on every node)")
+    run_parser.add_argument('output_root', help="Shared output directory")
+    run_parser.add_argument('--shard-index', type=int, help="This node's shard (static sharding)")
+    run_parser.add_argument('--shard-count', type=int, help="Number of shards (static sharding)")
+    run_parser.add_argument('--claim-dir', help="Lease mode: shared claims directory (default: OUTPUT_ROOT/.claims)")
+    run_parser.add_argument('--unit-size', type=int, default=DEFAULT_UNIT_SIZE, help="Lease mode: documents per unit")
+    run_parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                            help="Lease mode: seconds before an unrenewed lease is taken over")
+    run_parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl', help="Parsed-record export format")
+    run_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    run_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Documents in memory at once")
+    run_parser.add_argument('--verify-fills', action='store_true',
+                            help="Read back every filled PDF and record fields that differ in the manifest")
+
+    merge_parser = subparsers.add_parser('merge', help="Consolidate every part under the output directory")
+    merge_parser.add_argument('output_root', help="Shared output directory")
+    merge_parser.add_argument('--merged-dir', help="Where to write the merged result (default: OUTPUT_ROOT/merged)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.command == 'merge':
+        merged = merge_parts(args.output_root, args.merged_dir)
+        print(json.dumps(merged))
+        sys.exit(0 if merged['complete'] else 1)
+
+    if (args.shard_index is None) != (args.shard_count is None):
+        parser.error("--shard-index and --shard-count go together")
+    os.makedirs(args.output_root, exist_ok=True)
+    # Resume checkpoints live on the shared root, so a node taking over a unit resumes where the last one stopped
+    processor = BatchProcessor(workers=args.workers,
+                               checkpoint_dir=os.path.join(args.output_root, CHECKPOINT_DIR),
+                               verify_fills=args.verify_fills)
+    if args.shard_count is not None:
+        print(json.dumps(run_shard(args.input_root, args.output_root, args.shard_index, args.shard_count,
+                                   processor, args.format, args.chunk_size)))
+    else:
+        for unit_summary in run_units(args.input_root, args.output_root, processor, args.format, args.chunk_size,
+                                      args.unit_size, args.claim_dir, args.lease_seconds):
+            print(json.dumps(unit_summary))
@@ -0,0 +1,369 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, List, Optional, Tuple
+
+from latency_stats import percentile
+from synthetic_pdfs import generate_documents
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'EditablePdf.pdf')
+DEFAULT_PORT = 8599
+XSRF_COOKIE = '_streamlit_xsrf'
+
+# Steps of one simulated operator, in order
+STEPS = ('load', 'upload', 'process', 'zip')
+
+
+class StreamlitSession:
+    """
+    One browser tab on a running Streamlit server, speaking its websocket protocol
+
+    Every script run is driven the way the frontend drives it: a rerun_script
+    message carrying the widget states, then the deltas up to script_finished.
+    Uploads go through file_urls_request and the upload endpoint, downloads
+    through the media URL of the download button.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 600.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session_id: Optional[str] = None
+        self.elements: List[Tuple[str, object]] = []
+        self._widget_states: Dict[str, object] = {}
+        self._xsrf = ''
+        self._socket = None
+        self._exit_stack = ExitStack()
+
+    def _headers(self) -> Dict[str, str]:
+        return {'Cookie': f'{XSRF_COOKIE}={self._xsrf}', 'X-Xsrftoken': self._xsrf} if self._xsrf else {}
+
+    def connect(self) -> None:
+        """Open the session and run the script once, like loading the page"""
+        from websockets.sync.client import connect
+
+        with urllib.request.urlopen(f'{self.base_url}/_stcore/health', timeout=self.timeout) as response:
+            for header in response.headers.get_all('Set-Cookie') or []:
+                name, _, value = header.split(';', 1)[0].partition('=')
+                if name.strip() == XSRF_COOKIE:
+                    self._xsrf = value.strip()
+
+        self._socket = self._exit_stack.enter_context(connect(
+            self.base_url.replace('http', 'ws', 1) + '/_stcore/stream',
+            subprotocols=['streamlit', self._xsrf] if self._xsrf else ['streamlit'],
+            additional_headers=self._headers(),
+            origin=self.base_url,
+            max_size=None
+        ))
+        self.rerun()
+
+    def close(self) -> None:
+        self._exit_stack.close()
+        self._socket = None
+
+    def _send(self, back_msg) -> None:
+        self._socket.send(back_msg.SerializeToString())
+
+    def _receive(self, until) -> object:
+        """Handle forward messages until until(msg) is true, and return that message"""
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        while True:
+            msg = ForwardMsg.FromString(self._socket.recv(timeout=self.timeout))
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                self.session_id = msg.new_session.initialize.session_id
+            elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element = msg.delta.new_element
+                self.elements.append((element.WhichOneof('type'), element))
+            if until(msg):
+                return msg
+
+    def rerun(self, trigger_id: Optional[str] = None) -> None:
+        """Run the script with the current widget states (and one button pressed)"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        back_msg = BackMsg()
+        back_msg.rerun_script.widget_states.widgets.extend(self._widget_states.values())
+        if trigger_id:
+            back_msg.rerun_script.widget_states.widgets.append(WidgetState(id=trigger_id, trigger_value=True))
+        self.elements = []
+        self._send(back_msg)
+
+        # Fragment reruns (the background jobs panel) finish with their own status
+        finished = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR)
+        msg = self._receive(lambda m: m.WhichOneof('type') == 'script_finished' and m.script_finished in finished)
+        if msg.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+            raise RuntimeError("Script failed to compile")
+        exceptions = [element.exception.message for kind, element in self.elements if kind == 'exception']
+        if exceptions:
+            raise RuntimeError(exceptions[0])
+
+    def find(self, kind: str, label_prefix: str = '') -> Optional[object]:
+        """First element of kind from the last run whose label starts with label_prefix"""
+        for element_kind, element in self.elements:
+            if element_kind == kind and getattr(element, kind).label.startswith(label_prefix):
+                return getattr(element, kind)
+        return None
+
+    def upload(self, files: List[Tuple[str, bytes]]) -> None:
+        """Upload files into the page's file uploader and rerun"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.Common_pb2 import UploadedFileInfo
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        uploader = self.find('file_uploader')
+        if uploader is None:
+            raise RuntimeError("No file uploader on the page")
+
+        back_msg = BackMsg()
+        back_msg.file_urls_request.request_id = uuid.uuid4().hex
+        back_msg.file_urls_request.session_id = self.session_id
+        back_msg.file_urls_request.file_names.extend(name for name, _ in files)
+        self._send(back_msg)
+        response = self._receive(
+            lambda m: m.WhichOneof('type') == 'file_urls_response' and
+            m.file_urls_response.response_id == back_msg.file_urls_request.request_id
+        ).file_urls_response
+        if response.error_msg:
+            raise RuntimeError(response.error_msg)
+
+        state = WidgetState(id=uploader.id)
+        for (name, data), file_urls in zip(files, response.file_urls):
+            boundary = uuid.uuid4().hex
+            body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+                    f'Content-Type: application/pdf\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+            request = urllib.request.Request(
+                self.base_url + file_urls.upload_url, data=body, method='PUT',
+                headers={**self._headers(), 'Content-Type': f'multipart/form-data; boundary={boundary}'}
+            )
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+            state.file_uploader_state_value.uploaded_file_info.append(
+                UploadedFileInfo(name=name, size=len(data), file_id=file_urls.file_id, file_urls=file_urls))
+        self._widget_states[uploader.id] = state
+        self.rerun()
+
+    def click(self, label_prefix: str) -> None:
+        """Press a button of the last run and rerun"""
+        button = self.find('button', label_prefix)
+        if button is None:
+            raise RuntimeError(f"No button labelled {label_prefix!r} on the page")
+        self.rerun(trigger_id=button.id)
+
+    def download(self, label_prefix: str) -> bytes:
+        """Fetch the file behind a download button of the last run"""
+        button = self.find('download_button', label_prefix)
+        if button is None:
+            raise RuntimeError(f"No download button labelled {label_prefix!r} on the page")
+        request = urllib.request.Request(self.base_url + '/' + button.url.lstrip('/'), headers=self._headers())
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+
+def run_session(base_url: str, documents: List[Tuple[str, bytes]], timeout: float) -> Tuple[Dict, StreamlitSession]:
+    """
+    One operator: open the app, upload a batch, process it and download the ZIP
+
+    Returns:
+        tuple: (step timings in seconds with processed/error details, the still open session)
+    """
+    session = StreamlitSession(base_url, timeout)
+    timings: Dict = {'error': None}
+
+    def step(name: str, action) -> None:
+        start = time.perf_counter()
+        action()
+        timings[name] = time.perf_counter() - start
+
+    def download_zip() -> None:
+        session.click('📥 Download All')
+        with zipfile.ZipFile(io.BytesIO(session.download('📥 Download ZIP'))) as archive:
+            timings['processed'] = len(archive.namelist())
+
+    try:
+        step('load', session.connect)
+        step('upload', lambda: session.upload(documents))
+        step('process', lambda: session.click('🚀 Process All Files'))
+        step('zip', download_zip)
+    except Exception as e:
+        timings['error'] = f"{type(e).__name__}: {e}"
+    return timings, session
+
+
+def process_rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Current resident set size of a process (None when it cannot be read)"""
+    if pid is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def run_level(base_url: str, concurrency: int, docs_per_session: int, seed: int, timeout: float,
+              server_pid: Optional[int] = None) -> Dict:
+    """
+    Start concurrency operators at once, each with its own batch of synthetic PDFs
+
+    Sessions stay connected until every one has finished, so the server's RSS
+    growth is what that many open sessions hold.
+    """
+    batches = [[(name, data) for name, data, _ in generate_documents(docs_per_session, seed=seed + index)]
+               for index in range(concurrency)]
+    rss_before = process_rss_mb(server_pid)
+    barrier = threading.Barrier(concurrency)
+
+    def operator(batch):
+        barrier.wait()
+        return run_session(base_url, batch, timeout)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(operator, batches))
+    wall = time.perf_counter() - start
+    rss_after = process_rss_mb(server_pid)
+    for _, session in results:
+        session.close()
+
+    timings = [timing for timing, _ in results]
+    completed = [timing for timing in timings if not timing['error']]
+    return {
+        'concurrency': concurrency,
+        'completed': len(completed),
+        'errors': [timing['error'] for timing in timings if timing['error']],
+        'documents_processed': sum(timing.get('processed', 0) for timing in timings),
+        'wall_seconds': round(wall, 2),
+        'sessions_per_minute': round(len(completed) / wall * 60, 2) if wall else 0.0,
+        'steps': {name: {'p50': round(percentile([t[name] for t in timings if name in t], 0.50), 3),
+                         'p95': round(percentile([t[name] for t in timings if name in t], 0.95), 3)}
+                  for name in STEPS},
+        'rss_before_mb': rss_before,
+        'rss_after_mb': rss_after,
+        'rss_per_session_mb': round((rss_after - rss_before) / concurrency, 1)
+        if rss_before is not None and rss_after is not None else None
+    }
+
+
+def saturation_point(levels: List[Dict], slo_seconds: float, min_gain: float = 0.10) -> Optional[int]:
+    """
+    Highest concurrency that still raised throughput by min_gain and kept process p95 within the SLO
+
+    Beyond it, extra sessions only queue behind each other's script runs.
+    """
+    best, point = 0.0, None
+    for level in levels:
+        within_slo = not level['errors'] and level['steps']['process']['p95'] <= slo_seconds
+        if not within_slo or level['sessions_per_minute'] < best * (1 + min_gain):
+            break
+        best, point = level['sessions_per_minute'], level['concurrency']
+    return point
+
+
+def start_server(workdir: str, port: int) -> subprocess.Popen:
+    """
+    Serve app.py headless from workdir and wait until it is healthy
+
+    The app's record store, caches and checkpoints are relative paths, so they
+    land in workdir next to its copy of the template, never in the real ones.
+    """
+    shutil.copy(TEMPLATE_PATH, os.path.join(workdir, 'EditablePdf.pdf'))
+    log = open(os.path.join(workdir, 'streamlit.log'), 'w')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', APP_PATH, '--server.headless=true',
+         f'--server.port={port}', '--server.address=127.0.0.1', '--server.fileWatcherType=none',
+         '--browser.gatherUsageStats=false'],
+        cwd=workdir, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Streamlit exited with {server.returncode}, see {log.name}")
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"Streamlit did not become healthy within 60s, see {log.name}")
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"{'sessions':>8} {'ok':>4} {'per min':>8} " +
+             ' '.join(f"{step + ' p50/p95':>17}" for step in STEPS) + f" {'MB/session':>10}"]
+    for level in report['levels']:
+        steps = ' '.join(f"{level['steps'][step]['p50']:>8.2f}/{level['steps'][step]['p95']:<8.2f}" for step in STEPS)
+        memory = level['rss_per_session_mb'] if level['rss_per_session_mb'] is not None else 'n/a'
+        lines.append(f"{level['concurrency']:>8} {level['completed']:>4} {level['sessions_per_minute']:>8} "
+                     f"{steps} {memory:>10}")
+        for error in level['errors'][:3]:
+            lines.append(f"{'':>8} error: {error}")
+    point = report['saturation_point']
+    lines.append(f"Saturation point: {point} concurrent session(s)" if point else
+                 "Saturation point: below the lowest level tested")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the Streamlit app")
+    parser.add_argument('--url', help="Running app to test (default: start one on a throwaway working directory)")
+    parser.add_argument('--server-pid', type=int, help="PID of the --url server, for memory growth")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port of the started server")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8], help="Concurrent sessions per step")
+    parser.add_argument('--docs', type=int, default=5, help="Synthetic PDFs each session uploads (at least 2)")
+    parser.add_argument('--slo', type=float, default=30.0, help="Acceptable p95 seconds for processing a batch")
+    parser.add_argument('--timeout', type=float, default=600.0, help="Seconds one script run may take")
+    parser.add_argument('--output', help="Also write the JSON report here")
+    args = parser.parse_args()
+
+    server, workdir = None, None
+    base_url, server_pid = args.url, args.server_pid
+    if not base_url:
+        workdir = tempfile.mkdtemp(prefix='kyc_load_test_')
+        server = start_server(workdir, args.port)
+        base_url, server_pid = f'http://127.0.0.1:{args.port}', server.pid
+
+    try:
+        # Warm-up operator: imports, cached resources and the template pool are not charged to the first level
+        warmup, session = run_session(base_url, [(name, data) for name, data, _ in generate_documents(2, seed=0)],
+                                      args.timeout)
+        session.close()
+        if warmup['error']:
+            print(f"Warm-up session failed: {warmup['error']}")
+            sys.exit(1)
+
+        # Each operator uploads different documents, so "Skip already processed" never short-circuits a batch
+        seed = int(time.time())
+        levels = []
+        for concurrency in args.levels:
+            levels.append(run_level(base_url, concurrency, args.docs, seed, args.timeout, server_pid))
+            seed += concurrency
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    result = {'url': base_url, 'docs_per_session': args.docs, 'slo_seconds': args.slo, 'workdir': workdir,
+              'levels': levels, 'saturation_point': saturation_point(levels, args.slo)}
+    print(format_report(result))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,333 @@
+import io
+import json
+import os
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from bs_calendar import ad_to_bs_str
+
+# Source-form labels in English and in Preeti encoding (the ASCII text a Preeti-font
+# PDF yields on extraction), exactly as DataParser.patterns matches them
+LABELS = {
+    'name': ('Name', 'gfd'),
+    'date_of_birth': ('Date of Birth', 'hGd ldlt'),
+    'date_of_birth_bs': ('BS', 'la=;+='),
+    'gender': ('Gender', 'ln·'),
+    'citizenship_no': ('Citizenship No:', 'gful/stf g+='),
+    'issue_district': ('Issue District', 'hf/L lhNnf'),
+    'issue_date': ('Issue Date', 'hf/L ldlt'),
+    'beneficiary_id': ('Beneficiary ID No.', 'lxtu|fxL vftf g+='),
+    'pan_no': ('Permanent Account No. (PAN)', ':yfoL n]vf g+='),
+    'national_id': ('National ID No.', '/fli6«o kl/ro kq g+='),
+    'country': ('Country:', 'b]z'),
+    'province': ('Province:', 'k|b]z'),
+    'district': ('District:', 'lhNnf'),
+    'municipality': ('Municipality', 'uf=kf='),
+    'ward_no': ('Ward No:', 'j8f g+='),
+    'tole': ('Tole:', '6f]n'),
+    'telephone': ('Telephone No:', '6]lnkmf]g g+='),
+    'email': ('Email ID:', 'O{d]n'),
+    'mobile': ('Mobile No:', 'df]afOn g+='),
+    'permanent_address': ('Permanent Address:', ':yfoL 7]ufgf'),
+    'temporary_address': ('Temporary Address:', 'c:yfoL 7]ufgf'),
+    'grandfather_name': ("Grand Father's Name", "afh]sf] gfd"),
+    'father_name': ("Father's Name", "a'afsf] gfd"),
+    'mother_name': ("Mother's Name", "cfdfsf] gfd"),
+    'spouse_name': ("Spouse's Name", "klt÷kTgLsf] gfd"),
+    'son_name': ("Son's Name", "5f]/fsf] gfd"),
+    'daughter_name': ("Daughter's Name", "5f]/Lsf] gfd"),
+    'bank_account_type': ('Type of Bank Account', 'a}+s vftfsf] lsl;d'),
+    'bank_account_number': ('Bank Account Number', 'a}+s vftf gDa/'),
+    'bank_name': ('Name & Address of Bank', 'a}+s gfd'),
+    'occupation': ('Occupation', 'k]zf'),
+    'organization': ("Organization's Name", ';+:yfsf] gfd'),
+    'designation': ('Designation', 'kb'),
+    'income_limit': ('Income Limit(Annual Details)', 'jflifs cfo'),
+}
+
+# Preeti spellings of the account types (bachat / chalti)
+_PREETI_ACCOUNT_TYPES = {'Saving': 'art', 'Current': 'rNtL'}
+
+FIRST_NAMES = ('SATYA NARAYAN', 'RAM', 'SITA', 'HARI', 'GITA', 'KRISHNA', 'SUNITA', 'BIKASH', 'ANITA',
+               'PRAKASH', 'SARITA', 'DIPAK', 'RADHA', 'SURESH', 'KAMALA', 'RAJESH', 'MANISHA', 'ARJUN')
+LAST_NAMES = ('THAKUR', 'SHRESTHA', 'ADHIKARI', 'KARKI', 'GURUNG', 'TAMANG', 'RAI', 'LIMBU',
+              'POUDEL', 'BHATTARAI', 'YADAV', 'MAHARJAN', 'KC', 'THAPA', 'SHARMA', 'KOIRALA')
+DISTRICTS = ('Sunsari', 'Morang', 'Jhapa', 'Kathmandu', 'Lalitpur', 'Bhaktapur', 'Kaski', 'Chitwan',
+             'Rupandehi', 'Banke', 'Dhanusha', 'Saptari', 'Ilam', 'Dang', 'Kailali', 'Syangja')
+PROVINCES = ('Province_1', 'Madhesh', 'Bagmati', 'Gandaki', 'Lumbini', 'Karnali', 'Sudurpashchim')
+MUNICIPALITIES = ('Gadhi', 'Itahari', 'Dharan', 'Biratnagar', 'Damak', 'Pokhara', 'Bharatpur', 'Butwal',
+                  'Nepalgunj', 'Janakpur', 'Dhangadhi', 'Tulsipur', 'Budhanilkantha', 'Godawari')
+TOLES = ('MAJHAU', 'BAZAR', 'CHOWK', 'SHANTINAGAR', 'PIPALBOT', 'GANESH MARG', 'BUDDHA CHOWK', 'NAYABASTI')
+BANKS = ('Citizens Bank International Limited, Biratnagar Branch', 'Nabil Bank Limited, Kathmandu Branch',
+         'Global IME Bank Limited, Itahari Branch', 'Nepal Bank Limited, Pokhara Branch',
+         'Rastriya Banijya Bank Limited, Dharan Branch', 'NIC Asia Bank Limited, Butwal Branch')
+OCCUPATIONS = ('Agriculture', 'Business', 'Service', 'Student', 'Housewife', 'Retired', 'Others')
+ORGANIZATIONS = ('Nepal Telecom', 'Himalayan Traders', 'Everest Hydropower', 'Sagarmatha Textiles')
+DESIGNATIONS = ('Officer', 'Assistant', 'Manager', 'Engineer', 'Accountant')
+INCOME_LIMITS = ('Upto 5,00,000', '5,00,000 to 10,00,000', 'Above 10,00,000')
+
+# Share of forms that also give the date of birth in BS, and that give the issue date in BS too
+BS_DATE_RATE = 0.4
+ISSUE_DATE_BS_RATE = 0.3
+
+# Fields that may be left blank ('-') or dropped from the form altogether
+OPTIONAL_FIELDS = ('pan_no', 'national_id', 'beneficiary_id', 'issue_district', 'issue_date', 'telephone',
+                   'email', 'grandfather_name', 'spouse_name', 'son_name', 'daughter_name',
+                   'organization', 'designation', 'income_limit')
+
+_FILLER = ("I hereby declare that the details furnished above are true and correct to the best of my "
+           "knowledge and belief and I undertake to inform the broker of any changes therein immediately. "
+           "In case any of the above information is found to be false or untrue or misleading, I am aware "
+           "that I may be held liable for it. ")
+
+
+def _date(rng: random.Random, first_year: int, last_year: int) -> str:
+    return f"{rng.randint(first_year, last_year)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def _person(rng: random.Random, last_name: str) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {last_name}"
+
+
+def generate_profile(rng: random.Random, missing_rate: float = 0.15) -> Dict[str, Optional[str]]:
+    """
+    Random KYC applicant
+
+    Returns:
+        dict: Form values by label key (LABELS); None marks a field left blank or
+            dropped, and 'address' holds the country/province/.../mobile values
+    """
+    last_name = rng.choice(LAST_NAMES)
+    district = rng.choice(DISTRICTS)
+    mobile = f"98{rng.randint(0, 99999999):08d}"
+    email_user = f"{rng.choice(FIRST_NAMES).split()[0].lower()}{rng.randint(1, 999)}"
+    profile = {
+        'name': _person(rng, last_name),
+        'date_of_birth': _date(rng, 1950, 2004),
+        'gender': rng.choice('MF'),
+        'citizenship_no': f"{rng.randint(1, 9999)}/{rng.randint(1, 9999)}",
+        'issue_district': district,
+        'issue_date': _date(rng, 1990, 2020),
+        'beneficiary_id': f"1301{rng.randint(0, 10 ** 12 - 1):012d}",
+        'pan_no': f"{rng.randint(100000000, 999999999)}",
+        'national_id': f"{rng.randint(10 ** 9, 10 ** 10 - 1)}",
+        'address': {
+            'country': 'Nepal',
+            'province': rng.choice(PROVINCES),
+            'district': district,
+            'municipality': rng.choice(MUNICIPALITIES),
+            'ward_no': str(rng.randint(1, 32)),
+            'tole': rng.choice(TOLES),
+            'telephone': mobile,
+            'email': f"{email_user}@gmail.com",
+            'mobile': mobile,
+        },
+        'grandfather_name': _person(rng, last_name),
+        'father_name': _person(rng, last_name),
+        'mother_name': _person(rng, last_name),
+        'spouse_name': _person(rng, rng.choice(LAST_NAMES)),
+        'son_name': _person(rng, last_name),
+        'daughter_name': _person(rng, last_name),
+        'bank_account_type': rng.choice(('Saving', 'Current')),
+        'bank_account_number': f"{rng.randint(10 ** 15, 10 ** 16 - 1)}",
+        'bank_name': rng.choice(BANKS),
+        'occupation': rng.choice(OCCUPATIONS),
+        'organization': rng.choice(ORGANIZATIONS),
+        'designation': rng.choice(DESIGNATIONS),
+        'income_limit': rng.choice(INCOME_LIMITS),
+    }
+    for field in OPTIONAL_FIELDS:
+        if rng.random() < missing_rate:
+            if field in profile['address']:
+                profile['address'][field] = None
+            else:
+                profile[field] = None
+    profile['date_of_birth_bs'] = ad_to_bs_str(profile['date_of_birth']) if rng.random() < BS_DATE_RATE else None
+    return profile
+
+
+def form_lines(profile: Dict, rng: random.Random, preeti_ratio: float = 0.0,
+               drop_missing: float = 0.5) -> Tuple[List[str], int]:
+    """
+    Text lines of a source form in the layout of the bundled sample (label line, then value line)
+
+    Each label is written in Preeti encoding with probability preeti_ratio. Missing
+    values are written as '-' or, with probability drop_missing, leave out the label too.
+
+    Returns:
+        tuple: (lines, number of Preeti labels used)
+    """
+    lines: List[str] = []
+    preeti_labels = 0
+
+    def label(key: str) -> str:
+        nonlocal preeti_labels
+        english, preeti = LABELS[key]
+        if rng.random() < preeti_ratio:
+            preeti_labels += 1
+            return preeti
+        return english
+
+    def field(key: str, value: Optional[str]) -> None:
+        if value is None and rng.random() < drop_missing:
+            return
+        text = label(key)
+        if value is not None and key == 'date_of_birth':
+            value = f"O{{= : {value}" if text == LABELS[key][1] else f"AD : {value}"
+        elif value is not None and key == 'bank_account_type' and text == LABELS[key][1]:
+            value = _PREETI_ACCOUNT_TYPES[value]
+        lines.extend((text, value if value is not None else '-'))
+        if value is not None and key == 'date_of_birth' and profile['date_of_birth_bs']:
+            lines.append(f"{LABELS['date_of_birth_bs'][text == LABELS[key][1]]} : {profile['date_of_birth_bs']}")
+        # Another BS date outside the date-of-birth block, which the BS patterns must not pick up
+        if value is not None and key == 'issue_date' and rng.random() < ISSUE_DATE_BS_RATE:
+            lines.append(f"{LABELS['date_of_birth_bs'][0]} : {ad_to_bs_str(value)}")
+
+    def address(heading: str) -> None:
+        lines.append(label(heading))
+        for key in ('country', 'province', 'district'):
+            field(key, profile['address'][key])
+        municipality = profile['address']['municipality']
+        lines.append(f"{label('municipality')} {municipality}")
+        for key in ('ward_no', 'tole', 'telephone', 'email', 'mobile'):
+            field(key, profile['address'][key])
+
+    lines += ["Date: 2025/7/2", "Details of Natural person", "Details of Client"]
+    for key in ('name', 'date_of_birth', 'gender', 'citizenship_no', 'issue_district', 'issue_date',
+                'beneficiary_id', 'pan_no', 'national_id'):
+        field(key, profile[key])
+    lines.append("Current Address")
+    address('permanent_address')
+    address('temporary_address')
+
+    lines.append("Details of Family Members")
+    for key in ('grandfather_name', 'father_name', 'mother_name', 'spouse_name', 'son_name', 'daughter_name'):
+        field(key, profile[key])
+    lines += ["Money Laundering", "Are You A Politician Or A High-Ranking Person?", "No",
+              "Do You Have A Beneficiary?", "No"]
+
+    lines.append("Bank Account Details")
+    field('bank_account_type', profile['bank_account_type'])
+    field('bank_account_number', profile['bank_account_number'])
+    lines.append(f"{label('bank_name')} {profile['bank_name']}")
+    lines.append("Details of Occupation")
+    field('occupation', profile['occupation'])
+    field('organization', profile['organization'])
+    field('designation', profile['designation'])
+    lines.append("Financial Details")
+    field('income_limit', profile['income_limit'])
+    return lines, preeti_labels
+
+
+def expected_record(profile: Dict) -> Dict[str, str]:
+    """KYCRecord field values that the form carries (what a perfect parser would return)"""
+    expected = {key: value for key, value in profile.items()
+                if key != 'address' and value is not None}
+    if 'gender' in expected:
+        expected['gender'] = 'Male' if expected['gender'] == 'M' else 'Female'
+    for prefix in ('current', 'permanent', 'temporary'):
+        for key, value in profile['address'].items():
+            if value is not None and not (prefix == 'permanent' and key in ('email', 'mobile')):
+                expected[f'{prefix}_{key}'] = value
+    return expected
+
+
+def render_pdf(lines: List[str], pages: int = 1, font_size: int = 9) -> bytes:
+    """Lay lines out top to bottom, then pad with declaration text until the PDF has at least pages pages"""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    width, height = A4
+    margin = 50
+    leading = font_size * 1.4
+    y = height - margin
+    page_count = 1
+    pdf.setFont('Helvetica', font_size)
+
+    def next_line():
+        nonlocal y, page_count
+        y -= leading
+        if y < margin:
+            pdf.showPage()
+            pdf.setFont('Helvetica', font_size)
+            page_count += 1
+            y = height - margin
+
+    for line in lines:
+        pdf.drawString(margin, y, line)
+        next_line()
+
+    # Terms and declarations pad the form to its page count, as longer real forms do
+    words = _FILLER.split()
+    position = 0
+    while page_count < pages:
+        text = ''
+        while pdf.stringWidth(text + words[position % len(words)], 'Helvetica', font_size) < width - 2 * margin:
+            text += words[position % len(words)] + ' '
+            position += 1
+        pdf.drawString(margin, y, text.rstrip())
+        next_line()
+    pdf.drawString(margin, y, "Applicant's Name:")
+    pdf.save()
+    return buffer.getvalue()
+
+
+def generate_documents(count: int, seed: int = 0, preeti_ratio: float = 0.3, missing_rate: float = 0.15,
+                       max_pages: int = 6) -> Iterator[Tuple[str, bytes, Dict]]:
+    """
+    Yield count synthetic source PDFs
+
+    Documents are reproducible: the same seed always yields the same PDFs.
+
+    Args:
+        count: Number of documents
+        seed: Random seed
+        preeti_ratio: Share of labels written in Preeti encoding
+        missing_rate: Share of optional fields left blank or dropped
+        max_pages: Page counts are drawn from 1..max_pages
+
+    Yields:
+        tuple: (file name, PDF bytes, manifest entry with pages, preeti_labels and expected values)
+    """
+    rng = random.Random(seed)
+    for index in range(count):
+        profile = generate_profile(rng, missing_rate)
+        lines, preeti_labels = form_lines(profile, rng, preeti_ratio)
+        pages = rng.randint(1, max_pages)
+        name = f"synthetic_{seed}_{index:06d}.pdf"
+        yield name, render_pdf(lines, pages), {
+            'file': name,
+            'pages': pages,
+            'preeti_labels': preeti_labels,
+            'expected': expected_record(profile)
+        }
+
+
+def write_corpus(output_dir: str, count: int, **options) -> str:
+    """Write count documents and a manifest.jsonl to output_dir; returns the manifest path"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, 'manifest.jsonl')
+    with open(manifest_path, 'w', encoding='utf-8') as manifest:
+        for name, pdf_data, entry in generate_documents(count, **options):
+            with open(os.path.join(output_dir, name), 'wb') as f:
+                f.write(pdf_data)
+            manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return manifest_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic KYC source PDFs")
+    parser.add_argument('output_dir', help="Directory for the PDFs and manifest.jsonl")
+    parser.add_argument('--count', type=int, default=100, help="Number of documents")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--preeti-ratio', type=float, default=0.3, help="Share of labels in Preeti encoding")
+    parser.add_argument('--missing-rate', type=float, default=0.15, help="Share of optional fields left out")
+    parser.add_argument('--max-pages', type=int, default=6, help="Largest page count")
+    args = parser.parse_args()
+
+    print(write_corpus(args.output_dir, args.count, seed=args.seed, preeti_ratio=args.preeti_ratio,
+                       missing_rate=args.missing_rate, max_pages=args.max_pages))
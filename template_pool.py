@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from field_extractor import build_field_manifest
+from worker_pool import peak_rss_mb
+
+
+class WarmTemplate:
+    """
+    A template pre-parsed once: compact serialized bytes plus its widget index
+
+    field_index maps each field name to its widgets as (page index, widget xref,
+    field xref) in compact_bytes, the same shape as FormFiller's field index.
+    """
+
+    __slots__ = ('digest', 'compact_bytes', 'field_index', 'page_count')
+
+    def __init__(self, digest: str, compact_bytes: bytes,
+                 field_index: Dict[str, List[Tuple[int, int, int]]], page_count: int):
+        self.digest = digest
+        self.compact_bytes = compact_bytes
+        self.field_index = field_index
+        self.page_count = page_count
+
+
+class TemplatePool:
+    """
+    Per-process pool of warm templates
+
+    Each template is parsed once, garbage-collected and re-serialized with
+    tobytes(garbage=4); every fill then opens a fresh writable copy of that
+    compact buffer and loads only the widgets it updates through the field index
+    built from the same buffer (xrefs stay valid across clones).
+    """
+
+    def __init__(self, max_templates: int = 4):
+        """
+        Args:
+            max_templates: Number of distinct templates kept warm (least recently used is dropped)
+        """
+        self.max_templates = max_templates
+        self._templates: 'OrderedDict[str, WarmTemplate]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.clones = 0
+        self.loads = 0
+
+    def get(self, template_bytes: bytes, digest: str) -> WarmTemplate:
+        """Return the warm copy of a template, preparing it on first use"""
+        with self._lock:
+            warm = self._templates.get(digest)
+            if warm is not None:
+                self._templates.move_to_end(digest)
+                return warm
+
+        warm = self._prepare(template_bytes, digest)
+        with self._lock:
+            self._templates[digest] = warm
+            self._templates.move_to_end(digest)
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+            self.loads += 1
+        return warm
+
+    def _prepare(self, template_bytes: bytes, digest: str) -> WarmTemplate:
+        doc = fitz.open(stream=template_bytes, filetype="pdf")
+        try:
+            compact_bytes = doc.tobytes(garbage=4, no_new_id=True)
+            page_count = doc.page_count
+        finally:
+            doc.close()
+
+        field_index = {}
+        for name, field in build_field_manifest(pdf_bytes=compact_bytes).items():
+            widgets = field['kids'] or [field]
+            field_index[name] = [(w['page'] - 1, w['xref'], field['xref']) for w in widgets if w['page']]
+        return WarmTemplate(digest, compact_bytes, field_index, page_count)
+
+    def clone(self, warm: WarmTemplate):
+        """Open a fresh writable document from a warm template"""
+        self.clones += 1
+        return fitz.open(stream=warm.compact_bytes, filetype="pdf")
+
+    def bytes_held(self) -> int:
+        with self._lock:
+            return sum(len(w.compact_bytes) for w in self._templates.values())
+
+    def stats(self) -> Dict:
+        """Pool footprint and counters for this process (max_rss_mb is None without the resource module)"""
+        max_rss_mb = peak_rss_mb()
+        return {
+            'pid': os.getpid(),
+            'templates': len(self._templates),
+            'max_templates': self.max_templates,
+            'bytes_held': self.bytes_held(),
+            'loads': self.loads,
+            'clones': self.clones,
+            'max_rss_mb': round(max_rss_mb, 1) if max_rss_mb is not None else None
+        }
+
+
+_worker_pool: Optional[TemplatePool] = None
+
+
+def get_worker_template_pool(max_templates: int = 4) -> TemplatePool:
+    """Return this process's template pool, creating it on first use"""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = TemplatePool(max_templates)
+    return _worker_pool
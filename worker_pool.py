@@ -0,0 +1,292 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait as wait_connections
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Why a worker was replaced: job count, memory threshold, per-task caps, or it died
+RECYCLE_REASONS = ('tasks', 'memory', 'timeout', 'memory_cap', 'crashed')
+
+
+class DocumentTimeout(TimeoutError):
+    """A task ran past the pool's per-task time cap; its worker was killed"""
+
+
+class DocumentMemoryExceeded(MemoryError):
+    """A task grew its worker's RSS past the pool's per-task memory cap; the worker was killed"""
+
+
+class WorkerCrashed(RuntimeError):
+    """A worker process died while running a task"""
+
+
+def process_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Current resident set size of a process (this one by default); None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far; None without the resource module"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _pool_worker(conn, initializer, initargs) -> None:
+    """Worker loop: initialise, report ready, then run tasks until told to stop"""
+    if initializer is not None:
+        initializer(*initargs)
+    conn.send(('ready', os.getpid()))
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        task_id, fn, args = task
+        try:
+            reply = (task_id, True, fn(*args))
+        except BaseException as e:
+            reply = (task_id, False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Unpicklable result or exception
+            conn.send((task_id, False, RuntimeError(f"{type(e).__name__}: {e}")))
+        del task, reply
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.ready = False
+        self.tasks_done = 0
+        # (future, dispatch time, RSS at dispatch) while a task runs
+        self.task = None
+
+
+class RecyclingProcessPool:
+    """
+    Process pool that bounds what one document may cost and replaces workers that grew
+
+    A drop-in for ProcessPoolExecutor's submit/shutdown. Unlike it, a task
+    that runs past task_timeout seconds, or grows its worker's RSS by more
+    than task_memory_mb (polled every poll_interval), gets its worker killed
+    and fails on its own: the rest of the pool keeps going. Workers are also
+    replaced after max_tasks_per_worker tasks or once their RSS passes
+    max_worker_rss_mb, so memory a pathological document left behind is
+    returned to the OS with the process.
+
+    Memory figures come from /proc; where it is missing only the time cap
+    and the task count apply.
+    """
+
+    def __init__(self, max_workers: int, mp_context=None, initializer=None, initargs=(),
+                 task_timeout: Optional[float] = None, task_memory_mb: Optional[float] = None,
+                 max_tasks_per_worker: Optional[int] = None, max_worker_rss_mb: Optional[float] = None,
+                 poll_interval: float = 0.1):
+        self.max_workers = max(1, max_workers)
+        self._context = mp_context or multiprocessing.get_context()
+        self._initializer = initializer
+        self._initargs = initargs
+        self.task_timeout = task_timeout
+        self.task_memory_mb = task_memory_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_worker_rss_mb = max_worker_rss_mb
+        self.poll_interval = poll_interval
+        self.stats: Dict = {'spawned': 0, 'recycled': dict.fromkeys(RECYCLE_REASONS, 0)}
+
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._task_ids = 0
+        self._shutdown = False
+        self._broken: Optional[str] = None
+        self._wake_reader, self._wake_writer = self._context.Pipe(duplex=False)
+        self._workers = [self._spawn() for _ in range(self.max_workers)]
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_pool_worker, args=(child_conn, self._initializer, self._initargs),
+                                        daemon=True)
+        process.start()
+        child_conn.close()
+        self.stats['spawned'] += 1
+        return _Worker(process, parent_conn)
+
+    @property
+    def broken(self) -> Optional[str]:
+        """Why the pool stopped accepting tasks (its workers failed to start), or None while usable"""
+        return self._broken
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        with self._lock:
+            if self._broken:
+                raise RuntimeError(self._broken)
+            if self._shutdown:
+                raise RuntimeError("Cannot submit to a pool that is shut down")
+            self._task_ids += 1
+            self._pending.append((self._task_ids, future, fn, args))
+        self._wake_writer.send_bytes(b'')
+        return future
+
+    def _retire(self, worker: _Worker, reason: str, kill: bool = False) -> None:
+        """Stop a worker and start its replacement (unless the pool is winding down)"""
+        if kill:
+            worker.process.kill()
+        else:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join()
+        worker.conn.close()
+        self.stats['recycled'][reason] += 1
+        index = self._workers.index(worker)
+        self._workers[index] = self._spawn()
+
+    def _fail_all(self, message: str) -> None:
+        with self._lock:
+            self._broken = message
+            pending, self._pending = list(self._pending), deque()
+        for _, future, _, _ in pending:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(WorkerCrashed(message))
+        for worker in self._workers:
+            if worker.task is not None:
+                worker.task[0].set_exception(WorkerCrashed(message))
+                worker.task = None
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._lock:
+                idle = [worker for worker in self._workers if worker.ready and worker.task is None]
+                while idle and self._pending:
+                    task_id, future, fn, args = self._pending.popleft()
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    worker = idle.pop()
+                    worker.conn.send((task_id, fn, args))
+                    worker.task = (future, time.monotonic(), process_rss_mb(worker.process.pid))
+                busy = any(worker.task is not None for worker in self._workers)
+                if self._shutdown and not busy and (not self._pending or self._broken):
+                    break
+
+            waitables = [self._wake_reader]
+            for worker in self._workers:
+                waitables.extend((worker.conn, worker.process.sentinel))
+            ready = wait_connections(waitables, timeout=self.poll_interval)
+            while self._wake_reader.poll():
+                self._wake_reader.recv_bytes()
+
+            now = time.monotonic()
+            for worker in list(self._workers):
+                if worker.conn in ready or (worker.process.sentinel not in ready and worker.conn.poll()):
+                    try:
+                        message = worker.conn.recv()
+                    except (EOFError, OSError):
+                        message = None
+                    if message is not None:
+                        self._handle_message(worker, message)
+                        continue
+                if worker.process.sentinel in ready or not worker.process.is_alive():
+                    if not worker.ready:
+                        self._fail_all(f"Worker failed to start (exit code {worker.process.exitcode})")
+                        self._workers.remove(worker)
+                        worker.conn.close()
+                        continue
+                    if worker.task is not None:
+                        worker.task[0].set_exception(
+                            WorkerCrashed(f"Worker died while processing (exit code {worker.process.exitcode})"))
+                        worker.task = None
+                    self._retire(worker, 'crashed', kill=True)
+                    continue
+                if worker.task is None:
+                    continue
+                future, started, baseline = worker.task
+                if self.task_timeout and now - started > self.task_timeout:
+                    worker.task = None
+                    self._retire(worker, 'timeout', kill=True)
+                    future.set_exception(DocumentTimeout(f"Exceeded the {self.task_timeout:g}s per-document time cap"))
+                    continue
+                if self.task_memory_mb and baseline is not None:
+                    rss = process_rss_mb(worker.process.pid)
+                    if rss is not None and rss - baseline > self.task_memory_mb:
+                        worker.task = None
+                        self._retire(worker, 'memory_cap', kill=True)
+                        future.set_exception(DocumentMemoryExceeded(
+                            f"Grew worker memory by {rss - baseline:.0f} MB, over the "
+                            f"{self.task_memory_mb:g} MB per-document cap"))
+
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+
+    def _handle_message(self, worker: _Worker, message) -> None:
+        if message[0] == 'ready':
+            worker.ready = True
+            return
+        _, ok, value = message
+        future = worker.task[0]
+        worker.task = None
+        worker.tasks_done += 1
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+        if self._shutdown and not self._pending:
+            return
+        if self.max_tasks_per_worker and worker.tasks_done >= self.max_tasks_per_worker:
+            self._retire(worker, 'tasks')
+        elif self.max_worker_rss_mb:
+            rss = process_rss_mb(worker.process.pid)
+            if rss is not None and rss > self.max_worker_rss_mb:
+                self._retire(worker, 'memory')
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                pending, self._pending = list(self._pending), deque()
+                for _, future, _, _ in pending:
+                    future.cancel()
+        self._wake_writer.send_bytes(b'')
+        if wait:
+            self._dispatcher.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
+        return False